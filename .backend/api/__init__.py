@@ -1,6 +1,7 @@
 """
 API 模組
 """
+import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 
@@ -8,20 +9,74 @@ def create_app():
     """建立 Flask 應用程式"""
     app = Flask(__name__)
     
-    # 啟用 CORS - 允許所有來源和方法
-    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    # 以 orjson 序列化 JSON 回應（datetime 直接輸出 ISO 8601）
+    from utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+    
+    # 回應壓縮（gzip / br）；after_request 依註冊的相反順序執行，最先註冊才會在最後（其他處理完成後）壓縮
+    from utils.compression import compress_response
+    app.after_request(compress_response)
+    
+    # 啟用 CORS - 允許所有來源和方法；預檢結果讓瀏覽器快取 CORS_MAX_AGE 秒（瀏覽器另有各自的上限）
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True,
+         max_age=int(os.getenv('CORS_MAX_AGE', '86400')))
+    
+    # 經反向代理（前端伺服器的 /api 代理、nginx 等）時，依 X-Forwarded-For 取得用戶端 IP（登入限流使用）；
+    # TRUSTED_PROXY_COUNT 為後端前方的代理層數，直接對外時必須為 0，否則用戶端可偽造 IP
+    trusted_proxies = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    if trusted_proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
     
     # 註冊藍圖
-    from .routes import auth, products, trade_requests, transactions, reviews, messages, reports, admin
+    from .routes import auth, products, categories, trade_requests, transactions, reviews, messages, reports, admin, batch
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(products.bp, url_prefix='/api/products')
+    app.register_blueprint(categories.bp, url_prefix='/api/categories')
     app.register_blueprint(trade_requests.bp, url_prefix='/api/trade-requests')
     app.register_blueprint(transactions.bp, url_prefix='/api/transactions')
     app.register_blueprint(reviews.bp, url_prefix='/api/reviews')
     app.register_blueprint(messages.bp, url_prefix='/api/messages')
     app.register_blueprint(reports.bp, url_prefix='/api/reports')
     app.register_blueprint(admin.bp, url_prefix='/api/admin')
+    app.register_blueprint(batch.bp, url_prefix='/api/batch')
+    
+    # 預先建立連線池的最小連線數；連線池耗盡（等待逾時）時回傳 503
+    from config.database import DatabaseConfig
+    from config.pool import PoolTimeout
+    DatabaseConfig.warm_postgres_pool()
+    
+    # 載入分類目錄（gunicorn --preload 時 worker 直接沿用）
+    from utils.categories import CategoryCatalog
+    CategoryCatalog.warm()
+    
+    # 路由的 except Exception 以 utils.errors.server_error 重新拋出 PoolTimeout，統一在此回傳 503
+    @app.errorhandler(PoolTimeout)
+    def handle_pool_timeout(error):
+        return jsonify({'error': str(error)}), 503
+    
+    # Prometheus 指標（/metrics）
+    from utils import metrics
+    app.before_request(metrics.begin_request)
+    app.after_request(metrics.finish_request)
+    app.teardown_request(metrics.end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics.metrics_view)
+    
+    # 取樣式請求分析（PROFILE_SAMPLE_RATE 或管理員的 X-Profile 標頭）
+    from utils import profiler
+    app.before_request(profiler.begin_request)
+    app.teardown_request(profiler.end_request)
+    
+    # 每個請求的 SQL 統計：Server-Timing 標頭、慢查詢與 N+1 紀錄
+    from utils.query_stats import begin_request, finish_request, end_request
+    app.before_request(begin_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    
+    # 記錄使用者的寫入，之後短時間內的唯讀端點改讀主資料庫（read-your-writes）
+    from utils.db_routing import record_write
+    app.after_request(record_write)
     
     # 根路由 - 用於測試
     @app.route('/')
@@ -32,12 +87,14 @@ def create_app():
             'endpoints': {
                 'auth': '/api/auth',
                 'products': '/api/products',
+                'categories': '/api/categories',
                 'trade-requests': '/api/trade-requests',
                 'transactions': '/api/transactions',
                 'reviews': '/api/reviews',
                 'messages': '/api/messages',
                 'reports': '/api/reports',
-                'admin': '/api/admin'
+                'admin': '/api/admin',
+                'batch': '/api/batch'
             }
         })
     
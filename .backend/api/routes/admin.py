@@ -2,36 +2,41 @@
 管理員相關 API
 根據 outline.tex 實作完整的管理員功能
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.database import DatabaseConfig
+from utils.errors import server_error
 from utils.auth import token_required
+from utils.prepared import execute_prepared, get_prepared_stats
+from utils.db_routing import read_only
+from utils.etag import etag_matches, with_etag, not_modified
+from utils.statistics import StatisticsSnapshot
+from utils.categories import CategoryCatalog
+from utils.admin_query import ListSpec, run_list_query
+from utils.fields import Field, FieldSet
+from utils.jobs import JobRunner
+from utils.passwords import get_hasher_stats
+from utils.profiler import get_profiles, get_collapsed_stacks, reset_profiles
 from functools import wraps
 
 bp = Blueprint('admin', __name__)
 
 def is_admin(user_id):
     """檢查是否為管理員"""
-    conn = DatabaseConfig.get_postgres_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT admin_id, role FROM admin WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
-    
-    DatabaseConfig.return_postgres_connection(conn)
+    with DatabaseConfig.connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, "SELECT admin_id, role FROM admin WHERE user_id = %s", (user_id,))
+        result = cursor.fetchone()
     return result is not None
 
 def get_admin_role(user_id):
     """取得管理員角色"""
-    conn = DatabaseConfig.get_postgres_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT role FROM admin WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
-    
-    DatabaseConfig.return_postgres_connection(conn)
+    with DatabaseConfig.connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, "SELECT role FROM admin WHERE user_id = %s", (user_id,))
+        result = cursor.fetchone()
     return result[0] if result else None
 
 def admin_required(f):
@@ -44,75 +49,202 @@ def admin_required(f):
         return f(user_id, *args, **kwargs)
     return decorated
 
+# ========== 列表查詢規格 ==========
+
+USER_LIST_SPEC = ListSpec(
+    table='"user"',
+    from_clause='"user" u',
+    primary_key='u.user_id',
+    sort_columns={
+        'register_date': 'u.register_date',
+        'user_id': 'u.user_id',
+        'user_name': 'u.user_name'
+    },
+    default_sort='-register_date',
+    search_columns=('u.user_name', 'u.email', 'u.student_id'),
+    status_column='u.status',
+    date_column='u.register_date'
+)
+
+PRODUCT_LIST_SPEC = ListSpec(
+    table='product',
+    from_clause="""product p
+        JOIN "user" u ON p.owner_id = u.user_id""",
+    primary_key='p.product_id',
+    sort_columns={
+        'post_date': 'p.post_date',
+        'product_id': 'p.product_id',
+        'product_name': 'p.product_name'
+    },
+    default_sort='-post_date',
+    search_columns=('p.product_name', 'u.user_name'),
+    status_column='p.status',
+    date_column='p.post_date'
+)
+
+TRANSACTION_LIST_SPEC = ListSpec(
+    table='transaction',
+    from_clause="""transaction t
+        JOIN trade_request tr ON t.request_id = tr.request_id
+        JOIN product p1 ON t.target_product_id = p1.product_id
+        LEFT JOIN product p2 ON t.offered_product_id = p2.product_id
+        JOIN "user" u1 ON tr.requester_id = u1.user_id
+        JOIN "user" u2 ON p1.owner_id = u2.user_id""",
+    primary_key='t.transaction_id',
+    sort_columns={
+        'complete_date': 't.complete_date',
+        'transaction_id': 't.transaction_id'
+    },
+    default_sort='-complete_date',
+    search_columns=('p1.product_name', 'u1.user_name', 'u2.user_name'),
+    status_column='t.payment_status',
+    date_column='t.complete_date'
+)
+
+REPORT_LIST_SPEC = ListSpec(
+    table='report',
+    from_clause="""report r
+        JOIN "user" u1 ON r.reporter_id = u1.user_id
+        LEFT JOIN "user" u2 ON r.reported_user_id = u2.user_id
+        LEFT JOIN product p ON r.reported_product_id = p.product_id""",
+    primary_key='r.report_id',
+    sort_columns={
+        'created_at': 'r.created_at',
+        'report_id': 'r.report_id'
+    },
+    default_sort='-created_at',
+    search_columns=('r.description', 'u1.user_name', 'u2.user_name', 'p.product_name'),
+    status_column='r.status',
+    date_column='r.created_at',
+    default_status='Pending'
+)
+
+# ========== 列表輸出欄位（fields= 參數） ==========
+
+USER_FIELDS = FieldSet(
+    'u.user_id',
+    Field('user_id', 'u.user_id'),
+    Field('user_name', 'u.user_name', 'u.deleted_at',
+          value=lambda row, context: row['u.user_name'] + (' (已刪除)' if row['u.deleted_at'] is not None else '')),
+    Field('student_id', 'u.student_id'),
+    Field('email', 'u.email'),
+    Field('phone', 'u.phone'),
+    Field('register_date', 'u.register_date'),
+    Field('status', 'u.status'),
+    Field('created_at', 'u.created_at'),
+    Field('deleted_at', 'u.deleted_at'),
+    Field('is_deleted', 'u.deleted_at', value=lambda row, context: row['u.deleted_at'] is not None)
+)
+
+PRODUCT_FIELDS = FieldSet(
+    'p.product_id',
+    Field('product_id', 'p.product_id'),
+    Field('owner_id', 'p.owner_id'),
+    Field('owner_name', 'u.user_name'),
+    Field('category_id', 'p.category_id'),
+    # 分類名稱由 CategoryCatalog 補上（context 為 CategorySnapshot），不 JOIN category
+    Field('category_name', 'p.category_id', value=lambda row, categories: categories.names.get(row['p.category_id'])),
+    Field('product_name', 'p.product_name'),
+    Field('price', 'p.price'),
+    Field('trade_option', 'p.trade_option'),
+    Field('condition', 'p.condition'),
+    Field('description', 'p.description'),
+    Field('trade_item', 'p.trade_item'),
+    Field('status', 'p.status'),
+    Field('image_url', 'p.image_url'),
+    Field('post_date', 'p.post_date'),
+    Field('created_at', 'p.created_at'),
+    Field('updated_at', 'p.updated_at')
+)
+
+TRANSACTION_FIELDS = FieldSet(
+    't.transaction_id',
+    Field('transaction_id', 't.transaction_id'),
+    Field('request_id', 't.request_id'),
+    Field('request_type', 'tr.request_type'),
+    Field('target_product_id', 't.target_product_id'),
+    Field('target_product_name', 'p1.product_name'),
+    Field('offered_product_id', 't.offered_product_id'),
+    Field('offered_product_name', 'p2.product_name'),
+    Field('total_price', 't.total_price'),
+    Field('complete_date', 't.complete_date'),
+    Field('payment_status', 't.payment_status'),
+    Field('buyer_name', 'u1.user_name'),
+    Field('seller_name', 'u2.user_name'),
+    Field('created_at', 't.created_at')
+)
+
+REPORT_FIELDS = FieldSet(
+    'r.report_id',
+    Field('report_id', 'r.report_id'),
+    Field('reporter_id', 'r.reporter_id'),
+    Field('reporter_name', 'u1.user_name'),
+    Field('reported_product_id', 'r.reported_product_id'),
+    Field('reported_product_name', 'p.product_name'),
+    Field('reported_user_id', 'r.reported_user_id'),
+    Field('reported_user_name', 'u2.user_name'),
+    Field('report_type', 'r.report_type'),
+    Field('description', 'r.description'),
+    Field('status', 'r.status'),
+    Field('created_at', 'r.created_at'),
+    Field('resolved_at', 'r.resolved_at')
+)
+
+def _list_page(spec, fields, category_column=None):
+    """
+    執行管理員列表查詢（依 fields 參數只查詢並輸出指定的欄位），回傳分頁回應；參數無效時拋出 ValueError
+    category_column：結果中的 category_id 欄位，分類名稱由 CategoryCatalog 補上（歸還連線後才查詢對照表）
+    """
+    projection = fields.select(request.args.get('fields'))
+    with DatabaseConfig.connection() as conn:
+        page = run_list_query(conn.cursor(), spec, projection.sql, request.args)
+    categories = None
+    if category_column:
+        categories = CategoryCatalog.current(projection.column_values(page['rows'], category_column))
+    return _page_response(page, [projection.item(row, categories) for row in page['rows']])
+
+def _page_response(page, items):
+    """組合分頁回應"""
+    return {
+        'items': items,
+        'next_cursor': page['next_cursor'],
+        'total': page['total'],
+        'total_is_estimate': page['total_is_estimate']
+    }
+
 # ========== 用戶管理 ==========
 
 @bp.route('/users', methods=['GET'])
 @admin_required
+@read_only
 def get_users(user_id):
-    """查詢所有使用者"""
+    """查詢使用者（支援 q、status、date_from、date_to、sort、limit、cursor、fields）"""
     try:
-        status = request.args.get('status')  # 可選：'active' 或 'suspended'
-        
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            cursor.execute("""
-                SELECT user_id, user_name, student_id, email, phone, 
-                       register_date, status, created_at, deleted_at
-                FROM "user"
-                WHERE status = %s
-                ORDER BY register_date DESC
-            """, (status,))
-        else:
-            cursor.execute("""
-                SELECT user_id, user_name, student_id, email, phone, 
-                       register_date, status, created_at, deleted_at
-                FROM "user"
-                ORDER BY register_date DESC
-            """)
-        
-        users = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
-        
-        result = []
-        for u in users:
-            is_deleted = u[8] is not None if len(u) > 8 else False
-            result.append({
-                'user_id': u[0],
-                'user_name': u[1] + (' (已刪除)' if is_deleted else ''),
-                'student_id': u[2],
-                'email': u[3],
-                'phone': u[4],
-                'register_date': u[5].isoformat() if u[5] else None,
-                'status': u[6],
-                'created_at': u[7].isoformat() if u[7] else None,
-                'deleted_at': u[8].isoformat() if len(u) > 8 and u[8] else None,
-                'is_deleted': is_deleted
-            })
-        
-        return jsonify(result), 200
+        try:
+            return jsonify(_list_page(USER_LIST_SPEC, USER_FIELDS)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/users/<int:target_user_id>', methods=['GET'])
 @admin_required
+@read_only
 def get_user(user_id, target_user_id):
     """查詢單一使用者資訊"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT user_id, user_name, student_id, email, phone, 
-                   register_date, status, created_at, deleted_at
-            FROM "user"
-            WHERE user_id = %s
-        """, (target_user_id,))
-        
-        u = cursor.fetchone()
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, user_name, student_id, email, phone, 
+                       register_date, status, created_at, deleted_at
+                FROM "user"
+                WHERE user_id = %s
+            """, (target_user_id,))
+            
+            u = cursor.fetchone()
         
         if not u:
             return jsonify({'error': '使用者不存在'}), 404
@@ -124,287 +256,164 @@ def get_user(user_id, target_user_id):
             'student_id': u[2],
             'email': u[3],
             'phone': u[4],
-            'register_date': u[5].isoformat() if u[5] else None,
+            'register_date': u[5],
             'status': u[6],
-            'created_at': u[7].isoformat() if u[7] else None,
-            'deleted_at': u[8].isoformat() if len(u) > 8 and u[8] else None,
+            'created_at': u[7],
+            'deleted_at': u[8] if len(u) > 8 else None,
             'is_deleted': is_deleted
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/users/<int:target_user_id>/suspend', methods=['POST'])
 @admin_required
 def suspend_user(user_id, target_user_id):
     """停權使用者"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE "user"
-            SET status = 'suspended', updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = %s
-        """, (target_user_id,))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE "user"
+                SET status = 'suspended', updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = %s
+            """, (target_user_id,))
+            
+            conn.commit()
         
         return jsonify({'message': '使用者已停權'}), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/users/<int:target_user_id>/activate', methods=['POST'])
 @admin_required
 def activate_user(user_id, target_user_id):
     """恢復使用者帳號"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE "user"
-            SET status = 'active', updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = %s
-        """, (target_user_id,))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE "user"
+                SET status = 'active', updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = %s
+            """, (target_user_id,))
+            
+            conn.commit()
         
         return jsonify({'message': '使用者帳號已恢復'}), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/users/<int:target_user_id>', methods=['DELETE'])
 @admin_required
 def delete_user(user_id, target_user_id):
-    """管理員刪除使用者帳號（完全刪除，會連帶刪除相關資料）"""
-    conn = None
+    """管理員刪除使用者帳號（完全刪除，建立背景工作分批刪除相關資料）"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        # 確保連線不在事務中
-        conn.rollback()  # 清除任何未完成的事務
-        cursor = conn.cursor()
-        
         # 不能刪除自己
         if target_user_id == user_id:
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '不能刪除自己的帳號'}), 400
         
-        # 檢查使用者是否存在
-        cursor.execute("SELECT user_id, user_name FROM \"user\" WHERE user_id = %s", (target_user_id,))
-        user = cursor.fetchone()
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查使用者是否存在
+            cursor.execute("SELECT user_id, user_name FROM \"user\" WHERE user_id = %s", (target_user_id,))
+            user = cursor.fetchone()
         
         if not user:
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '使用者不存在'}), 404
         
-        # 檢查是否有進行中的交易請求（作為請求者或商品擁有者）
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM trade_request tr
-            LEFT JOIN product p ON tr.target_product_id = p.product_id
-            WHERE (tr.requester_id = %s OR p.owner_id = %s)
-            AND tr.status IN ('Pending', 'Accepted')
-        """, (target_user_id, target_user_id))
-        
-        active_requests = cursor.fetchone()[0]
-        
-        if active_requests > 0:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({
-                'error': '無法刪除帳號：該使用者有進行中的交易請求，請先處理完所有交易請求後再刪除'
-            }), 400
-        
-        # 檢查是否有已完成的交易
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM transaction t
-            JOIN trade_request tr ON t.request_id = tr.request_id
-            LEFT JOIN product p ON t.target_product_id = p.product_id
-            WHERE tr.requester_id = %s OR p.owner_id = %s
-        """, (target_user_id, target_user_id))
-        
-        completed_transactions = cursor.fetchone()[0]
-        
-        # 關閉 cursor 並開始新的事務
-        cursor.close()
-        
-        # 開始事務
-        conn.autocommit = False
-        cursor = conn.cursor()
-        
-        # 根據 CASCADE 設定，刪除使用者會自動：
-        # 1. 刪除 product（owner_id = 此使用者）
-        # 2. 刪除 trade_request（requester_id = 此使用者）
-        # 3. 刪除 trade_wish（user_id = 此使用者）
-        # 4. 刪除 review（reviewer_id 或 reviewee_id = 此使用者）
-        # 5. 刪除 message（sender_id 或 receiver_id = 此使用者）
-        # 6. 刪除 report（reporter_id = 此使用者）
-        # 7. 刪除 admin（user_id = 此使用者）
-        # 8. report.reported_user_id 會設為 NULL（SET NULL）
-        
-        # 刪除使用者（CASCADE 會自動處理相關資料）
-        cursor.execute("DELETE FROM \"user\" WHERE user_id = %s", (target_user_id,))
-        
-        deleted_count = cursor.rowcount
-        
-        if deleted_count == 0:
-            conn.rollback()
-            cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '刪除失敗'}), 500
-        
-        conn.commit()
-        cursor.close()
-        DatabaseConfig.return_postgres_connection(conn)
+        # 先檢查進行中的交易請求（不通過時不建立工作），CASCADE 刪除在背景工作中分批執行
+        error = JobRunner.validation_error('delete_user', target_user_id)
+        if error:
+            return jsonify({'error': error}), 400
+        job_id = JobRunner.enqueue('delete_user', target_user_id, user_id)
         
         return jsonify({
-            'message': f'使用者 {user[1]} 已完全刪除',
-            'note': '相關的商品、交易請求、訊息、評價等資料已一併刪除',
-            'completed_transactions_deleted': completed_transactions > 0
-        }), 200
+            'message': f'使用者 {user[1]} 的刪除工作已建立',
+            'note': '相關的商品、交易請求、訊息、評價等資料將在背景分批刪除',
+            'job_id': job_id,
+            'status_url': f'/api/admin/jobs/{job_id}'
+        }), 202
         
     except Exception as e:
-        if conn:
-            try:
-                conn.rollback()
-            except:
-                pass
-            try:
-                if 'cursor' in locals():
-                    cursor.close()
-            except:
-                pass
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_job(user_id, job_id):
+    """查詢背景工作進度"""
+    try:
+        job = JobRunner.get_job(job_id)
+        if not job:
+            return jsonify({'error': '工作不存在'}), 404
+        return jsonify(job), 200
+        
+    except Exception as e:
+        return server_error(e)
 
 # ========== 商品管理 ==========
 
 @bp.route('/products', methods=['GET'])
 @admin_required
+@read_only
 def get_all_products(user_id):
-    """查詢所有商品（管理員用）"""
+    """查詢商品（管理員用，支援 q、status、date_from、date_to、sort、limit、cursor、fields）"""
     try:
-        status = request.args.get('status')
-        
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            query = """
-                SELECT p.*, u.user_name, c.category_name
-                FROM product p
-                JOIN "user" u ON p.owner_id = u.user_id
-                JOIN category c ON p.category_id = c.category_id
-                WHERE p.status = %s
-                ORDER BY p.post_date DESC
-            """
-            cursor.execute(query, (status,))
-        else:
-            query = """
-                SELECT p.*, u.user_name, c.category_name
-                FROM product p
-                JOIN "user" u ON p.owner_id = u.user_id
-                JOIN category c ON p.category_id = c.category_id
-                ORDER BY p.post_date DESC
-            """
-            cursor.execute(query)
-        
-        products = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
-        
-        result = []
-        for p in products:
-            result.append({
-                'product_id': p[0],
-                'owner_id': p[1],
-                'owner_name': p[14],
-                'category_id': p[2],
-                'category_name': p[15],
-                'product_name': p[3],
-                'price': p[4],
-                'trade_option': p[5],
-                'condition': p[6],
-                'description': p[7],
-                'trade_item': p[8],
-                'status': p[9],
-                'image_url': p[10],
-                'post_date': p[11].isoformat() if p[11] else None,
-                'created_at': p[12].isoformat() if p[12] else None,
-                'updated_at': p[13].isoformat() if p[13] else None
-            })
-        
-        return jsonify(result), 200
+        try:
+            return jsonify(_list_page(PRODUCT_LIST_SPEC, PRODUCT_FIELDS, 'p.category_id')), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/products/<int:product_id>', methods=['DELETE'])
 @admin_required
 def delete_product(user_id, product_id):
     """管理員刪除商品（完全刪除，會連帶刪除相關資料）"""
-    conn = None
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        # 確保連線不在事務中
-        conn.rollback()  # 清除任何未完成的事務
-        cursor = conn.cursor()
-        
-        # 檢查商品是否存在
-        cursor.execute("SELECT product_id FROM product WHERE product_id = %s", (product_id,))
-        product = cursor.fetchone()
-        
-        if not product:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '商品不存在'}), 404
-        
-        # 檢查是否有進行中的交易請求
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM trade_request 
-            WHERE (target_product_id = %s OR offered_product_id = %s)
-            AND status IN ('Pending', 'Accepted')
-        """, (product_id, product_id))
-        
-        active_requests = cursor.fetchone()[0]
-        
-        if active_requests > 0:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({
-                'error': '無法刪除商品：該商品有進行中的交易請求'
-            }), 400
-        
-        # 關閉 cursor 並開始新的事務
-        cursor.close()
-        
-        # 開始事務
-        conn.autocommit = False
-        cursor = conn.cursor()
-        
-        # 刪除商品（CASCADE 會自動處理相關資料）
-        cursor.execute("DELETE FROM product WHERE product_id = %s", (product_id,))
-        
-        deleted_count = cursor.rowcount
-        
-        if deleted_count == 0:
-            conn.rollback()
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查商品是否存在
+            cursor.execute("SELECT product_id FROM product WHERE product_id = %s", (product_id,))
+            product = cursor.fetchone()
+            
+            if not product:
+                return jsonify({'error': '商品不存在'}), 404
+            
+            # 檢查是否有進行中的交易請求
+            cursor.execute("""
+                SELECT COUNT(*) 
+                FROM trade_request 
+                WHERE (target_product_id = %s OR offered_product_id = %s)
+                AND status IN ('Pending', 'Accepted')
+            """, (product_id, product_id))
+            
+            active_requests = cursor.fetchone()[0]
+            
+            if active_requests > 0:
+                return jsonify({
+                    'error': '無法刪除商品：該商品有進行中的交易請求'
+                }), 400
+            
+            # 刪除商品（CASCADE 會自動處理相關資料）
+            cursor.execute("DELETE FROM product WHERE product_id = %s", (product_id,))
+            
+            deleted_count = cursor.rowcount
+            
+            if deleted_count == 0:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': '刪除失敗'}), 500
+            
+            conn.commit()
             cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '刪除失敗'}), 500
-        
-        conn.commit()
-        cursor.close()
-        DatabaseConfig.return_postgres_connection(conn)
         
         return jsonify({
             'message': '商品已完全刪除',
@@ -412,18 +421,7 @@ def delete_product(user_id, product_id):
         }), 200
         
     except Exception as e:
-        if conn:
-            try:
-                conn.rollback()
-            except:
-                pass
-            try:
-                if 'cursor' in locals():
-                    cursor.close()
-            except:
-                pass
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/products/<int:product_id>/status', methods=['PUT'])
 @admin_required
@@ -437,57 +435,46 @@ def update_product_status(user_id, product_id):
         if not status:
             return jsonify({'error': '缺少狀態參數'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE product
-            SET status = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE product_id = %s
-        """, (status, product_id))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE product
+                SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE product_id = %s
+            """, (status, product_id))
+            
+            conn.commit()
         
         return jsonify({'message': '商品狀態已更新'}), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 # ========== 分類管理 ==========
 
 @bp.route('/categories', methods=['GET'])
 @admin_required
 def get_categories(user_id):
-    """查詢所有分類"""
+    """查詢所有分類（來自分類目錄；新增 / 修改 / 刪除分類時已使目錄失效，下次讀取會從主資料庫重新載入）"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT category_id, category_name, created_at
-            FROM category
-            ORDER BY category_id
-        """)
-        
-        categories = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
+        snapshot = CategoryCatalog.current()
+        etag = snapshot.version
+        if etag_matches(request, etag):
+            return not_modified(current_app.response_class, etag, private=True)
         
         result = []
-        for c in categories:
+        for c in snapshot.rows:
             result.append({
                 'category_id': c[0],
                 'category_name': c[1],
-                'created_at': c[2].isoformat() if c[2] else None
+                'created_at': c[2]
             })
         
-        return jsonify(result), 200
+        return with_etag(jsonify(result), etag, private=True), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/categories', methods=['POST'])
 @admin_required
@@ -505,35 +492,31 @@ def create_category(user_id):
         if category_name not in valid_categories:
             return jsonify({'error': f'無效的分類名稱，必須是以下之一: {", ".join(valid_categories)}'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查是否已存在
-        cursor.execute("SELECT category_id FROM category WHERE category_name = %s", (category_name,))
-        if cursor.fetchone():
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '分類已存在'}), 400
-        
-        cursor.execute("""
-            INSERT INTO category (category_name)
-            VALUES (%s)
-            RETURNING category_id
-        """, (category_name,))
-        
-        category_id = cursor.fetchone()[0]
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
-        
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查是否已存在
+            cursor.execute("SELECT category_id FROM category WHERE category_name = %s", (category_name,))
+            if cursor.fetchone():
+                return jsonify({'error': '分類已存在'}), 400
+            
+            cursor.execute("""
+                INSERT INTO category (category_name)
+                VALUES (%s)
+                RETURNING category_id
+            """, (category_name,))
+            
+            category_id = cursor.fetchone()[0]
+            conn.commit()
+        
+        CategoryCatalog.invalidate()
         return jsonify({
             'message': '分類新增成功',
             'category_id': category_id
         }), 201
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/categories/<int:category_id>', methods=['PUT'])
 @admin_required
@@ -551,253 +534,145 @@ def update_category(user_id, category_id):
         if category_name not in valid_categories:
             return jsonify({'error': f'無效的分類名稱，必須是以下之一: {", ".join(valid_categories)}'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查分類是否存在
-        cursor.execute("SELECT category_id FROM category WHERE category_id = %s", (category_id,))
-        if not cursor.fetchone():
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '分類不存在'}), 404
-        
-        cursor.execute("""
-            UPDATE category
-            SET category_name = %s
-            WHERE category_id = %s
-        """, (category_name, category_id))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
-        
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查分類是否存在
+            cursor.execute("SELECT category_id FROM category WHERE category_id = %s", (category_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': '分類不存在'}), 404
+            
+            cursor.execute("""
+                UPDATE category
+                SET category_name = %s
+                WHERE category_id = %s
+            """, (category_name, category_id))
+            
+            conn.commit()
+        
+        CategoryCatalog.invalidate()
         return jsonify({'message': '分類已更新'}), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/categories/<int:category_id>', methods=['DELETE'])
 @admin_required
 def delete_category(user_id, category_id):
     """刪除分類"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查是否有商品使用此分類
-        cursor.execute("SELECT COUNT(*) FROM product WHERE category_id = %s", (category_id,))
-        count = cursor.fetchone()[0]
-        
-        if count > 0:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': f'無法刪除，仍有 {count} 個商品使用此分類'}), 400
-        
-        cursor.execute("DELETE FROM category WHERE category_id = %s", (category_id,))
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
-        
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查是否有商品使用此分類
+            cursor.execute("SELECT COUNT(*) FROM product WHERE category_id = %s", (category_id,))
+            count = cursor.fetchone()[0]
+            
+            if count > 0:
+                return jsonify({'error': f'無法刪除，仍有 {count} 個商品使用此分類'}), 400
+            
+            cursor.execute("DELETE FROM category WHERE category_id = %s", (category_id,))
+            conn.commit()
+        
+        CategoryCatalog.invalidate()
         return jsonify({'message': '分類已刪除'}), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 # ========== 交易監控 ==========
 
 @bp.route('/transactions', methods=['GET'])
 @admin_required
+@read_only
 def get_all_transactions(user_id):
-    """查詢所有交易紀錄"""
+    """查詢交易紀錄（status 為付款狀態：'Paid', 'Unpaid', 'NA'；支援 q、date_from、date_to、sort、limit、cursor、fields）"""
     try:
-        status = request.args.get('status')  # 可選：'Paid', 'Unpaid', 'NA'
-        
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            query = """
-                SELECT t.*, tr.request_type, 
-                       p1.product_name as target_product_name,
-                       p2.product_name as offered_product_name,
-                       u1.user_name as buyer_name,
-                       u2.user_name as seller_name
-                FROM transaction t
-                JOIN trade_request tr ON t.request_id = tr.request_id
-                JOIN product p1 ON t.target_product_id = p1.product_id
-                LEFT JOIN product p2 ON t.offered_product_id = p2.product_id
-                JOIN "user" u1 ON tr.requester_id = u1.user_id
-                JOIN "user" u2 ON p1.owner_id = u2.user_id
-                WHERE t.payment_status = %s
-                ORDER BY t.complete_date DESC
-            """
-            cursor.execute(query, (status,))
-        else:
-            query = """
-                SELECT t.*, tr.request_type, 
-                       p1.product_name as target_product_name,
-                       p2.product_name as offered_product_name,
-                       u1.user_name as buyer_name,
-                       u2.user_name as seller_name
-                FROM transaction t
-                JOIN trade_request tr ON t.request_id = tr.request_id
-                JOIN product p1 ON t.target_product_id = p1.product_id
-                LEFT JOIN product p2 ON t.offered_product_id = p2.product_id
-                JOIN "user" u1 ON tr.requester_id = u1.user_id
-                JOIN "user" u2 ON p1.owner_id = u2.user_id
-                ORDER BY t.complete_date DESC
-            """
-            cursor.execute(query)
-        
-        transactions = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
-        
-        result = []
-        for t in transactions:
-            result.append({
-                'transaction_id': t[0],
-                'request_id': t[1],
-                'request_type': t[8],
-                'target_product_id': t[2],
-                'target_product_name': t[9],
-                'offered_product_id': t[3],
-                'offered_product_name': t[10],
-                'total_price': t[4],
-                'complete_date': t[5].isoformat() if t[5] else None,
-                'payment_status': t[6],
-                'buyer_name': t[11],
-                'seller_name': t[12],
-                'created_at': t[7].isoformat() if t[7] else None
-            })
-        
-        return jsonify(result), 200
+        try:
+            return jsonify(_list_page(TRANSACTION_LIST_SPEC, TRANSACTION_FIELDS)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 # ========== 系統統計 ==========
 
 @bp.route('/statistics', methods=['GET'])
 @admin_required
 def get_statistics(user_id):
-    """取得平台統計資料"""
+    """取得平台統計資料（背景刷新的快照，?fresh=1 強制重新計算）"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 總使用者數
-        cursor.execute("SELECT COUNT(*) FROM \"user\" WHERE status = 'active'")
-        total_users = cursor.fetchone()[0]
-        
-        # 總商品數
-        cursor.execute("SELECT COUNT(*) FROM product WHERE status = 'available'")
-        total_products = cursor.fetchone()[0]
-        
-        # 總交易數
-        cursor.execute("SELECT COUNT(*) FROM transaction")
-        total_transactions = cursor.fetchone()[0]
-        
-        # 待處理檢舉數
-        cursor.execute("SELECT COUNT(*) FROM report WHERE status = 'Pending'")
-        pending_reports = cursor.fetchone()[0]
-        
-        # 各分類商品數
-        cursor.execute("""
-            SELECT c.category_name, COUNT(p.product_id) as count
-            FROM category c
-            LEFT JOIN product p ON c.category_id = p.category_id AND p.status = 'available'
-            GROUP BY c.category_id, c.category_name
-            ORDER BY count DESC
-        """)
-        category_stats = []
-        for row in cursor.fetchall():
-            category_stats.append({
-                'category_name': row[0],
-                'count': row[1]
-            })
+        fresh = request.args.get('fresh') in ('1', 'true')
+        return jsonify(StatisticsSnapshot.get(fresh=fresh)), 200
         
-        # 最近一週新增商品數
-        cursor.execute("""
-            SELECT COUNT(*) FROM product
-            WHERE post_date >= CURRENT_DATE - INTERVAL '7 days'
-        """)
-        products_last_week = cursor.fetchone()[0]
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/system', methods=['GET'])
+@admin_required
+def get_system_metrics(user_id):
+    """取得系統執行狀態（資料庫連線池、預備敘述、密碼雜湊佇列等）"""
+    try:
+        return jsonify({
+            'postgres_pool': DatabaseConfig.get_pool_stats(),
+            'password_hasher': get_hasher_stats(),
+            'prepared_statements': get_prepared_stats()
+        }), 200
         
-        # 最近一週交易數
-        cursor.execute("""
-            SELECT COUNT(*) FROM transaction
-            WHERE complete_date >= CURRENT_DATE - INTERVAL '7 days'
-        """)
-        transactions_last_week = cursor.fetchone()[0]
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles(user_id):
+    """取得各路由的取樣分析摘要"""
+    try:
+        return jsonify(get_profiles()), 200
         
-        DatabaseConfig.return_postgres_connection(conn)
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/profiles/<route>', methods=['GET'])
+@admin_required
+def get_profile(user_id, route):
+    """取得路由的 collapsed stack（可交給 flamegraph.pl / speedscope 產生火焰圖）"""
+    try:
+        stacks = get_collapsed_stacks(route)
+        if stacks is None:
+            return jsonify({'error': '此路由沒有取樣資料'}), 404
+        return Response(stacks, mimetype='text/plain'), 200
         
-        return jsonify({
-            'total_users': total_users,
-            'total_products': total_products,
-            'total_transactions': total_transactions,
-            'pending_reports': pending_reports,
-            'category_statistics': category_stats,
-            'products_last_week': products_last_week,
-            'transactions_last_week': transactions_last_week
-        }), 200
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/profiles', methods=['DELETE'])
+@admin_required
+def clear_profiles(user_id):
+    """清除取樣資料"""
+    try:
+        reset_profiles()
+        return jsonify({'message': '取樣資料已清除'}), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 # ========== 檢舉管理 ==========
 
 @bp.route('/reports', methods=['GET'])
 @admin_required
+@read_only
 def get_pending_reports(user_id):
-    """查詢待處理檢舉"""
+    """查詢檢舉（預設 status=Pending，status=all 查詢全部；支援 q、date_from、date_to、sort、limit、cursor、fields）"""
     
     try:
-        status = request.args.get('status', 'Pending')
-        
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT r.report_id, r.reporter_id, r.reported_product_id, r.reported_user_id,
-                   r.report_type, r.description, r.status, r.created_at, r.resolved_at,
-                   u1.user_name as reporter_name,
-                   u2.user_name as reported_user_name, 
-                   p.product_name as reported_product_name
-            FROM report r
-            JOIN "user" u1 ON r.reporter_id = u1.user_id
-            LEFT JOIN "user" u2 ON r.reported_user_id = u2.user_id
-            LEFT JOIN product p ON r.reported_product_id = p.product_id
-            WHERE r.status = %s
-            ORDER BY r.created_at DESC
-        """, (status,))
-        
-        reports = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
-        
-        result = []
-        for r in reports:
-            result.append({
-                'report_id': r[0],
-                'reporter_id': r[1],
-                'reporter_name': r[9],
-                'reported_product_id': r[2],
-                'reported_product_name': r[11],
-                'reported_user_id': r[3],
-                'reported_user_name': r[10],
-                'report_type': r[4],
-                'description': r[5],
-                'status': r[6],
-                'created_at': r[7].isoformat() if r[7] else None,
-                'resolved_at': r[8].isoformat() if r[8] else None
-            })
-        
-        return jsonify(result), 200
+        try:
+            return jsonify(_list_page(REPORT_LIST_SPEC, REPORT_FIELDS)), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/reports/<int:report_id>/resolve', methods=['POST'])
 @admin_required
@@ -811,23 +686,142 @@ def resolve_report(user_id, report_id):
         if not status or status not in ('Resolved', 'Rejected'):
             return jsonify({'error': '無效的狀態'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE report
+                SET status = %s, resolved_at = CURRENT_TIMESTAMP
+                WHERE report_id = %s
+            """, (status, report_id))
+            
+            conn.commit()
+        
+        return jsonify({'message': '檢舉已處理'}), 200
+        
+    except Exception as e:
+        return server_error(e)
+
+
+# ========== 批次管理 ==========
+
+# 單次批次操作的 id 上限
+BULK_MAX_IDS = 1000
+
+PRODUCT_STATUSES = ('available', 'reserved', 'sold', 'exchanged', 'removed')
+
+def _parse_id_list(data, key):
+    """解析並驗證 id 清單（去除重複、保留順序）"""
+    ids = (data or {}).get(key)
+    if not isinstance(ids, list) or not ids:
+        raise ValueError(f'{key} 必須為非空的 id 陣列')
+    if len(ids) > BULK_MAX_IDS:
+        raise ValueError(f'{key} 一次最多 {BULK_MAX_IDS} 筆')
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f'{key} 只能包含整數 id')
+    return list(dict.fromkeys(ids))
+
+def _bulk_update(query, params, ids, id_key):
+    """
+    在單一事務中以 UPDATE ... WHERE id = ANY(%s) RETURNING id 批次更新
+    回傳每個 id 的處理結果（updated / not_found）
+    """
+    with DatabaseConfig.transaction() as conn:
         cursor = conn.cursor()
+        cursor.execute(query, params + [ids])
+        updated = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    
+    return {
+        'updated_count': len(updated),
+        'not_found_count': len(ids) - len(updated),
+        'results': [
+            {id_key: i, 'outcome': 'updated' if i in updated else 'not_found'}
+            for i in ids
+        ]
+    }
+
+@bp.route('/users/bulk/<action>', methods=['POST'])
+@admin_required
+def bulk_update_user_status(user_id, action):
+    """批次停權（suspend）或恢復（activate）使用者"""
+    try:
+        status = {'suspend': 'suspended', 'activate': 'active'}.get(action)
+        if not status:
+            return jsonify({'error': '無效的操作，必須是 suspend 或 activate'}), 404
         
-        cursor.execute("""
-            UPDATE report
-            SET status = %s, resolved_at = CURRENT_TIMESTAMP
-            WHERE report_id = %s
-        """, (status, report_id))
+        try:
+            ids = _parse_id_list(request.get_json(silent=True), 'user_ids')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
+        result = _bulk_update("""
+            UPDATE "user"
+            SET status = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ANY(%s)
+            RETURNING user_id
+        """, [status], ids, 'user_id')
         
-        return jsonify({'message': '檢舉已處理'}), 200
+        result['message'] = f'已{"停權" if action == "suspend" else "恢復"} {result["updated_count"]} 位使用者'
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/products/bulk/status', methods=['PUT'])
+@admin_required
+def bulk_update_product_status(user_id):
+    """批次更新商品狀態"""
+    try:
+        data = request.get_json(silent=True)
+        status = (data or {}).get('status')
+        
+        if status not in PRODUCT_STATUSES:
+            return jsonify({'error': f'無效的狀態，必須是以下之一: {", ".join(PRODUCT_STATUSES)}'}), 400
+        
+        try:
+            ids = _parse_id_list(data, 'product_ids')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = _bulk_update("""
+            UPDATE product
+            SET status = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE product_id = ANY(%s)
+            RETURNING product_id
+        """, [status], ids, 'product_id')
+        
+        result['message'] = f'已更新 {result["updated_count"]} 個商品狀態'
+        return jsonify(result), 200
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
+@bp.route('/reports/bulk/resolve', methods=['POST'])
+@admin_required
+def bulk_resolve_reports(user_id):
+    """批次處理檢舉"""
+    try:
+        data = request.get_json(silent=True)
+        status = (data or {}).get('status')  # 'Resolved' or 'Rejected'
+        
+        if status not in ('Resolved', 'Rejected'):
+            return jsonify({'error': '無效的狀態'}), 400
+        
+        try:
+            ids = _parse_id_list(data, 'report_ids')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = _bulk_update("""
+            UPDATE report
+            SET status = %s, resolved_at = CURRENT_TIMESTAMP
+            WHERE report_id = ANY(%s)
+            RETURNING report_id
+        """, [status], ids, 'report_id')
+        
+        result['message'] = f'已處理 {result["updated_count"]} 筆檢舉'
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return server_error(e)
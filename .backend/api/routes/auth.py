@@ -2,15 +2,45 @@
 使用者認證相關 API
 """
 from flask import Blueprint, request, jsonify
+import psycopg2.errors
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.database import DatabaseConfig
+from utils.errors import server_error
 from utils.auth import generate_token, token_required
-import bcrypt
+from utils.prepared import execute_prepared
+from utils.jobs import JobRunner
+from utils.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
+from utils.rate_limit import check_login_attempt, reset_login_attempts
 
 bp = Blueprint('auth', __name__)
 
+# 註冊時可能衝突的唯一約束（schema.sql 中欄位層級 UNIQUE 的預設名稱）與對應欄位、訊息
+REGISTER_CONFLICTS = {
+    'user_email_key': ('email', 'Email 已被註冊'),
+    'user_student_id_key': ('student_id', '學號已被註冊')
+}
+
+# 雜湊密碼前的預先檢查（順序與 REGISTER_CONFLICTS 相同）；兩個探測各自使用單一唯一索引，不使用 OR 條件
+REGISTER_CHECK_QUERY = """
+    SELECT EXISTS (SELECT 1 FROM "user" WHERE email = %(email)s),
+           EXISTS (SELECT 1 FROM "user" WHERE student_id = %(student_id)s)
+"""
+
+REGISTER_QUERY = """
+    INSERT INTO "user" (user_name, student_id, email, password, phone, register_date)
+    VALUES (%(user_name)s, %(student_id)s, %(email)s, %(password)s, %(phone)s, CURRENT_DATE)
+    RETURNING user_id, user_name, email, student_id
+"""
+
+def _conflict_response(constraint_names):
+    """唯一約束衝突的 409 回應（error 與 fields 依衝突的約束產生）"""
+    return jsonify({
+        'error': '、'.join(REGISTER_CONFLICTS[name][1] for name in constraint_names),
+        'fields': [REGISTER_CONFLICTS[name][0] for name in constraint_names]
+    }), 409
+
 @bp.route('/register', methods=['POST'])
 def register():
     """使用者註冊"""
@@ -25,30 +55,34 @@ def register():
         if not all([user_name, student_id, email, password]):
             return jsonify({'error': '缺少必要欄位'}), 400
         
-        # 檢查 email 和 student_id 是否已存在
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT user_id FROM \"user\" WHERE email = %s OR student_id = %s", 
-                      (email, student_id))
-        if cursor.fetchone():
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': 'Email 或學號已存在'}), 400
-        
-        # 加密密碼
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        # 插入新使用者
-        cursor.execute("""
-            INSERT INTO "user" (user_name, student_id, email, password, phone, register_date)
-            VALUES (%s, %s, %s, %s, %s, CURRENT_DATE)
-            RETURNING user_id, user_name, email, student_id
-        """, (user_name, student_id, email, hashed_password, phone))
-        
-        user = cursor.fetchone()
-        conn.commit()
-        
-        DatabaseConfig.return_postgres_connection(conn)
+        # 先以索引檢查重複，已註冊的 email / 學號不必花費一次 bcrypt（雜湊執行緒池有上限）
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            execute_prepared(cursor, REGISTER_CHECK_QUERY, {'email': email, 'student_id': student_id})
+            exists = cursor.fetchone()
+        conflicts = [name for name, found in zip(REGISTER_CONFLICTS, exists) if found]
+        if conflicts:
+            return _conflict_response(conflicts)
+        
+        # 加密密碼（在取得資料庫連線之前，避免雜湊時佔用連線）
+        hashed_password = hash_password(password)
+        
+        # 預先檢查之後的並行註冊由唯一約束擋下，依違反的約束名稱回報衝突的欄位
+        try:
+            with DatabaseConfig.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(REGISTER_QUERY, {
+                    'user_name': user_name,
+                    'student_id': student_id,
+                    'email': email,
+                    'password': hashed_password,
+                    'phone': phone
+                })
+                user = cursor.fetchone()
+        except psycopg2.errors.UniqueViolation as e:
+            if e.diag.constraint_name not in REGISTER_CONFLICTS:
+                raise
+            return _conflict_response([e.diag.constraint_name])
         
         return jsonify({
             'message': '註冊成功',
@@ -60,11 +94,10 @@ def register():
             }
         }), 201
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/login', methods=['POST'])
 def login():
@@ -77,42 +110,47 @@ def login():
         if not email or not password:
             return jsonify({'error': '請提供 email 和密碼'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT user_id, user_name, email, password, status, student_id, deleted_at
-            FROM "user"
-            WHERE email = %s
-        """, (email,))
-        
-        user = cursor.fetchone()
+        # 限流：在查詢資料庫與驗證密碼之前拒絕過量的嘗試
+        retry_after = check_login_attempt(email, request.remote_addr)
+        if retry_after:
+            response = jsonify({'error': f'登入嘗試次數過多，請於 {retry_after} 秒後再試'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+        
+        # 一次取得使用者與管理員角色；在驗證密碼之前歸還連線，bcrypt 計算期間不佔用連線池
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            execute_prepared(cursor, """
+                SELECT u.user_id, u.user_name, u.email, u.password, u.status, u.student_id, u.deleted_at,
+                       a.role
+                FROM "user" u
+                LEFT JOIN admin a ON a.user_id = u.user_id
+                WHERE u.email = %s
+            """, (email,))
+            user = cursor.fetchone()
         
         if not user:
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': 'Email 或密碼錯誤'}), 401
         
         # 檢查帳號是否已刪除
         if user[6] is not None:  # deleted_at 不為 NULL
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '帳號已被刪除，無法登入'}), 403
         
         if user[4] != 'active':
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '帳號已被停權'}), 403
         
         # 驗證密碼
-        if not bcrypt.checkpw(password.encode('utf-8'), user[3].encode('utf-8')):
-            DatabaseConfig.return_postgres_connection(conn)
+        if not verify_password(password, user[3]):
             return jsonify({'error': 'Email 或密碼錯誤'}), 401
         
-        # 檢查是否為管理員
-        cursor.execute("SELECT role FROM admin WHERE user_id = %s", (user[0],))
-        admin_result = cursor.fetchone()
-        is_admin = admin_result is not None
-        admin_role = admin_result[0] if admin_result else None
+        reset_login_attempts(email, request.remote_addr)
         
-        DatabaseConfig.return_postgres_connection(conn)
+        # bcrypt cost 設定變更時，登入成功後以新 cost 重新雜湊
+        if needs_rehash(user[3]):
+            _rehash_password(user[0], user[3], password)
+        
+        is_admin = user[7] is not None
+        admin_role = user[7]
         
         # 生成 JWT token
         token = generate_token(user[0])
@@ -131,14 +169,28 @@ def login():
             'admin_role': admin_role
         }), 200
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return server_error(e)
+
+def _rehash_password(user_id, old_hash, password):
+    """以目前的 bcrypt cost 重新雜湊密碼（失敗不影響登入）"""
+    try:
+        new_hash = hash_password(password)
+        with DatabaseConfig.transaction() as conn:
+            cursor = conn.cursor()
+            # 以舊雜湊作為條件，避免覆蓋期間內變更過的密碼
+            cursor.execute("""
+                UPDATE "user" SET password = %s WHERE user_id = %s AND password = %s
+            """, (new_hash, user_id, old_hash))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"重新雜湊密碼失敗: {str(e)}")
 
 @bp.route('/delete-account', methods=['DELETE'])
 @token_required
 def delete_account(user_id):
-    """使用者軟刪除自己的帳號（設置 deleted_at，下架所有商品，保留歷史資料）"""
-    conn = None
+    """使用者軟刪除自己的帳號（驗證密碼後建立背景工作：設置 deleted_at、分批下架商品，保留歷史資料）"""
     try:
         # 需要再次驗證密碼
         data = request.get_json()
@@ -147,103 +199,50 @@ def delete_account(user_id):
         if not password:
             return jsonify({'error': '請提供密碼以確認刪除'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        # 確保連線在 autocommit 模式（檢查階段）
-        conn.autocommit = True
-        cursor = conn.cursor()
-        
         # 驗證密碼並檢查是否已刪除
-        cursor.execute("""
-            SELECT password, user_name, deleted_at FROM "user" WHERE user_id = %s
-        """, (user_id,))
-        
-        user = cursor.fetchone()
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT password, user_name, deleted_at FROM "user" WHERE user_id = %s
+            """, (user_id,))
+            user = cursor.fetchone()
         
         if not user:
-            cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '使用者不存在'}), 404
         
         if user[2] is not None:  # deleted_at 不為 NULL，表示已刪除
-            cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
             return jsonify({'error': '帳號已被刪除'}), 400
         
-        if not bcrypt.checkpw(password.encode('utf-8'), user[0].encode('utf-8')):
-            cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
+        if not verify_password(password, user[0]):
             return jsonify({'error': '密碼錯誤'}), 401
         
-        # 檢查是否有進行中的交易請求
-        # 檢查作為請求者、目標商品的擁有者、或提供商品的擁有者
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM trade_request tr
-            LEFT JOIN product p_target ON tr.target_product_id = p_target.product_id
-            LEFT JOIN product p_offered ON tr.offered_product_id = p_offered.product_id
-            WHERE (tr.requester_id = %s 
-                   OR p_target.owner_id = %s 
-                   OR p_offered.owner_id = %s)
-            AND tr.status IN ('Pending', 'Accepted')
-        """, (user_id, user_id, user_id))
-        
-        active_requests = cursor.fetchone()[0]
-        
-        if active_requests > 0:
-            cursor.close()
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({
-                'error': '無法刪除帳號：您有進行中的交易請求，請先處理完所有交易請求後再刪除'
-            }), 400
-        
-        # 關閉檢查階段的 cursor
-        cursor.close()
-        
-        # 開始事務（軟刪除階段）
-        conn.autocommit = False
-        cursor = conn.cursor()
-        
-        # 1. 設置 deleted_at 時間戳
-        cursor.execute("""
-            UPDATE "user" 
-            SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        # 2. 下架該用戶的所有商品（將狀態改為 removed）
-        cursor.execute("""
-            UPDATE product 
-            SET status = 'removed', updated_at = CURRENT_TIMESTAMP
-            WHERE owner_id = %s AND status IN ('available', 'reserved')
-        """, (user_id,))
-        
-        products_deactivated = cursor.rowcount
-        
-        conn.commit()
-        cursor.close()
-        DatabaseConfig.return_postgres_connection(conn)
+        # 先檢查進行中的交易請求（不通過時不建立工作），軟刪除在背景工作中執行
+        error = JobRunner.validation_error('soft_delete_user', user_id)
+        if error:
+            return jsonify({'error': error}), 400
+        job_id = JobRunner.enqueue('soft_delete_user', user_id, user_id)
         
         return jsonify({
-            'message': f'帳號 {user[1]} 已刪除',
-            'note': f'帳號已標記為已刪除，無法再登入。已下架 {products_deactivated} 個商品。歷史交易紀錄、評價等資料已保留。'
-        }), 200
-        
+            'message': f'帳號 {user[1]} 的刪除工作已建立',
+            'note': '帳號將標記為已刪除並下架所有商品，歷史交易紀錄、評價等資料會保留。',
+            'job_id': job_id,
+            'status_url': f'/api/auth/jobs/{job_id}'
+        }), 202
+        
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        import traceback
-        print(f"刪除帳號錯誤: {str(e)}")
-        print(traceback.format_exc())
-        if conn:
-            try:
-                # 只有在事務模式下才需要 rollback
-                if not conn.autocommit:
-                    conn.rollback()
-            except:
-                pass
-            try:
-                if 'cursor' in locals() and cursor:
-                    cursor.close()
-            except:
-                pass
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(user_id, job_id):
+    """查詢自己帳號刪除工作的進度"""
+    try:
+        job = JobRunner.get_job(job_id)
+        if not job or job['target_user_id'] != user_id:
+            return jsonify({'error': '工作不存在'}), 404
+        return jsonify(job), 200
+        
+    except Exception as e:
+        return server_error(e)
@@ -0,0 +1,120 @@
+"""
+批次請求 API
+頁面載入時的多個唯讀 API 呼叫合併為一次請求：子請求在同一 process 內依序分派給已註冊的路由，
+共用一次 token 驗證與同一條資料庫連線，所有回應一起回傳
+"""
+import io
+import os
+import orjson
+from urllib.parse import urlsplit
+from flask import Blueprint, current_app, g, request, jsonify
+from werkzeug.exceptions import HTTPException
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.database import DatabaseConfig
+from utils.errors import server_error
+from utils.auth import get_token_from_request, verify_request_token
+
+bp = Blueprint('batch', __name__)
+
+# 一次批次請求最多包含的子請求數
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+
+# 子請求回應中保留的標頭
+FORWARDED_HEADERS = ('ETag', 'Cache-Control', 'Retry-After')
+
+def _sub_environ(path, if_none_match=None):
+    """以批次請求的 environ（認證標頭、用戶端位址等）為基礎，建立子請求（GET path）的 environ"""
+    url = urlsplit(path)
+    environ = dict(request.environ)
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': io.BytesIO(b'')
+    })
+    for key in ('CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_CONTENT_ENCODING'):
+        environ.pop(key, None)
+    if if_none_match:
+        environ['HTTP_IF_NONE_MATCH'] = if_none_match
+    return environ
+
+def _dispatch(environ):
+    """分派子請求；子請求不執行 before / after_request（指標、壓縮等只對批次請求本身計算一次）"""
+    with current_app.request_context(environ):
+        try:
+            return current_app.make_response(current_app.dispatch_request())
+        except HTTPException as e:
+            # 找不到路由、方法不允許等
+            return _error(e.code, e.description)
+        except Exception as e:
+            # 有註冊 errorhandler 的例外（PoolTimeout → 503）由它產生回應，其餘回傳 500
+            try:
+                return current_app.make_response(current_app.handle_user_exception(e))
+            except Exception:
+                return _error(500, str(e))
+
+def _error(status, message):
+    return current_app.response_class(orjson.dumps({'error': message}), status=status,
+                                      mimetype='application/json')
+
+def _run(item, verified_token):
+    """執行一個子請求，回傳序列化後的結果（bytes）"""
+    path = item.get('path') if isinstance(item, dict) else None
+    method = (item.get('method') or 'GET').upper() if isinstance(item, dict) else 'GET'
+    if not isinstance(path, str) or not path.startswith('/api/') or path.startswith('/api/batch'):
+        response = _error(400, '子請求的 path 必須是 /api/ 開頭的端點')
+    elif method != 'GET':
+        response = _error(405, '批次請求只接受 GET 子請求')
+    else:
+        # 子請求使用獨立的 g（請求結束的處理不影響批次請求本身），但沿用已驗證的 token
+        with current_app.app_context():
+            if verified_token is not None:
+                g.verified_token = verified_token
+            response = _dispatch(_sub_environ(path, item.get('if_none_match')))
+
+    meta = {'path': path, 'status': response.status_code}
+    headers = {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers}
+    if headers:
+        meta['headers'] = headers
+    data = response.get_data()
+    if not data:
+        body = b'null'
+    elif response.is_json:
+        # 子請求的 JSON 直接嵌入，不重新解析與序列化
+        body = data
+    else:
+        body = orjson.dumps(data.decode('utf-8', 'replace'))
+    return orjson.dumps(meta)[:-1] + b',"body":' + body + b'}'
+
+@bp.route('', methods=['POST'])
+def batch():
+    """
+    批次請求
+    body: {"requests": [{"path": "/api/products/7"}, {"path": "/api/categories", "if_none_match": "W/\\"...\\""}]}
+    回應: {"responses": [{"path", "status", "headers": {"ETag", ...}, "body"}, ...]}（順序與 requests 相同）
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': '缺少子請求列表 requests'}), 400
+        if len(items) > BATCH_MAX_REQUESTS:
+            return jsonify({'error': f'一次最多 {BATCH_MAX_REQUESTS} 個子請求'}), 400
+
+        # token 只驗證一次，結果交給各子請求
+        token = get_token_from_request()
+        verified_token = (token, verify_request_token(token)) if token else None
+
+        # 子請求依序執行（皆為 GET），共用同一條資料庫連線
+        with DatabaseConfig.shared_connections():
+            parts = [_run(item, verified_token) for item in items]
+
+        return current_app.response_class(
+            b'{"responses":[' + b','.join(parts) + b']}', mimetype='application/json'
+        ), 200
+
+    except Exception as e:
+        return server_error(e)
@@ -0,0 +1,42 @@
+"""
+分類相關 API（公開）
+回應來自程序內的分類目錄（utils.categories），不查詢資料庫；內容已預先序列化並壓縮。
+帶 ?v=<version>（目前版本）的請求可長期快取，版本改變後網址隨之改變
+"""
+import os
+from flask import Blueprint, Response, current_app, request
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from utils.errors import server_error
+from utils.categories import CategoryCatalog
+from utils.etag import etag_matches
+
+bp = Blueprint('categories', __name__)
+
+# 未指定版本時允許共用快取（瀏覽器、CDN）保存的秒數
+CATEGORY_CACHE_MAX_AGE = int(os.getenv('CATEGORY_CACHE_MAX_AGE', '300'))
+
+def _cache_headers(response, snapshot):
+    response.set_etag(snapshot.version, weak=True)
+    if request.args.get('v') == snapshot.version:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={CATEGORY_CACHE_MAX_AGE}'
+    return response
+
+@bp.route('', methods=['GET'])
+def get_categories():
+    """查詢所有分類（回應包含目前的版本號）"""
+    try:
+        snapshot = CategoryCatalog.current()
+        if etag_matches(request, snapshot.version):
+            return _cache_headers(current_app.response_class('', status=304), snapshot)
+
+        response = Response(snapshot.body, mimetype='application/json')
+        # 由 compress_response 直接送出預先壓縮的版本
+        response.precompressed = snapshot.variants
+        return _cache_headers(response, snapshot), 200
+
+    except Exception as e:
+        return server_error(e)
@@ -6,10 +6,56 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.database import DatabaseConfig
+from utils.errors import server_error
 from utils.auth import token_required
+from utils.prepared import execute_prepared
 
 bp = Blueprint('messages', __name__)
 
+# 以下查詢與欄位對應同時供 async_api（ASGI 版本）使用
+
+# 交易參與者（請求者、商品擁有者）
+PARTICIPANTS_QUERY = """
+    SELECT tr.requester_id, p.owner_id
+    FROM trade_request tr
+    JOIN product p ON tr.target_product_id = p.product_id
+    WHERE tr.request_id = %s
+"""
+
+# 對話紀錄（包含用戶刪除狀態）
+MESSAGES_QUERY = """
+    SELECT m.*, 
+           u1.user_name as sender_name, u1.deleted_at as sender_deleted_at,
+           u2.user_name as receiver_name, u2.deleted_at as receiver_deleted_at
+    FROM message m
+    JOIN "user" u1 ON m.sender_id = u1.user_id
+    JOIN "user" u2 ON m.receiver_id = u2.user_id
+    WHERE m.request_id = %s
+    ORDER BY m.sent_at ASC
+"""
+
+MARK_READ_QUERY = """
+    UPDATE message
+    SET is_read = TRUE
+    WHERE request_id = %s AND receiver_id = %s AND is_read = FALSE
+"""
+
+def message_item(m):
+    """訊息列轉為 dict（欄位順序：0-6 是 message 欄位，7-8 是 sender 資訊，9-10 是 receiver 資訊）"""
+    return {
+        'message_id': m[0],
+        'request_id': m[1],
+        'sender_id': m[2],
+        'sender_name': m[7] + (' (已刪除)' if m[8] is not None else ''),
+        'sender_deleted': m[8] is not None,
+        'receiver_id': m[3],
+        'receiver_name': m[9] + (' (已刪除)' if m[10] is not None else ''),
+        'receiver_deleted': m[10] is not None,
+        'content': m[4],
+        'is_read': m[5],
+        'sent_at': m[6]
+    }
+
 @bp.route('', methods=['POST'])
 @token_required
 def send_message(user_id):
@@ -23,50 +69,39 @@ def send_message(user_id):
         if not all([request_id, receiver_id, content]):
             return jsonify({'error': '缺少必要欄位'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查請求是否存在
-        cursor.execute("""
-            SELECT tr.requester_id, p.owner_id
-            FROM trade_request tr
-            JOIN product p ON tr.target_product_id = p.product_id
-            WHERE tr.request_id = %s
-        """, (request_id,))
-        
-        request_data = cursor.fetchone()
-        if not request_data:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '請求不存在'}), 404
-        
-        # 檢查是否為交易參與者
-        if user_id not in [request_data[0], request_data[1]]:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '無權限發送訊息'}), 403
-        
-        # 檢查接收者是否為交易參與者
-        if receiver_id not in [request_data[0], request_data[1]]:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '無效的接收者'}), 400
-        
-        # 檢查接收者帳號是否已刪除
-        cursor.execute("SELECT deleted_at FROM \"user\" WHERE user_id = %s", (receiver_id,))
-        receiver = cursor.fetchone()
-        if receiver and receiver[0] is not None:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '無法發送訊息：對方帳號已刪除'}), 403
-        
-        # 新增訊息
-        cursor.execute("""
-            INSERT INTO message (request_id, sender_id, receiver_id, content)
-            VALUES (%s, %s, %s, %s)
-            RETURNING message_id
-        """, (request_id, user_id, receiver_id, content))
-        
-        message_id = cursor.fetchone()[0]
-        conn.commit()
-        
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查請求是否存在
+            execute_prepared(cursor, PARTICIPANTS_QUERY, (request_id,))
+            
+            request_data = cursor.fetchone()
+            if not request_data:
+                return jsonify({'error': '請求不存在'}), 404
+            
+            # 檢查是否為交易參與者
+            if user_id not in [request_data[0], request_data[1]]:
+                return jsonify({'error': '無權限發送訊息'}), 403
+            
+            # 檢查接收者是否為交易參與者
+            if receiver_id not in [request_data[0], request_data[1]]:
+                return jsonify({'error': '無效的接收者'}), 400
+            
+            # 檢查接收者帳號是否已刪除
+            execute_prepared(cursor, "SELECT deleted_at FROM \"user\" WHERE user_id = %s", (receiver_id,))
+            receiver = cursor.fetchone()
+            if receiver and receiver[0] is not None:
+                return jsonify({'error': '無法發送訊息：對方帳號已刪除'}), 403
+            
+            # 新增訊息
+            cursor.execute("""
+                INSERT INTO message (request_id, sender_id, receiver_id, content)
+                VALUES (%s, %s, %s, %s)
+                RETURNING message_id
+            """, (request_id, user_id, receiver_id, content))
+            
+            message_id = cursor.fetchone()[0]
+            conn.commit()
         
         return jsonify({
             'message': '訊息發送成功',
@@ -74,81 +109,37 @@ def send_message(user_id):
         }), 201
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('/request/<int:request_id>', methods=['GET'])
 @token_required
 def get_messages(user_id, request_id):
     """查詢對話紀錄"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查是否為交易參與者
-        cursor.execute("""
-            SELECT tr.requester_id, p.owner_id
-            FROM trade_request tr
-            JOIN product p ON tr.target_product_id = p.product_id
-            WHERE tr.request_id = %s
-        """, (request_id,))
-        
-        request_data = cursor.fetchone()
-        if not request_data:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '請求不存在'}), 404
-        
-        if user_id not in [request_data[0], request_data[1]]:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '無權限查看此對話'}), 403
-        
-        # 查詢訊息（包含用戶刪除狀態）
-        cursor.execute("""
-            SELECT m.*, 
-                   u1.user_name as sender_name, u1.deleted_at as sender_deleted_at,
-                   u2.user_name as receiver_name, u2.deleted_at as receiver_deleted_at
-            FROM message m
-            JOIN "user" u1 ON m.sender_id = u1.user_id
-            JOIN "user" u2 ON m.receiver_id = u2.user_id
-            WHERE m.request_id = %s
-            ORDER BY m.sent_at ASC
-        """, (request_id,))
-        
-        messages = cursor.fetchall()
-        
-        # 標記為已讀
-        cursor.execute("""
-            UPDATE message
-            SET is_read = TRUE
-            WHERE request_id = %s AND receiver_id = %s AND is_read = FALSE
-        """, (request_id, user_id))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
-        
-        result = []
-        for m in messages:
-            # 欄位順序：0-6 是 message 欄位，7-8 是 sender 資訊，9-10 是 receiver 資訊
-            sender_name = m[7] + (' (已刪除)' if m[8] is not None else '')
-            receiver_name = m[9] + (' (已刪除)' if m[10] is not None else '')
-            result.append({
-                'message_id': m[0],
-                'request_id': m[1],
-                'sender_id': m[2],
-                'sender_name': sender_name,
-                'sender_deleted': m[8] is not None,
-                'receiver_id': m[3],
-                'receiver_name': receiver_name,
-                'receiver_deleted': m[10] is not None,
-                'content': m[4],
-                'is_read': m[5],
-                'sent_at': m[6].isoformat() if m[6] else None
-            })
-        
-        return jsonify(result), 200
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查是否為交易參與者
+            execute_prepared(cursor, PARTICIPANTS_QUERY, (request_id,))
+            
+            request_data = cursor.fetchone()
+            if not request_data:
+                return jsonify({'error': '請求不存在'}), 404
+            
+            if user_id not in [request_data[0], request_data[1]]:
+                return jsonify({'error': '無權限查看此對話'}), 403
+            
+            # 查詢訊息
+            execute_prepared(cursor, MESSAGES_QUERY, (request_id,))
+            messages = cursor.fetchall()
+            
+            # 標記為已讀
+            cursor.execute(MARK_READ_QUERY, (request_id, user_id))
+            
+            conn.commit()
+        
+        return jsonify([message_item(m) for m in messages]), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
@@ -6,6 +6,7 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.database import DatabaseConfig
+from utils.errors import server_error
 from utils.auth import token_required
 
 bp = Blueprint('reports', __name__)
@@ -27,20 +28,18 @@ def create_report(user_id):
         if not reported_product_id and not reported_user_id:
             return jsonify({'error': '必須檢舉商品或使用者'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO report 
-            (reporter_id, reported_product_id, reported_user_id, report_type, description)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING report_id
-        """, (user_id, reported_product_id, reported_user_id, report_type, description))
-        
-        report_id = cursor.fetchone()[0]
-        conn.commit()
-        
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO report 
+                (reporter_id, reported_product_id, reported_user_id, report_type, description)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING report_id
+            """, (user_id, reported_product_id, reported_user_id, report_type, description))
+            
+            report_id = cursor.fetchone()[0]
+            conn.commit()
         
         return jsonify({
             'message': '檢舉已提交',
@@ -48,8 +47,5 @@ def create_report(user_id):
         }), 201
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
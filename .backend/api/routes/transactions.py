@@ -6,68 +6,68 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.database import DatabaseConfig
+from utils.errors import server_error
 from utils.auth import token_required
+from utils.db_routing import read_only
+from utils.fields import Field, FieldSet, execute_projection
 
 bp = Blueprint('transactions', __name__)
 
+# 交易紀錄的輸出欄位（context 為目前的 user_id；u1 為買方（請求者），u2 為賣方（商品擁有者））
+TRANSACTION_FIELDS = FieldSet(
+    't.transaction_id',
+    Field('transaction_id', 't.transaction_id'),
+    Field('request_id', 't.request_id'),
+    Field('target_product_id', 't.target_product_id'),
+    Field('target_product_name', 'p1.product_name'),
+    Field('target_product_image', 'p1.image_url'),
+    Field('offered_product_id', 't.offered_product_id'),
+    Field('offered_product_name', 'p2.product_name'),
+    Field('total_price', 't.total_price'),
+    Field('complete_date', 't.complete_date'),
+    Field('payment_status', 't.payment_status'),
+    Field('request_type', 'tr.request_type'),
+    Field('is_buyer', 'tr.requester_id', value=lambda row, user_id: row['tr.requester_id'] == user_id),
+    Field('is_seller', 'p1.owner_id', value=lambda row, user_id: row['p1.owner_id'] == user_id),
+    # 我是買方時對方為賣方，否則為買方
+    Field('other_user_id', 'tr.requester_id', 'p1.owner_id',
+          value=lambda row, user_id: row['p1.owner_id'] if row['tr.requester_id'] == user_id else row['tr.requester_id']),
+    Field('other_user_name', 'tr.requester_id', 'u2.user_name', 'u1.user_name',
+          value=lambda row, user_id: row['u2.user_name'] if row['tr.requester_id'] == user_id else row['u1.user_name'])
+)
+
 @bp.route('', methods=['GET'])
 @token_required
+@read_only
 def get_transactions(user_id):
-    """查詢交易紀錄"""
+    """查詢交易紀錄（fields=transaction_id,total_price,... 只回傳指定的欄位）"""
     try:
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT t.transaction_id, t.request_id, t.target_product_id, t.offered_product_id,
-                   t.total_price, t.complete_date, t.payment_status,
-                   p1.product_name as target_product_name, p1.image_url as target_product_image,
-                   p2.product_name as offered_product_name,
-                   tr.request_type, tr.requester_id, p1.owner_id,
-                   u1.user_name as buyer_name, u1.user_id as buyer_id,
-                   u2.user_name as seller_name, u2.user_id as seller_id
-            FROM transaction t
-            JOIN trade_request tr ON t.request_id = tr.request_id
-            JOIN product p1 ON t.target_product_id = p1.product_id
-            LEFT JOIN product p2 ON t.offered_product_id = p2.product_id
-            JOIN "user" u1 ON tr.requester_id = u1.user_id
-            JOIN "user" u2 ON p1.owner_id = u2.user_id
-            WHERE tr.requester_id = %s OR p1.owner_id = %s
-            ORDER BY t.complete_date DESC
-        """, (user_id, user_id))
-        
-        transactions = cursor.fetchall()
-        DatabaseConfig.return_postgres_connection(conn)
+        try:
+            projection = TRANSACTION_FIELDS.select(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        result = []
-        for t in transactions:
-            is_buyer = t[11] == user_id  # requester_id
-            is_seller = t[12] == user_id  # owner_id
-            other_user_id = t[14] if is_buyer else t[13]  # seller_id if buyer, buyer_id if seller
-            other_user_name = t[16] if is_buyer else t[15]  # seller_name if buyer, buyer_name if seller
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
             
-            result.append({
-                'transaction_id': t[0],
-                'request_id': t[1],
-                'target_product_id': t[2],
-                'target_product_name': t[7],
-                'target_product_image': t[8],
-                'offered_product_id': t[3],
-                'offered_product_name': t[9],
-                'total_price': t[4],
-                'complete_date': t[5].isoformat() if t[5] else None,
-                'payment_status': t[6],
-                'request_type': t[10],
-                'is_buyer': is_buyer,
-                'is_seller': is_seller,
-                'other_user_id': other_user_id,
-                'other_user_name': other_user_name
-            })
+            execute_projection(cursor, projection, f"""
+                SELECT {projection.sql}
+                FROM transaction t
+                JOIN trade_request tr ON t.request_id = tr.request_id
+                JOIN product p1 ON t.target_product_id = p1.product_id
+                LEFT JOIN product p2 ON t.offered_product_id = p2.product_id
+                JOIN "user" u1 ON tr.requester_id = u1.user_id
+                JOIN "user" u2 ON p1.owner_id = u2.user_id
+                WHERE tr.requester_id = %s OR p1.owner_id = %s
+                ORDER BY t.complete_date DESC
+            """, (user_id, user_id))
+            
+            transactions = cursor.fetchall()
         
-        return jsonify(result), 200
+        return jsonify([projection.item(t, user_id) for t in transactions]), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 @bp.route('', methods=['POST'])
 @token_required
@@ -80,61 +80,57 @@ def complete_transaction(user_id):
         if not request_id:
             return jsonify({'error': '缺少必要欄位'}), 400
         
-        conn = DatabaseConfig.get_postgres_connection()
-        cursor = conn.cursor()
-        
-        # 檢查請求是否存在且已被接受
-        cursor.execute("""
-            SELECT tr.*, p.owner_id
-            FROM trade_request tr
-            JOIN product p ON tr.target_product_id = p.product_id
-            WHERE tr.request_id = %s
-        """, (request_id,))
-        
-        request_data = cursor.fetchone()
-        if not request_data:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '請求不存在'}), 404
-        
-        if request_data[6] != 'Accepted':
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '請求尚未被接受'}), 400
-        
-        # 檢查權限（必須是買家或賣家）
-        if request_data[1] != user_id and request_data[8] != user_id:
-            DatabaseConfig.return_postgres_connection(conn)
-            return jsonify({'error': '無權限完成此交易'}), 403
-        
-        # 建立交易紀錄
-        cursor.execute("""
-            INSERT INTO transaction 
-            (request_id, target_product_id, offered_product_id, total_price, payment_status)
-            SELECT tr.request_id, tr.target_product_id, tr.offered_product_id,
-                   tr.offer_price, 'Unpaid'
-            FROM trade_request tr
-            WHERE tr.request_id = %s
-            RETURNING transaction_id
-        """, (request_id,))
-        
-        transaction_id = cursor.fetchone()[0]
-        
-        # 更新請求狀態
-        cursor.execute("""
-            UPDATE trade_request
-            SET status = 'Completed', updated_at = CURRENT_TIMESTAMP
-            WHERE request_id = %s
-        """, (request_id,))
-        
-        # 更新商品狀態
-        status = 'exchanged' if request_data[3] else 'sold'
-        cursor.execute("""
-            UPDATE product
-            SET status = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE product_id = %s
-        """, (status, request_data[2]))
-        
-        conn.commit()
-        DatabaseConfig.return_postgres_connection(conn)
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 檢查請求是否存在且已被接受
+            cursor.execute("""
+                SELECT tr.*, p.owner_id
+                FROM trade_request tr
+                JOIN product p ON tr.target_product_id = p.product_id
+                WHERE tr.request_id = %s
+            """, (request_id,))
+            
+            request_data = cursor.fetchone()
+            if not request_data:
+                return jsonify({'error': '請求不存在'}), 404
+            
+            if request_data[6] != 'Accepted':
+                return jsonify({'error': '請求尚未被接受'}), 400
+            
+            # 檢查權限（必須是買家或賣家）
+            if request_data[1] != user_id and request_data[8] != user_id:
+                return jsonify({'error': '無權限完成此交易'}), 403
+            
+            # 建立交易紀錄
+            cursor.execute("""
+                INSERT INTO transaction 
+                (request_id, target_product_id, offered_product_id, total_price, payment_status)
+                SELECT tr.request_id, tr.target_product_id, tr.offered_product_id,
+                       tr.offer_price, 'Unpaid'
+                FROM trade_request tr
+                WHERE tr.request_id = %s
+                RETURNING transaction_id
+            """, (request_id,))
+            
+            transaction_id = cursor.fetchone()[0]
+            
+            # 更新請求狀態
+            cursor.execute("""
+                UPDATE trade_request
+                SET status = 'Completed', updated_at = CURRENT_TIMESTAMP
+                WHERE request_id = %s
+            """, (request_id,))
+            
+            # 更新商品狀態
+            status = 'exchanged' if request_data[3] else 'sold'
+            cursor.execute("""
+                UPDATE product
+                SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE product_id = %s
+            """, (status, request_data[2]))
+            
+            conn.commit()
         
         return jsonify({
             'message': '交易完成',
@@ -142,8 +138,5 @@ def complete_transaction(user_id):
         }), 201
         
     except Exception as e:
-        if conn:
-            conn.rollback()
-            DatabaseConfig.return_postgres_connection(conn)
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
@@ -1,13 +1,18 @@
 """
 主應用程式入口
+python app.py 啟動 Flask 開發伺服器（單一 process）；正式環境請使用 gunicorn -c gunicorn.conf.py
 """
 from api import create_app
+from utils.jobs import JobRunner
 import os
 
 app = create_app()
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    debug = os.getenv('FLASK_ENV', 'development') == 'development'
+    # 只有明確設定 FLASK_ENV=development 時才開啟 debug 模式
+    debug = os.getenv('FLASK_ENV', 'production') == 'development'
+    # 背景工作執行緒（會續跑中斷的工作）；gunicorn 由 post_worker_init 在每個 worker 啟動
+    JobRunner.start()
     app.run(host='0.0.0.0', port=port, debug=debug)
 
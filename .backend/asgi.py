@@ -0,0 +1,7 @@
+"""
+ASGI 入口
+uvicorn asgi:app --workers 4
+"""
+from async_api import create_asgi_app
+
+app = create_asgi_app()
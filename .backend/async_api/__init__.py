@@ -0,0 +1,138 @@
+"""
+ASGI 版本的 API
+高併發的唯讀端點（商品列表 / 詳情、對話紀錄）以 Quart + asyncpg + motor 非同步處理，
+其餘端點交給原本的 Flask 應用程式（在執行緒池中執行），兩者對外提供相同的路由
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from quart import Quart, request
+from werkzeug.exceptions import HTTPException
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.async_database import AsyncDatabaseConfig
+from config.database import DatabaseConfig
+from config.pool import PoolTimeout
+from utils.json_provider import OrjsonProvider
+from utils.jobs import JobRunner
+from utils.compression import (COMPRESS_MIN_SIZE, add_vary, apply_precompressed, choose_encoding, compress,
+                               should_compress)
+
+# 每個 process 執行 Flask 端點的執行緒數（每個請求佔用一條同步連線，預設與 DB_POOL_MAX 相同）
+ASYNC_WSGI_THREADS = int(os.getenv('ASYNC_WSGI_THREADS', str(DatabaseConfig.POSTGRES_POOL_MAX)))
+
+def create_async_app():
+    """建立 Quart 應用程式（只包含非同步實作的端點）"""
+    app = Quart(__name__)
+    app.json = OrjsonProvider(app)
+    
+    from .routes import products, messages
+    
+    app.register_blueprint(products.bp, url_prefix='/api/products')
+    app.register_blueprint(messages.bp, url_prefix='/api/messages')
+    
+    @app.before_serving
+    async def open_pools():
+        try:
+            await AsyncDatabaseConfig.init()
+        except Exception as e:
+            print(f"非同步資料庫連線池建立失敗: {str(e)}")
+        # 背景工作執行緒（Flask 後備應用程式的刪除工作；會續跑中斷的工作）
+        JobRunner.start()
+    
+    @app.after_serving
+    async def close_pools():
+        await AsyncDatabaseConfig.close()
+    
+    # 取得連線逾時（路由以 utils.errors.server_error 重新拋出）回傳 503
+    @app.errorhandler(PoolTimeout)
+    async def handle_pool_timeout(error):
+        return {'error': str(error)}, 503
+    
+    # Prometheus 指標、Server-Timing、慢查詢與 N+1 紀錄、取樣式請求分析（與 Flask 版本相同）
+    from . import observability
+    app.before_request(observability.begin_request)
+    app.after_request(observability.finish_request)
+    app.teardown_request(observability.end_request)
+    
+    @app.after_request
+    async def compress_response(response):
+        """依 Accept-Encoding 壓縮回應，判斷條件與 Flask 版本相同（非同步端點皆為一般 JSON 回應，不需處理串流）"""
+        if not should_compress(request.method, response):
+            return response
+        add_vary(response)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if apply_precompressed(response, encoding) or encoding is None:
+            return response
+        data = await response.get_data()
+        if len(data) >= COMPRESS_MIN_SIZE:
+            response.set_data(compress(data, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
+    
+    @app.after_request
+    async def add_cors_headers(response):
+        """與 Flask 版本的 CORS 設定一致（允許所有來源、允許帶認證資訊）"""
+        origin = request.headers.get('Origin')
+        if origin:
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            add_vary(response, 'Origin')
+        return response
+    
+    return app
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    """
+    在執行緒池中執行 WSGI 應用程式的 WsgiToAsgi 實例
+    asgiref 預設以 thread_sensitive=True 執行，同一 process 的所有 Flask 請求會排隊在同一條執行緒上
+    """
+    
+    executor = None
+    
+    async def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        await sync_to_async(run, thread_sensitive=False, executor=self.executor)(self, body)
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi：Flask 請求在 ASYNC_WSGI_THREADS 條執行緒中同時處理"""
+    
+    def __init__(self, wsgi_application, threads=ASYNC_WSGI_THREADS):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+    
+    async def __call__(self, scope, receive, send):
+        instance = _ThreadPoolWsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        instance.executor = self.executor
+        await instance(scope, receive, send)
+
+class _Dispatcher:
+    """依路由分派請求：非同步 app 有對應端點時由它處理，否則交給 Flask（WSGI）"""
+    
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = _ThreadPoolWsgiToAsgi(wsgi_app)
+        self.adapter = async_app.url_map.bind('localhost')
+    
+    def _handles(self, scope):
+        # CORS 預檢請求統一由 Flask-CORS 處理
+        if scope['method'] == 'OPTIONS':
+            return False
+        try:
+            self.adapter.match(scope['path'], scope['method'])
+            return True
+        except HTTPException:
+            return False
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan' or (scope['type'] == 'http' and self._handles(scope)):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+def create_asgi_app():
+    """建立 ASGI 應用程式（非同步端點 + Flask 其餘端點）"""
+    from api import create_app
+    return _Dispatcher(create_async_app(), create_app())
@@ -0,0 +1,43 @@
+"""
+認證工具函數（ASGI 版本，沿用 utils.auth 的 JWT 驗證）
+"""
+from functools import wraps
+from quart import request, jsonify, g
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.auth import verify_token
+
+def get_token_from_request():
+    """從請求中取得 token（Authorization: Bearer <token> 或 query 參數 token）"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        parts = auth_header.split(' ')
+        if len(parts) > 1:
+            return parts[1]
+    return request.args.get('token')
+
+def get_user_id():
+    """從請求中取得 user_id（未登入時為 None）"""
+    token = get_token_from_request()
+    if token:
+        return verify_token(token)
+    return None
+
+def token_required(f):
+    """需要 JWT token 的裝飾器（async 路由）"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = get_token_from_request()
+        
+        if not token:
+            return jsonify({'error': '需要提供認證 token'}), 401
+        
+        user_id = verify_token(token)
+        if not user_id:
+            return jsonify({'error': '無效或過期的 token'}), 401
+        
+        g.user_id = user_id
+        return await f(user_id, *args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,22 @@
+"""
+讀取副本路由（ASGI 版本）
+與 utils.db_routing 相同：@read_only 端點改從讀取副本查詢，使用者剛寫入（同一 process 的紀錄或 rw_until cookie）時仍讀主資料庫
+"""
+from functools import wraps
+from quart import g, request
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.async_database import AsyncDatabaseConfig
+from utils.db_routing import prefers_primary
+from async_api.auth import get_user_id
+
+def read_only(f):
+    """唯讀端點裝飾器：查詢改用讀取副本（需放在 token_required 之後）"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        if prefers_primary(g.get('user_id') or get_user_id(), request.cookies):
+            return await f(*args, **kwargs)
+        with AsyncDatabaseConfig.replica_reads():
+            return await f(*args, **kwargs)
+    return decorated
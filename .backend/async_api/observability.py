@@ -0,0 +1,56 @@
+"""
+請求的指標、SQL 統計與取樣分析（ASGI 版本）
+與 Flask 版本相同：Prometheus 指標（由 Flask 的 /metrics 匯出，同一 process 共用）、
+Server-Timing 標頭、慢查詢與 N+1 紀錄、取樣式請求分析
+"""
+import asyncio
+import time
+from quart import g, request
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.instrumentation import begin_query_log, end_query_log
+from utils import metrics, profiler
+from utils.query_stats import add_server_timing
+from async_api.auth import get_user_id
+
+async def _requested_by_admin():
+    """請求帶有 X-Profile 標頭且為管理員（管理員檢查為同步查詢，在執行緒中執行）"""
+    if not request.headers.get(profiler.PROFILE_HEADER):
+        return False
+    user_id = get_user_id()
+    if not user_id:
+        return False
+    from api.routes.admin import is_admin
+    return await asyncio.to_thread(is_admin, user_id)
+
+async def begin_request():
+    """before_request：指標、SQL 統計與取樣分析"""
+    g.metrics_key = metrics.endpoint_key(request)
+    g.metrics_started_at = metrics.request_started(g.metrics_key)
+    g.request_started_at = time.perf_counter()
+    g.query_log, g.query_log_token = begin_query_log(f'{request.method} {request.path}')
+    if profiler.sampled() or await _requested_by_admin():
+        g.profile_key = profiler.begin_task(request.endpoint or 'unmatched')
+
+async def finish_request(response):
+    """after_request：記錄延遲與狀態碼、加上 Server-Timing 標頭"""
+    key = g.get('metrics_key')
+    if key is not None:
+        metrics.request_finished(key, g.metrics_started_at, response.status_code)
+    log = g.get('query_log')
+    if log is not None:
+        add_server_timing(response, log, g.request_started_at)
+    return response
+
+async def end_request(error=None):
+    """teardown_request：處理中的請求數減一、停止記錄與分析（例外時也會執行）"""
+    key = g.pop('metrics_key', None)
+    if key is not None:
+        metrics.request_ended(key)
+    token = g.pop('query_log_token', None)
+    if token is not None:
+        end_query_log(token)
+    profile_key = g.pop('profile_key', None)
+    if profile_key is not None:
+        profiler.stop(profile_key)
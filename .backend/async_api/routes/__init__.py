@@ -0,0 +1,3 @@
+"""
+ASGI 版本的路由模組
+"""
@@ -0,0 +1,38 @@
+"""
+訊息相關 API（ASGI 版本）
+查詢與欄位對應沿用 api.routes.messages
+"""
+from quart import Blueprint, jsonify
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.async_database import AsyncDatabaseConfig, query_args
+from utils.errors import server_error
+from async_api.auth import token_required
+from api.routes.messages import PARTICIPANTS_QUERY, MESSAGES_QUERY, MARK_READ_QUERY, message_item
+
+bp = Blueprint('messages', __name__)
+
+@bp.route('/request/<int:request_id>', methods=['GET'])
+@token_required
+async def get_messages(user_id, request_id):
+    """查詢對話紀錄"""
+    try:
+        async with AsyncDatabaseConfig.connection() as conn:
+            # 檢查是否為交易參與者
+            request_data = await conn.fetchrow(*query_args(PARTICIPANTS_QUERY, (request_id,)))
+            if not request_data:
+                return jsonify({'error': '請求不存在'}), 404
+            
+            if user_id not in [request_data[0], request_data[1]]:
+                return jsonify({'error': '無權限查看此對話'}), 403
+            
+            # 查詢訊息並標記為已讀（同一個交易）
+            async with conn.transaction():
+                messages = await conn.fetch(*query_args(MESSAGES_QUERY, (request_id,)))
+                await conn.execute(*query_args(MARK_READ_QUERY, (request_id, user_id)))
+        
+        return jsonify([message_item(m) for m in messages]), 200
+        
+    except Exception as e:
+        return server_error(e)
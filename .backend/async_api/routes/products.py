@@ -0,0 +1,106 @@
+"""
+商品相關 API（ASGI 版本）
+查詢與欄位對應沿用 api.routes.products；賣家統計的各查詢以 asyncio.gather 同時執行
+"""
+import asyncio
+from quart import Blueprint, current_app, request, jsonify
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.async_database import AsyncDatabaseConfig
+from utils.errors import server_error
+from async_api.auth import get_user_id
+from async_api.db_routing import read_only
+from api.routes.products import (
+    PRODUCT_DETAIL_QUERY, PRODUCT_VERSION_QUERY, SELLER_STATS_QUERIES,
+    PRODUCT_LIST_FIELDS, build_product_list_query, build_product_list_version_query,
+    product_detail, search_filters, seller_stats
+)
+from utils.etag import weak_etag, etag_matches, with_etag, not_modified
+from utils.categories import CategoryCatalog
+from models.mongodb_models import SearchLog
+
+bp = Blueprint('products', __name__)
+
+async def _log_search(document):
+    """記錄搜尋行為到 MongoDB（背景執行，失敗不影響回應）"""
+    try:
+        await AsyncDatabaseConfig.get_mongo_db()[SearchLog.COLLECTION].insert_one(document)
+    except Exception as e:
+        print(f"記錄搜尋行為失敗: {str(e)}")
+
+@bp.route('', methods=['GET'])
+@read_only
+async def get_products():
+    """查詢商品列表"""
+    try:
+        status = request.args.get('status', 'available')
+        # asyncpg 依欄位型別傳送參數，數字欄位需先轉為 int
+        category_id = request.args.get('category_id', type=int)
+        search = request.args.get('search')
+        trade_option = request.args.get('trade_option')
+        owner_id = request.args.get('owner_id', type=int)
+        try:
+            projection = PRODUCT_LIST_FIELDS.select(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query, params = build_product_list_query(status, owner_id, category_id, trade_option, search, projection)
+        version_query, version_params = build_product_list_version_query(
+            status, owner_id, category_id, trade_option, search
+        )
+        categories = await CategoryCatalog.current_async()
+        version = await AsyncDatabaseConfig.fetchrow(version_query, version_params)
+        etag = weak_etag(*version, categories.version, projection.names)
+        
+        # 如果有搜尋關鍵字，回應後在背景記錄到 MongoDB
+        if search:
+            current_app.add_background_task(_log_search, SearchLog.build(
+                user_id=get_user_id(),
+                keywords=search,
+                filters=search_filters(status, owner_id, category_id, trade_option),
+                result_count=version[0]
+            ))
+        
+        if etag_matches(request, etag):
+            return not_modified(current_app.response_class, etag)
+        
+        # 只有完整欄位的查詢保留轉換結果（fields= 的組合數量由請求決定）
+        products = await AsyncDatabaseConfig.fetch(query, params, cache=projection.full)
+        categories = await CategoryCatalog.current_async(projection.column_values(products, 'p.category_id'))
+        result = [projection.item(p, categories) for p in products]
+        return with_etag(jsonify(result), etag), 200
+        
+    except Exception as e:
+        return server_error(e)
+
+@bp.route('/<int:product_id>', methods=['GET'])
+@read_only
+async def get_product(product_id):
+    """查詢單一商品詳情"""
+    try:
+        categories = await CategoryCatalog.current_async()
+        version = await AsyncDatabaseConfig.fetchrow(PRODUCT_VERSION_QUERY, (product_id,))
+        if not version:
+            return jsonify({'error': '商品不存在'}), 404
+        
+        etag = weak_etag(*version, categories.version)
+        if etag_matches(request, etag):
+            return not_modified(current_app.response_class, etag)
+        
+        product = await AsyncDatabaseConfig.fetchrow(PRODUCT_DETAIL_QUERY, (product_id,))
+        if not product:
+            return jsonify({'error': '商品不存在'}), 404
+        
+        # 賣家統計的查詢彼此獨立，各自借用連線同時執行
+        owner_id = product[1]
+        rows = await asyncio.gather(*(
+            AsyncDatabaseConfig.fetchrow(query, (owner_id,)) for query in SELLER_STATS_QUERIES.values()
+        ))
+        stats = seller_stats(dict(zip(SELLER_STATS_QUERIES, rows)))
+        
+        categories = await CategoryCatalog.current_async((product[2],))
+        return with_etag(jsonify(product_detail(product, stats, categories)), etag), 200
+        
+    except Exception as e:
+        return server_error(e)
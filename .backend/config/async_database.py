@@ -0,0 +1,237 @@
+"""
+非同步資料庫連線配置（ASGI 版本使用）
+PostgreSQL 使用 asyncpg 連線池、MongoDB 使用 motor；每個 process 的事件迴圈共用一組連線池，
+在 ASGI 伺服器啟動（lifespan startup）時建立、關閉時釋放。
+SQL 沿用 psycopg2 格式（%s / %(name)s），執行前轉為 asyncpg 的 $n 參數。
+讀取副本（DB_REPLICA_URLS）的選擇方式與 DatabaseConfig 相同：輪流挑選健康且延遲在容許範圍內的副本
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import asyncpg
+from motor.motor_asyncio import AsyncIOMotorClient
+from psycopg2.extensions import parse_dsn
+from config.database import DatabaseConfig, _Replica
+from config.instrumentation import record_query
+from config.pool import PoolTimeout
+from utils.prepared import PREPARED_STATEMENTS_ENABLED, numbered_query
+
+def query_args(sql, params=None, cache=True):
+    """將 psycopg2 格式的 SQL 與參數轉為 asyncpg 呼叫的引數 (sql, *args)"""
+    query, args = numbered_query(sql, params, cache)
+    return (query, *args)
+
+def _status_rows(status):
+    """execute 回傳的指令狀態（例如 'UPDATE 3'）中的列數"""
+    count = status.rsplit(' ', 1)[-1] if status else ''
+    return int(count) if count.isdigit() else 0
+
+class InstrumentedConnection(asyncpg.Connection):
+    """記錄每次執行耗時與列數的 asyncpg 連線（與 InstrumentedCursor 相同，寫入目前請求的 QueryLog）"""
+
+    async def execute(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        status = None
+        try:
+            status = await super().execute(query, *args, **kwargs)
+            return status
+        finally:
+            record_query(query, time.perf_counter() - started, _status_rows(status))
+
+    async def fetch(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        rows = None
+        try:
+            rows = await super().fetch(query, *args, **kwargs)
+            return rows
+        finally:
+            record_query(query, time.perf_counter() - started, len(rows) if rows else 0)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        row = None
+        try:
+            row = await super().fetchrow(query, *args, **kwargs)
+            return row
+        finally:
+            record_query(query, time.perf_counter() - started, 0 if row is None else 1)
+
+class _AsyncReplica:
+    """讀取副本（asyncpg 連線池與延遲狀態）"""
+
+    def __init__(self, dsn):
+        params = parse_dsn(dsn)
+        self.name = f"{params.get('host', 'localhost')}:{params.get('port', '5432')}"
+        # DB_REPLICA_URLS 可為 URL 或 libpq 的 key=value 格式，統一轉為 asyncpg 的連線參數
+        self.connect_args = {
+            'host': params.get('host'),
+            'port': params.get('port'),
+            'database': params.get('dbname'),
+            'user': params.get('user'),
+            'password': params.get('password')
+        }
+        self.pool: Optional[asyncpg.Pool] = None
+        self.lag = None
+        self.healthy = True
+        self.checked_at = 0.0
+        self.checking = False
+
+    async def refresh(self, interval):
+        """距離上次檢查超過 interval 秒時重新查詢延遲（同時只有一個協程檢查，其他沿用舊值）"""
+        if time.monotonic() - self.checked_at < interval or self.checking:
+            return
+        self.checking = True
+        try:
+            if self.pool is None:
+                self.pool = await AsyncDatabaseConfig.create_pool(min_size=0, **self.connect_args)
+            async with self.pool.acquire(timeout=DatabaseConfig.POSTGRES_POOL_TIMEOUT) as conn:
+                self.lag = float(await conn.fetchval(_Replica.LAG_QUERY))
+            self.healthy = True
+        except Exception as e:
+            self.healthy = False
+            print(f"讀取副本 {self.name} 無法使用: {str(e)}")
+        finally:
+            self.checked_at = time.monotonic()
+            self.checking = False
+
+class AsyncDatabaseConfig:
+    """非同步資料庫配置類別"""
+
+    # 每個 process 的 asyncpg 連線數上限（協程等待連線不佔執行緒，可低於同時連線數）
+    POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', str(DatabaseConfig.POSTGRES_POOL_MIN)))
+    POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', '20'))
+    # 閒置超過此秒數的連線會被關閉（0 表示不關閉閒置連線）
+    POOL_MAX_IDLE = float(os.getenv('ASYNC_DB_POOL_MAX_IDLE', '300'))
+
+    _postgres_pool: Optional[asyncpg.Pool] = None
+    _replicas: Optional[list] = None
+    _replica_cursor = 0
+    _mongo_client: Optional[AsyncIOMotorClient] = None
+    _init_lock = asyncio.Lock()
+    # 目前的執行環境是否優先使用讀取副本（由 replica_reads() 設定）
+    _prefer_replica = ContextVar('async_db_prefer_replica', default=False)
+
+    @classmethod
+    async def create_pool(cls, min_size=None, **connect_args):
+        """建立 asyncpg 連線池（主資料庫與讀取副本共用的設定）"""
+        return await asyncpg.create_pool(
+            min_size=cls.POOL_MIN if min_size is None else min_size,
+            max_size=cls.POOL_MAX,
+            max_inactive_connection_lifetime=cls.POOL_MAX_IDLE,
+            connection_class=InstrumentedConnection,
+            # asyncpg 預設會自動快取預備敘述；經 PgBouncer transaction pooling 時需關閉
+            statement_cache_size=100 if PREPARED_STATEMENTS_ENABLED else 0,
+            **connect_args
+        )
+
+    @classmethod
+    async def init(cls):
+        """建立連線池（lifespan startup；啟動時失敗則在第一次借用連線時重試）"""
+        if cls._mongo_client is None:
+            cls._mongo_client = AsyncIOMotorClient(DatabaseConfig.get_mongo_uri())
+        if cls._replicas is None:
+            cls._replicas = [_AsyncReplica(url) for url in DatabaseConfig.REPLICA_URLS]
+        async with cls._init_lock:
+            if cls._postgres_pool is not None:
+                return
+            cls._postgres_pool = await cls.create_pool(
+                host=DatabaseConfig.POSTGRES_HOST,
+                port=DatabaseConfig.POSTGRES_PORT,
+                database=DatabaseConfig.POSTGRES_DB,
+                user=DatabaseConfig.POSTGRES_USER,
+                password=DatabaseConfig.POSTGRES_PASSWORD
+            )
+
+    @classmethod
+    async def close(cls):
+        """關閉連線池（lifespan shutdown）"""
+        if cls._postgres_pool is not None:
+            await cls._postgres_pool.close()
+            cls._postgres_pool = None
+        for replica in cls._replicas or ():
+            if replica.pool is not None:
+                await replica.pool.close()
+        cls._replicas = None
+        if cls._mongo_client is not None:
+            cls._mongo_client.close()
+            cls._mongo_client = None
+
+    @classmethod
+    @contextmanager
+    def replica_reads(cls):
+        """區塊內的 connection() 優先使用讀取副本（僅用於唯讀操作）"""
+        token = cls._prefer_replica.set(True)
+        try:
+            yield
+        finally:
+            cls._prefer_replica.reset(token)
+
+    @classmethod
+    async def _pick_replica(cls):
+        """輪流挑選健康且延遲在容許範圍內的副本；都不符合時回傳 None（改用主資料庫）"""
+        replicas = cls._replicas or []
+        for _ in range(len(replicas)):
+            cls._replica_cursor = (cls._replica_cursor + 1) % len(replicas)
+            replica = replicas[cls._replica_cursor]
+            await replica.refresh(DatabaseConfig.REPLICA_LAG_CHECK_INTERVAL)
+            if replica.healthy and replica.lag is not None and replica.lag <= DatabaseConfig.REPLICA_MAX_LAG_SECONDS:
+                return replica
+        return None
+
+    @classmethod
+    async def _acquire(cls, pool):
+        """從 pool 借出連線；等待時間與逾時次數通知 DatabaseConfig 的連線池監聽者（Prometheus 指標）"""
+        started_at = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=DatabaseConfig.POSTGRES_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            DatabaseConfig._notify_pool_listeners(time.perf_counter() - started_at, exhausted=True)
+            raise PoolTimeout(f'資料庫連線繁忙，{DatabaseConfig.POSTGRES_POOL_TIMEOUT:g} 秒內無法取得連線')
+        DatabaseConfig._notify_pool_listeners(time.perf_counter() - started_at)
+        return conn
+
+    @classmethod
+    @asynccontextmanager
+    async def connection(cls):
+        """
+        借用連線（離開區塊時歸還）；等待超過 DB_POOL_TIMEOUT 秒拋出 PoolTimeout
+        在 replica_reads() 之內且有可用的讀取副本時，改從副本借出
+        """
+        if cls._postgres_pool is None:
+            await cls.init()
+        pool, conn = cls._postgres_pool, None
+        if cls._prefer_replica.get() and cls._replicas:
+            replica = await cls._pick_replica()
+            if replica:
+                try:
+                    conn = await cls._acquire(replica.pool)
+                    pool = replica.pool
+                except (OSError, asyncpg.PostgresError, PoolTimeout) as e:
+                    replica.healthy = False
+                    print(f"讀取副本 {replica.name} 無法取得連線，改用主資料庫: {str(e)}")
+        if conn is None:
+            conn = await cls._acquire(pool)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    @classmethod
+    async def fetch(cls, sql, params=None, cache=True):
+        """查詢多列（cache=False：組合數量不定的查詢，不保留 SQL 轉換結果）"""
+        async with cls.connection() as conn:
+            return await conn.fetch(*query_args(sql, params, cache))
+
+    @classmethod
+    async def fetchrow(cls, sql, params=None):
+        """查詢單列（沒有結果時為 None）"""
+        async with cls.connection() as conn:
+            return await conn.fetchrow(*query_args(sql, params))
+
+    @classmethod
+    def get_mongo_db(cls):
+        """取得 MongoDB 資料庫物件（motor）"""
+        return cls._mongo_client[DatabaseConfig.MONGO_DB]
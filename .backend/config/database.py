@@ -2,8 +2,16 @@
 資料庫連線配置
 """
 import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
 import psycopg2
 from psycopg2 import pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, parse_dsn
+from config.pool import BlockingConnectionPool
+from config.instrumentation import InstrumentedCursor
 from pymongo import MongoClient
 from typing import Optional
 from dotenv import load_dotenv
@@ -11,6 +19,61 @@ from dotenv import load_dotenv
 # 載入環境變數
 load_dotenv()
 
+class _PoolStats:
+    """連線池使用統計與借出紀錄"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = {}          # id(conn) -> {'acquired_at', 'thread', 'stack'}
+        self.checkout_count = 0
+        self.wait_seconds = 0.0      # 累計取得連線的等待時間
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0      # 累計持有連線的時間
+        self.exhausted = 0           # 連線池耗盡（等待逾時）次數
+        self.long_held = 0           # 持有超過洩漏門檻的次數
+
+class _Replica:
+    """讀取副本（連線池與延遲狀態）"""
+    
+    # 副本延遲：已接收的 WAL 都已套用時為 0，否則為最後套用交易距今的秒數
+    LAG_QUERY = """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """
+    
+    def __init__(self, dsn, pool_):
+        params = parse_dsn(dsn)
+        self.name = f"{params.get('host', 'localhost')}:{params.get('port', '5432')}"
+        self.pool = pool_
+        self.lag = None
+        self.healthy = True
+        self.checked_at = 0.0
+        self.check_lock = threading.Lock()
+    
+    def refresh(self, interval):
+        """距離上次檢查超過 interval 秒時重新查詢延遲（同時只有一個執行緒檢查，其他沿用舊值）"""
+        if time.monotonic() - self.checked_at < interval or not self.check_lock.acquire(blocking=False):
+            return
+        try:
+            conn = self.pool.getconn()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.LAG_QUERY)
+                self.lag = float(cursor.fetchone()[0])
+                cursor.close()
+                conn.rollback()
+            finally:
+                self.pool.putconn(conn)
+            self.healthy = True
+        except Exception as e:
+            self.healthy = False
+            print(f"讀取副本 {self.name} 無法使用: {str(e)}")
+        finally:
+            self.checked_at = time.monotonic()
+            self.check_lock.release()
+
 class DatabaseConfig:
     """資料庫配置類別"""
     
@@ -29,7 +92,33 @@ class DatabaseConfig:
     MONGO_PASSWORD = os.getenv('MONGO_PASSWORD', '')
     
     # PostgreSQL 連線池
-    _postgres_pool: Optional[pool.ThreadedConnectionPool] = None
+    POSTGRES_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+    POSTGRES_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+    # 連線池耗盡時等待連線的上限（秒），逾時拋出 PoolTimeout
+    POSTGRES_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+    # 連線最長存活時間（秒），超過後歸還時關閉並重新建立
+    POSTGRES_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+    # 閒置超過此秒數的連線在借出前先驗證
+    POSTGRES_POOL_VALIDATE_IDLE = float(os.getenv('DB_POOL_VALIDATE_IDLE', '30'))
+    # 連線借出超過此秒數視為可能洩漏（記錄借出時的呼叫堆疊）
+    LEAK_THRESHOLD_SECONDS = float(os.getenv('DB_LEAK_THRESHOLD_SECONDS', '30'))
+    
+    # 讀取副本（以逗號分隔的 DSN / URL），延遲超過 DB_REPLICA_MAX_LAG_SECONDS 時改讀主資料庫
+    REPLICA_URLS = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', '5'))
+    
+    _postgres_pool: Optional[BlockingConnectionPool] = None
+    _replicas: Optional[list] = None
+    _replica_cursor = 0
+    _pool_lock = threading.Lock()
+    _pool_stats = _PoolStats()
+    # 連線池事件的監聽者（waited(seconds) / exhausted()，例如 Prometheus 指標）
+    _pool_listeners = []
+    # 目前的執行環境是否優先使用讀取副本（由 replica_reads() 設定）
+    _prefer_replica = ContextVar('db_prefer_replica', default=False)
+    # 共用連線（由 shared_connections() 設定）：'primary' / 'replica' -> 連線
+    _shared = ContextVar('db_shared_connections', default=None)
     
     # MongoDB 客戶端
     _mongo_client: Optional[MongoClient] = None
@@ -38,52 +127,314 @@ class DatabaseConfig:
     def get_postgres_pool(cls):
         """取得 PostgreSQL 連線池"""
         if cls._postgres_pool is None:
-            cls._postgres_pool = pool.ThreadedConnectionPool(
-                minconn=1,
-                maxconn=10,
-                host=cls.POSTGRES_HOST,
-                port=cls.POSTGRES_PORT,
-                database=cls.POSTGRES_DB,
-                user=cls.POSTGRES_USER,
-                password=cls.POSTGRES_PASSWORD
-            )
+            with cls._pool_lock:
+                if cls._postgres_pool is None:
+                    cls._postgres_pool = BlockingConnectionPool(
+                        minconn=cls.POSTGRES_POOL_MIN,
+                        maxconn=cls.POSTGRES_POOL_MAX,
+                        timeout=cls.POSTGRES_POOL_TIMEOUT,
+                        max_lifetime=cls.POSTGRES_POOL_MAX_LIFETIME,
+                        validate_idle=cls.POSTGRES_POOL_VALIDATE_IDLE,
+                        host=cls.POSTGRES_HOST,
+                        port=cls.POSTGRES_PORT,
+                        database=cls.POSTGRES_DB,
+                        user=cls.POSTGRES_USER,
+                        password=cls.POSTGRES_PASSWORD,
+                        cursor_factory=InstrumentedCursor
+                    )
         return cls._postgres_pool
     
     @classmethod
-    def get_postgres_connection(cls):
-        """取得 PostgreSQL 連線"""
-        pool = cls.get_postgres_pool()
-        return pool.getconn()
+    def get_replicas(cls):
+        """取得讀取副本清單（未設定 DB_REPLICA_URLS 時為空）"""
+        if cls._replicas is None:
+            with cls._pool_lock:
+                if cls._replicas is None:
+                    cls._replicas = [
+                        _Replica(url, BlockingConnectionPool(
+                            minconn=0,
+                            maxconn=cls.POSTGRES_POOL_MAX,
+                            timeout=cls.POSTGRES_POOL_TIMEOUT,
+                            max_lifetime=cls.POSTGRES_POOL_MAX_LIFETIME,
+                            validate_idle=cls.POSTGRES_POOL_VALIDATE_IDLE,
+                            dsn=url,
+                            cursor_factory=InstrumentedCursor
+                        ))
+                        for url in cls.REPLICA_URLS
+                    ]
+        return cls._replicas
+    
+    @classmethod
+    def _pick_replica(cls):
+        """輪流挑選健康且延遲在容許範圍內的副本；都不符合時回傳 None（改用主資料庫）"""
+        replicas = cls.get_replicas()
+        for _ in range(len(replicas)):
+            cls._replica_cursor = (cls._replica_cursor + 1) % len(replicas)
+            replica = replicas[cls._replica_cursor]
+            replica.refresh(cls.REPLICA_LAG_CHECK_INTERVAL)
+            if replica.healthy and replica.lag is not None and replica.lag <= cls.REPLICA_MAX_LAG_SECONDS:
+                return replica
+        return None
+    
+    @classmethod
+    @contextmanager
+    def replica_reads(cls):
+        """區塊內的 connection() 優先使用讀取副本（僅用於唯讀操作）"""
+        token = cls._prefer_replica.set(True)
+        try:
+            yield
+        finally:
+            cls._prefer_replica.reset(token)
+    
+    @classmethod
+    @contextmanager
+    def primary_reads(cls):
+        """區塊內的 connection() 一律使用主資料庫（即使在 replica_reads() 之內）"""
+        token = cls._prefer_replica.set(False)
+        try:
+            yield
+        finally:
+            cls._prefer_replica.reset(token)
+    
+    @classmethod
+    def warm_postgres_pool(cls):
+        """啟動時預先建立 DB_POOL_MIN 條連線（失敗時只記錄，第一次請求時再連線）"""
+        try:
+            cls.get_postgres_pool().warm()
+        except Exception as e:
+            print(f"PostgreSQL 連線池預熱失敗: {str(e)}")
+    
+    @classmethod
+    def add_pool_listener(cls, listener):
+        """註冊連線池事件的監聽者：每次取得連線後呼叫 waited(等待秒數)，等待逾時時另外呼叫 exhausted()"""
+        cls._pool_listeners.append(listener)
+    
+    @classmethod
+    def _notify_pool_listeners(cls, waited, exhausted=False):
+        for listener in cls._pool_listeners:
+            try:
+                listener.waited(waited)
+                if exhausted:
+                    listener.exhausted()
+            except Exception as e:
+                print(f"連線池監聽者執行失敗: {str(e)}")
+    
+    @classmethod
+    def get_postgres_connection(cls, pool_=None):
+        """取得 PostgreSQL 連線，連線池耗盡時排隊等待（建議改用 connection() / transaction()）"""
+        pool_ = pool_ or cls.get_postgres_pool()
+        stats = cls._pool_stats
+        started_at = time.perf_counter()
+        try:
+            conn = pool_.getconn()
+        except pool.PoolError:
+            with stats.lock:
+                stats.exhausted += 1
+            cls._notify_pool_listeners(time.perf_counter() - started_at, exhausted=True)
+            cls._report_leaks()
+            raise
+        waited = time.perf_counter() - started_at
+        cls._notify_pool_listeners(waited)
+        
+        with stats.lock:
+            stats.checkout_count += 1
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            stats.checkouts[id(conn)] = {
+                'pool': pool_,
+                'acquired_at': time.monotonic(),
+                'thread': threading.current_thread().name,
+                'stack': traceback.extract_stack(limit=16)[:-1]
+            }
+        return conn
     
     @classmethod
     def return_postgres_connection(cls, conn):
-        """歸還 PostgreSQL 連線到池中"""
-        pool = cls.get_postgres_pool()
-        pool.putconn(conn)
+        """歸還 PostgreSQL 連線到池中（重設 autocommit 並回滾未提交的交易）"""
+        stats = cls._pool_stats
+        with stats.lock:
+            checkout = stats.checkouts.pop(id(conn), None)
+            if checkout:
+                held = time.monotonic() - checkout['acquired_at']
+                stats.hold_seconds += held
+                if held > cls.LEAK_THRESHOLD_SECONDS:
+                    stats.long_held += 1
+        if checkout and held > cls.LEAK_THRESHOLD_SECONDS:
+            print(f"連線持有 {held:.1f} 秒才歸還，借出位置:\n{''.join(traceback.format_list(checkout['stack']))}")
+        
+        # 放回借出時的連線池（主資料庫或讀取副本）
+        pool_ = checkout['pool'] if checkout else cls.get_postgres_pool()
+        pool_.putconn(conn, close=not cls._reset_connection(conn))
+    
+    @classmethod
+    def _reset_connection(cls, conn):
+        """重設 autocommit 並回滾未提交的交易；連線已關閉或狀態異常時回傳 False（不可再使用）"""
+        if conn.closed:
+            return False
+        try:
+            if conn.autocommit:
+                conn.autocommit = False
+            elif conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+    
+    @classmethod
+    @contextmanager
+    def shared_connections(cls):
+        """
+        區塊內的 connection() 共用連線（主資料庫與讀取副本各一條，第一次使用時借出），離開區塊時才歸還；
+        每次 connection() 結束時仍會回滾未提交的變更。只用於同一執行緒中依序執行的唯讀操作（批次請求）
+        """
+        shared = {}
+        token = cls._shared.set(shared)
+        try:
+            yield
+        finally:
+            cls._shared.reset(token)
+            for conn in shared.values():
+                cls.return_postgres_connection(conn)
+    
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """
+        借出一條連線，離開區塊時一定歸還
+        區塊內未 commit 的變更會被回滾，autocommit 會被重設；
+        在 replica_reads() 之內且有可用的讀取副本時，改從副本借出；
+        在 shared_connections() 之內時改用共用的連線
+        """
+        shared = cls._shared.get()
+        if shared is None:
+            conn = cls._checkout()
+            try:
+                yield conn
+            finally:
+                cls.return_postgres_connection(conn)
+            return
+        
+        key = 'replica' if cls._prefer_replica.get() and cls.REPLICA_URLS else 'primary'
+        conn = shared.get(key)
+        if conn is None or conn.closed:
+            if conn is not None:
+                del shared[key]
+                cls.return_postgres_connection(conn)
+            conn = shared[key] = cls._checkout()
+        try:
+            yield conn
+        finally:
+            if not cls._reset_connection(conn):
+                del shared[key]
+                cls.return_postgres_connection(conn)
+    
+    @classmethod
+    def _checkout(cls):
+        """依 replica_reads() 的設定從讀取副本或主資料庫借出連線"""
+        conn = None
+        if cls._prefer_replica.get() and cls.REPLICA_URLS:
+            replica = cls._pick_replica()
+            if replica:
+                try:
+                    conn = cls.get_postgres_connection(replica.pool)
+                except (psycopg2.OperationalError, pool.PoolError) as e:
+                    replica.healthy = False
+                    print(f"讀取副本 {replica.name} 無法取得連線，改用主資料庫: {str(e)}")
+        if conn is None:
+            conn = cls.get_postgres_connection()
+        return conn
+    
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """借出一條連線並開始交易：區塊正常結束時 commit，發生例外時 rollback"""
+        with cls.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+    
+    @classmethod
+    def get_pool_stats(cls):
+        """取得連線池統計（使用中 / 閒置 / 等待時間 / 可能洩漏的連線）"""
+        stats = cls._pool_stats
+        pool_ = cls._postgres_pool
+        now = time.monotonic()
+        with stats.lock:
+            held = [(now - c['acquired_at'], c) for c in stats.checkouts.values()]
+            result = {
+                'min': cls.POSTGRES_POOL_MIN,
+                'max': cls.POSTGRES_POOL_MAX,
+                'in_use': len(stats.checkouts),
+                'idle': pool_.idle_count if pool_ else 0,
+                'opened': pool_.opened_count if pool_ else 0,
+                'waiting': pool_.waiting_count if pool_ else 0,
+                'recycled': pool_.recycled if pool_ else 0,
+                'checkouts': stats.checkout_count,
+                'acquire_timeout_seconds': cls.POSTGRES_POOL_TIMEOUT,
+                'exhausted': stats.exhausted,
+                'wait_seconds_total': round(stats.wait_seconds, 6),
+                'max_wait_seconds': round(stats.max_wait_seconds, 6),
+                'hold_seconds_total': round(stats.hold_seconds, 6),
+                'long_held': stats.long_held
+            }
+        result['longest_checkout_seconds'] = round(max((h for h, _ in held), default=0), 3)
+        result['suspected_leaks'] = [
+            {
+                'held_seconds': round(h, 3),
+                'thread': c['thread'],
+                'stack': traceback.format_list(c['stack'])
+            }
+            for h, c in sorted(held, key=lambda item: item[0], reverse=True)
+            if h > cls.LEAK_THRESHOLD_SECONDS
+        ]
+        result['replicas'] = [
+            {
+                'name': replica.name,
+                'healthy': replica.healthy,
+                'lag_seconds': replica.lag,
+                'idle': replica.pool.idle_count,
+                'opened': replica.pool.opened_count,
+                'waiting': replica.pool.waiting_count
+            }
+            for replica in (cls._replicas or [])
+        ]
+        return result
+    
+    @classmethod
+    def _report_leaks(cls):
+        """連線池耗盡時，印出目前借出中的連線與借出位置"""
+        stats = cls.get_pool_stats()
+        print(f"PostgreSQL 連線池已耗盡（使用中 {stats['in_use']} / 上限 {stats['max']}）")
+        for leak in stats['suspected_leaks']:
+            print(f"  已借出 {leak['held_seconds']} 秒（{leak['thread']}）:\n{''.join(leak['stack'])}")
+    
+    @classmethod
+    def get_mongo_uri(cls):
+        """取得 MongoDB 連接字串"""
+        # 優先使用 MONGO_URI（MongoDB Atlas 連接字符串）
+        mongo_uri = os.getenv('MONGO_URI')
+        if mongo_uri:
+            # 使用完整的連接字符串（MongoDB Atlas）
+            return mongo_uri
+        if cls.MONGO_USER and cls.MONGO_PASSWORD:
+            # 使用分離的配置（本地 MongoDB 或自定義設定）
+            # 檢查是否使用 SRV（MongoDB Atlas）
+            use_srv = os.getenv('MONGO_USE_SRV', 'false').lower() == 'true'
+            if use_srv:
+                return f"mongodb+srv://{cls.MONGO_USER}:{cls.MONGO_PASSWORD}@{cls.MONGO_HOST}/{cls.MONGO_DB}?retryWrites=true&w=majority"
+            return f"mongodb://{cls.MONGO_USER}:{cls.MONGO_PASSWORD}@{cls.MONGO_HOST}:{cls.MONGO_PORT}/{cls.MONGO_DB}"
+        # 無認證的本地 MongoDB
+        return f"mongodb://{cls.MONGO_HOST}:{cls.MONGO_PORT}/{cls.MONGO_DB}"
     
     @classmethod
     def get_mongo_client(cls):
         """取得 MongoDB 客戶端"""
         if cls._mongo_client is None:
-            # 優先使用 MONGO_URI（適用於 MongoDB Atlas）
-            mongo_uri = os.getenv('MONGO_URI')
-            
-            if mongo_uri:
-                # 使用完整的連接字符串（MongoDB Atlas）
-                cls._mongo_client = MongoClient(mongo_uri)
-            elif cls.MONGO_USER and cls.MONGO_PASSWORD:
-                # 使用分離的配置（本地 MongoDB 或自定義設定）
-                # 檢查是否使用 SRV（MongoDB Atlas）
-                use_srv = os.getenv('MONGO_USE_SRV', 'false').lower() == 'true'
-                if use_srv:
-                    mongo_uri = f"mongodb+srv://{cls.MONGO_USER}:{cls.MONGO_PASSWORD}@{cls.MONGO_HOST}/{cls.MONGO_DB}?retryWrites=true&w=majority"
-                else:
-                    mongo_uri = f"mongodb://{cls.MONGO_USER}:{cls.MONGO_PASSWORD}@{cls.MONGO_HOST}:{cls.MONGO_PORT}/{cls.MONGO_DB}"
-                cls._mongo_client = MongoClient(mongo_uri)
-            else:
-                # 無認證的本地 MongoDB
-                mongo_uri = f"mongodb://{cls.MONGO_HOST}:{cls.MONGO_PORT}/{cls.MONGO_DB}"
-                cls._mongo_client = MongoClient(mongo_uri)
+            cls._mongo_client = MongoClient(cls.get_mongo_uri())
         return cls._mongo_client
     
     @classmethod
@@ -94,9 +445,15 @@ class DatabaseConfig:
     
     @classmethod
     def close_all(cls):
-        """關閉所有連線"""
-        if cls._postgres_pool:
-            cls._postgres_pool.closeall()
+        """關閉所有連線（之後第一次使用時重新建立連線池 / client）"""
+        with cls._pool_lock:
+            if cls._postgres_pool:
+                cls._postgres_pool.closeall()
+            for replica in cls._replicas or []:
+                replica.pool.closeall()
+            cls._postgres_pool = None
+            cls._replicas = None
         if cls._mongo_client:
             cls._mongo_client.close()
+            cls._mongo_client = None
 
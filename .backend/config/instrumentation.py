@@ -0,0 +1,135 @@
+"""
+SQL 執行記錄
+連線池建立的連線使用 InstrumentedCursor（asyncpg 連線池為 config.async_database 的 InstrumentedConnection）：
+每次 execute 的耗時與列數記錄到目前請求的 QueryLog，
+超過 DB_SLOW_QUERY_MS 的查詢另外輸出一行 JSON 慢查詢紀錄（SQL 經正規化，不含參數值）
+"""
+import heapq
+import json
+import os
+import re
+import time
+from contextvars import ContextVar
+from psycopg2.extensions import cursor
+
+# 單一查詢超過此毫秒數輸出慢查詢紀錄
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+# 同一請求中相同（正規化後）的 SQL 執行超過此次數視為 N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', '5'))
+# 每個請求保留最慢的幾條 SQL
+SLOWEST_KEEP = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+def normalize_sql(sql):
+    """正規化 SQL：常數與參數改為 ?、合併空白，相同結構的查詢得到相同字串"""
+    sql = _STRING.sub('?', sql)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+def log_event(event, **fields):
+    """輸出一行 JSON 紀錄"""
+    print(json.dumps({'event': event, **fields}, ensure_ascii=False, default=str))
+
+class QueryLog:
+    """單一請求的 SQL 統計"""
+
+    def __init__(self, label=None):
+        self.label = label        # 例如 'GET /api/products'
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.statements = {}      # 正規化 SQL -> [次數, 累計秒數]
+        self._slowest = []        # (秒數, 序號, 正規化 SQL) 的 min-heap
+        self._seq = 0
+
+    def record(self, sql, seconds, rows):
+        """記錄一次執行"""
+        self.count += 1
+        self.seconds += seconds
+        self.rows += rows
+        entry = self.statements.setdefault(sql, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        self._seq += 1
+        item = (seconds, self._seq, sql)
+        if len(self._slowest) < SLOWEST_KEEP:
+            heapq.heappush(self._slowest, item)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self):
+        """最慢的 SQL（由慢到快）"""
+        return [{'sql': sql, 'duration_ms': round(seconds * 1000, 2)}
+                for seconds, _, sql in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """執行次數超過 threshold 的 SQL（疑似 N+1）"""
+        return [{'sql': sql, 'count': count, 'duration_ms': round(seconds * 1000, 2)}
+                for sql, (count, seconds) in self.statements.items() if count > threshold]
+
+_current = ContextVar('query_log', default=None)
+
+def begin_query_log(label=None):
+    """開始記錄目前執行環境的 SQL，回傳 (QueryLog, token)"""
+    log = QueryLog(label)
+    return log, _current.set(log)
+
+def end_query_log(token):
+    """停止記錄"""
+    _current.reset(token)
+
+def current_query_log():
+    """目前執行環境的 QueryLog（沒有時為 None）"""
+    return _current.get()
+
+def record_query(sql, seconds, rows):
+    """記錄一次執行到目前請求的 QueryLog；超過 DB_SLOW_QUERY_MS 時輸出慢查詢紀錄"""
+    log = _current.get()
+    slow = seconds * 1000 >= SLOW_QUERY_MS
+    if log is None and not slow:
+        return
+
+    normalized = normalize_sql(sql)
+    if log is not None:
+        log.record(normalized, seconds, rows)
+    if slow:
+        log_event('slow_query',
+                  request=log.label if log else None,
+                  sql=normalized,
+                  duration_ms=round(seconds * 1000, 2),
+                  rows=rows)
+
+class InstrumentedCursor(cursor):
+    """記錄每次執行耗時與列數的 cursor"""
+
+    # 實際送出的 SQL 與要記錄的 SQL 不同時（例如預備敘述的 EXECUTE），由呼叫端在執行前設定
+    traced_sql = None
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def _record(self, query, seconds):
+        sql, self.traced_sql = self.traced_sql or query, None
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        elif not isinstance(sql, str):
+            sql = sql.as_string(self)  # psycopg2.sql.Composable
+        record_query(sql, seconds, max(self.rowcount, 0))
@@ -0,0 +1,189 @@
+"""
+PostgreSQL 阻塞式連線池
+連線池耗盡時依先來先服務（FIFO）排隊等待，超過取得逾時才拋出 PoolTimeout；
+借出前驗證閒置過久的連線，並回收超過最長存活時間的連線
+"""
+import threading
+import time
+from collections import deque
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extensions import connection, TRANSACTION_STATUS_UNKNOWN
+
+class PoolTimeout(pool.PoolError):
+    """等待連線逾時"""
+    pass
+
+class PooledConnection(connection):
+    """連線池建立的連線；prepared 記錄此連線上已 PREPARE 的敘述名稱"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class _Waiter:
+    """排隊中的取得請求；歸還的連線（或建立新連線的名額）會直接交給佇列最前面的等待者"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+        self.granted = False
+
+class BlockingConnectionPool:
+    """阻塞式連線池（介面與 psycopg2 ThreadedConnectionPool 相容：getconn / putconn / closeall）"""
+
+    def __init__(self, minconn, maxconn, timeout=5.0, max_lifetime=1800.0, validate_idle=30.0, **kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout                # 取得連線的等待上限（秒）
+        self.max_lifetime = max_lifetime      # 連線最長存活時間（秒），0 表示不限制
+        self.validate_idle = validate_idle    # 閒置超過此秒數的連線借出前先以 SELECT 1 驗證
+        kwargs.setdefault('connection_factory', PooledConnection)
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._idle = deque()                  # (conn, 放回時間)
+        self._waiters = deque()
+        self._created_at = {}                 # id(conn) -> 建立時間
+        self._opened = 0                      # 已建立（含借出中）的連線數
+        self.closed = False
+        self.timeouts = 0
+        self.recycled = 0
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    @property
+    def waiting_count(self):
+        return len(self._waiters)
+
+    @property
+    def opened_count(self):
+        return self._opened
+
+    def warm(self):
+        """預先建立 minconn 條連線"""
+        while True:
+            with self._lock:
+                if self._opened >= self.minconn:
+                    return
+                self._opened += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+            self.putconn(conn)
+
+    def getconn(self):
+        """取得連線；沒有可用連線時排隊等待，逾時拋出 PoolTimeout"""
+        deadline = time.monotonic() + self.timeout
+        conn, idle_since = self._acquire(deadline)
+        if conn is not None:
+            if self._usable(conn, idle_since):
+                return conn
+            # 連線已失效：關閉後以同一個名額重新建立
+            self._discard(conn)
+        try:
+            return self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def putconn(self, conn, close=False):
+        """歸還連線；超過存活時間或狀態異常的連線會被關閉"""
+        if self.closed or close or conn.closed or self._expired(conn) \
+                or conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            self._release_slot()
+            return
+
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._idle.append((conn, time.monotonic()))
+
+    def closeall(self):
+        """關閉所有閒置連線，之後歸還的連線也會直接關閉"""
+        with self._lock:
+            self.closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _acquire(self, deadline):
+        """回傳 (連線, 閒置起始時間)；連線為 None 表示取得名額，呼叫端需自行建立新連線"""
+        with self._lock:
+            if self.closed:
+                raise pool.PoolError('連線池已關閉')
+            # 已有人排隊時不插隊，維持 FIFO
+            if not self._waiters:
+                if self._idle:
+                    return self._idle.pop()
+                if self._opened < self.maxconn:
+                    self._opened += 1
+                    return None, None
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+
+        waiter.event.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                self.timeouts += 1
+                raise PoolTimeout(f'資料庫連線繁忙，{self.timeout:g} 秒內無法取得連線')
+        # 直接交接的連線剛被歸還，不需要驗證
+        return waiter.conn, None
+
+    def _release_slot(self):
+        """釋放一個連線名額（連線被關閉時）；有人排隊時把名額交給最前面的等待者"""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = None
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._opened -= 1
+
+    def _connect(self):
+        """建立新連線"""
+        conn = psycopg2.connect(**self._kwargs)
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        """關閉連線（不釋放名額）"""
+        self._created_at.pop(id(conn), None)
+        self.recycled += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, conn):
+        """是否超過最長存活時間"""
+        if not self.max_lifetime:
+            return False
+        created_at = self._created_at.get(id(conn))
+        return created_at is not None and time.monotonic() - created_at > self.max_lifetime
+
+    def _usable(self, conn, idle_since):
+        """借出前檢查：已關閉、超過存活時間，或閒置過久且 SELECT 1 失敗的連線不可用"""
+        if conn.closed or self._expired(conn):
+            return False
+        if idle_since is None or time.monotonic() - idle_since < self.validate_idle:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
@@ -0,0 +1,18 @@
+-- 管理員列表分頁（keyset）與搜尋用索引
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 排序欄位 + 主鍵（keyset 分頁）
+CREATE INDEX IF NOT EXISTS idx_user_register_date ON "user"(register_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_status_register_date ON "user"(status, register_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_product_status_post_date ON product(status, post_date, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_post_date ON product(post_date, product_id);
+CREATE INDEX IF NOT EXISTS idx_user_name_sort ON "user"(user_name, user_id);
+CREATE INDEX IF NOT EXISTS idx_product_name_sort ON product(product_name, product_id);
+CREATE INDEX IF NOT EXISTS idx_transaction_complete_date ON transaction(complete_date, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_report_status_created_at ON report(status, created_at, report_id);
+
+-- q 參數模糊搜尋（ILIKE '%...%'）
+CREATE INDEX IF NOT EXISTS idx_user_name_trgm ON "user" USING gin (user_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_user_email_trgm ON "user" USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_user_student_id_trgm ON "user" USING gin (student_id gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_name_trgm ON product USING gin (product_name gin_trgm_ops);
@@ -0,0 +1,26 @@
+-- 新增背景工作表（非同步刪除帳號 / 使用者，含進度與中斷續跑）
+CREATE TABLE IF NOT EXISTS background_job (
+    job_id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(30) NOT NULL CHECK (job_type IN ('delete_user', 'soft_delete_user')),
+    target_user_id BIGINT NOT NULL,
+    requested_by BIGINT,
+    status VARCHAR(15) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    step VARCHAR(30),
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_job_status ON background_job(status, job_id);
+-- 同一使用者同時只能有一個排隊中或執行中的工作（重複送出的刪除請求沿用既有工作）
+CREATE UNIQUE INDEX IF NOT EXISTS idx_background_job_active_target ON background_job(target_user_id)
+    WHERE status IN ('queued', 'running');
+
+-- 刪除工作需要依使用者查詢的索引
+CREATE INDEX IF NOT EXISTS idx_review_reviewer ON review(reviewer_id);
+CREATE INDEX IF NOT EXISTS idx_report_reporter ON report(reporter_id);
+CREATE INDEX IF NOT EXISTS idx_trade_wish_user ON trade_wish(user_id);
@@ -0,0 +1,5 @@
+-- ETag 版本查詢所需的索引
+
+-- 商品詳情的賣家統計版本（被檢舉次數）
+CREATE INDEX IF NOT EXISTS idx_report_reported_user ON report(reported_user_id);
+CREATE INDEX IF NOT EXISTS idx_report_reported_product ON report(reported_product_id);
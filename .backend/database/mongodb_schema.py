@@ -65,6 +65,14 @@ def init_mongodb_collections():
         notifications.create_index([('user_id', ASCENDING), ('created_at', DESCENDING)])
         notifications.create_index([('is_read', ASCENDING)])
         
+        # ============================================
+        # 7. 登入嘗試紀錄 (login_attempts)
+        # 用於登入限流（LOGIN_RATE_LIMIT_BACKEND=mongo），到期自動刪除
+        # ============================================
+        login_attempts = db['login_attempts']
+        login_attempts.create_index([('key', ASCENDING), ('attempted_at', ASCENDING)])
+        login_attempts.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)  # TTL 索引
+        
         print("MongoDB collections 初始化完成！")
         return True
         
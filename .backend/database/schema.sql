@@ -6,6 +6,7 @@
 
 -- 啟用必要的擴展
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- ============================================
 -- 1. USER 表（使用者基本資料）
@@ -158,6 +159,10 @@ CREATE TABLE IF NOT EXISTS report (
 CREATE INDEX IF NOT EXISTS idx_product_status ON product(status);
 CREATE INDEX IF NOT EXISTS idx_product_owner ON product(owner_id);
 CREATE INDEX IF NOT EXISTS idx_product_category ON product(category_id);
+CREATE INDEX IF NOT EXISTS idx_product_status_post_date ON product(status, post_date, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_post_date ON product(post_date, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_name_sort ON product(product_name, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_name_trgm ON product USING gin (product_name gin_trgm_ops);
 
 -- TRADE_REQUEST 表索引
 CREATE INDEX IF NOT EXISTS idx_request_status_product ON trade_request(status, target_product_id);
@@ -172,14 +177,31 @@ CREATE INDEX IF NOT EXISTS idx_message_receiver ON message(receiver_id);
 -- REVIEW 表索引
 CREATE INDEX IF NOT EXISTS idx_review_reviewee ON review(reviewee_id);
 CREATE INDEX IF NOT EXISTS idx_review_transaction ON review(transaction_id);
+CREATE INDEX IF NOT EXISTS idx_review_reviewer ON review(reviewer_id);
 
 -- TRANSACTION 表索引
 CREATE INDEX IF NOT EXISTS idx_transaction_request ON transaction(request_id);
 CREATE INDEX IF NOT EXISTS idx_transaction_target_product ON transaction(target_product_id);
+CREATE INDEX IF NOT EXISTS idx_transaction_complete_date ON transaction(complete_date, transaction_id);
+
+-- REPORT 表索引
+CREATE INDEX IF NOT EXISTS idx_report_reporter ON report(reporter_id);
+CREATE INDEX IF NOT EXISTS idx_report_status_created_at ON report(status, created_at, report_id);
+CREATE INDEX IF NOT EXISTS idx_report_reported_user ON report(reported_user_id);
+CREATE INDEX IF NOT EXISTS idx_report_reported_product ON report(reported_product_id);
+
+-- TRADE_WISH 表索引
+CREATE INDEX IF NOT EXISTS idx_trade_wish_user ON trade_wish(user_id);
 
 -- USER 表索引
 CREATE INDEX IF NOT EXISTS idx_user_email ON "user"(email);
 CREATE INDEX IF NOT EXISTS idx_user_student_id ON "user"(student_id);
+CREATE INDEX IF NOT EXISTS idx_user_register_date ON "user"(register_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_status_register_date ON "user"(status, register_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_name_sort ON "user"(user_name, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_name_trgm ON "user" USING gin (user_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_user_email_trgm ON "user" USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_user_student_id_trgm ON "user" USING gin (student_id gin_trgm_ops);
 
 -- ============================================
 -- 觸發器：自動更新 updated_at
@@ -216,3 +238,27 @@ INSERT INTO category (category_name) VALUES
     ('Others')
 ON CONFLICT DO NOTHING;
 
+
+-- ============================================
+-- 11. BACKGROUND_JOB 表（背景刪除工作與進度）
+-- ============================================
+CREATE TABLE IF NOT EXISTS background_job (
+    job_id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(30) NOT NULL CHECK (job_type IN ('delete_user', 'soft_delete_user')),
+    target_user_id BIGINT NOT NULL,  -- 不設外鍵：刪除完成後使用者已不存在
+    requested_by BIGINT,
+    status VARCHAR(15) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    step VARCHAR(30),  -- 目前處理到的步驟（中斷後從此步驟續跑）
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,  -- 各步驟已處理列數
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_job_status ON background_job(status, job_id);
+-- 同一使用者同時只能有一個排隊中或執行中的工作（重複送出的刪除請求沿用既有工作）
+CREATE UNIQUE INDEX IF NOT EXISTS idx_background_job_active_target ON background_job(target_user_id)
+    WHERE status IN ('queued', 'running');
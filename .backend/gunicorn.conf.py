@@ -0,0 +1,61 @@
+"""
+gunicorn 設定（正式環境）
+啟動：gunicorn -c gunicorn.conf.py
+master 先載入應用程式（preload），再 fork 出 worker；master 在 fork 前關閉所有資料庫連線，
+每個 worker 第一次使用時才各自建立 PostgreSQL 連線池與 MongoDB client，不共用 fork 前的 socket。
+SIGHUP 重新載入設定並逐一替換 worker；SIGTERM 停止接受新連線，等待處理中的請求完成（最多 GUNICORN_GRACEFUL_TIMEOUT 秒）
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+wsgi_app = 'app:app'
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# worker 數預設為 CPU 核心數 * 2 + 1；每個 worker 以多執行緒處理請求
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = 'gthread'
+# 每個 worker 的執行緒數不應超過 DB_POOL_MAX，否則請求會排隊等待連線
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# 處理一定數量的請求後重啟 worker（加上隨機抖動，避免所有 worker 同時重啟）
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Prometheus 多 process 模式：目錄必須在載入應用程式（import prometheus_client）之前準備好。
+# 只在 master 第一次讀取設定時清空上一次執行留下的指標檔案（SIGHUP 重新讀取設定時不清空）
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'campus_trading_metrics'))
+if not os.environ.get('CAMPUS_METRICS_DIR_READY'):
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.environ['CAMPUS_METRICS_DIR_READY'] = '1'
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def when_ready(server):
+    """應用程式已在 master 載入：fork 前關閉 master 建立的連線"""
+    from config.database import DatabaseConfig
+    DatabaseConfig.close_all()
+
+def post_worker_init(worker):
+    """worker 啟動：預先建立本 worker 的連線池最小連線數、啟動背景工作執行緒（會續跑中斷的工作）"""
+    from config.database import DatabaseConfig
+    from utils.jobs import JobRunner
+    DatabaseConfig.warm_postgres_pool()
+    JobRunner.start()
+
+def worker_exit(server, worker):
+    """worker 結束（請求已處理完）：關閉本 worker 的連線"""
+    from config.database import DatabaseConfig
+    DatabaseConfig.close_all()
+
+def child_exit(server, worker):
+    """worker 結束後在 master 清除其即時指標（livesum gauge）"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -56,21 +56,25 @@ class ProductView:
 class SearchLog:
     """搜尋記錄"""
     
+    COLLECTION = 'search_logs'
+    
     @staticmethod
-    def log_search(user_id: Optional[int], keywords: str, filters: Dict[str, Any], result_count: int):
-        """記錄搜尋行為"""
-        db = DatabaseConfig.get_mongo_db()
-        collection = db['search_logs']
-        
-        log = {
+    def build(user_id: Optional[int], keywords: str, filters: Dict[str, Any], result_count: int) -> Dict[str, Any]:
+        """建立搜尋記錄文件"""
+        return {
             'user_id': user_id,
             'search_keywords': keywords,
             'filters': filters,
             'result_count': result_count,
             'timestamp': datetime.utcnow()
         }
-        
-        return collection.insert_one(log)
+    
+    @staticmethod
+    def log_search(user_id: Optional[int], keywords: str, filters: Dict[str, Any], result_count: int):
+        """記錄搜尋行為"""
+        db = DatabaseConfig.get_mongo_db()
+        collection = db[SearchLog.COLLECTION]
+        return collection.insert_one(SearchLog.build(user_id, keywords, filters, result_count))
 
 class Recommendation:
     """商品推薦"""
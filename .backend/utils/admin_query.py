@@ -0,0 +1,176 @@
+"""
+管理員列表查詢工具
+提供伺服器端的搜尋、篩選、排序與 keyset 分頁（cursor），
+排序與篩選欄位只接受白名單內（有索引）的欄位
+"""
+import base64
+import json
+import os
+from datetime import date, datetime
+
+# 每頁筆數
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# 資料表估計列數超過此值時，改用 pg_class.reltuples / EXPLAIN 估計總數
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv('ADMIN_COUNT_ESTIMATE_THRESHOLD', '50000'))
+
+class ListSpec:
+    """列表查詢規格"""
+
+    def __init__(self, table, from_clause, primary_key, sort_columns, default_sort,
+                 search_columns=(), status_column=None, date_column=None, default_status=None):
+        self.table = table                    # 用於 reltuples 估計的資料表名稱
+        self.from_clause = from_clause        # FROM ... JOIN ...
+        self.primary_key = primary_key        # keyset 的 tie-breaker
+        self.sort_columns = sort_columns      # {'sort 參數名稱': 'SQL 欄位'}（皆為 NOT NULL 且有索引）
+        self.default_sort = default_sort      # 例如 '-register_date'
+        self.search_columns = search_columns  # q 參數搜尋的欄位
+        self.status_column = status_column
+        self.date_column = date_column
+        self.default_status = default_status
+
+def encode_cursor(sort, value, pk):
+    """將最後一筆的排序值編碼為 cursor"""
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解碼 cursor，回傳 (sort, value, pk)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort, value, pk
+    except Exception:
+        raise ValueError('無效的 cursor')
+
+def _parse_sort(spec, sort):
+    """解析 sort 參數（'-欄位' 表示遞減），回傳 (SQL 欄位, 是否遞減)"""
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in spec.sort_columns:
+        raise ValueError(f'無效的排序欄位，必須是以下之一: {", ".join(spec.sort_columns)}')
+    return spec.sort_columns[name], descending
+
+def _parse_limit(value):
+    """解析 limit 參數"""
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit 必須為整數')
+    return max(1, min(limit, MAX_LIMIT))
+
+def _parse_date(name, value):
+    """解析日期參數（YYYY-MM-DD）"""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} 必須為 YYYY-MM-DD 格式的日期')
+
+def _build_filters(spec, args):
+    """依 q、status、date_from、date_to 建立 WHERE 條件"""
+    conditions = []
+    params = []
+
+    status = args.get('status', spec.default_status)
+    if status and status != 'all' and spec.status_column:
+        conditions.append(f"{spec.status_column} = %s")
+        params.append(status)
+
+    q = (args.get('q') or '').strip()
+    if q and spec.search_columns:
+        conditions.append('(' + ' OR '.join(f"{col} ILIKE %s" for col in spec.search_columns) + ')')
+        params.extend([f'%{q}%'] * len(spec.search_columns))
+
+    if spec.date_column:
+        if args.get('date_from'):
+            conditions.append(f"{spec.date_column} >= %s")
+            params.append(_parse_date('date_from', args['date_from']))
+        if args.get('date_to'):
+            conditions.append(f"{spec.date_column} < %s::date + INTERVAL '1 day'")
+            params.append(_parse_date('date_to', args['date_to']))
+
+    return conditions, params
+
+def _estimate_total(cursor, spec, conditions, params):
+    """取得總數：小表精確計算，大表使用 reltuples 或查詢計畫估計"""
+    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (spec.table,))
+    row = cursor.fetchone()
+    reltuples = row[0] if row else -1
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    if reltuples < COUNT_ESTIMATE_THRESHOLD:
+        cursor.execute(f"SELECT COUNT(*) FROM {spec.from_clause}{where}", params)
+        return cursor.fetchone()[0], False
+
+    if not conditions:
+        return reltuples, True
+
+    cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {spec.from_clause}{where}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
+
+def run_list_query(cursor, spec, select, args):
+    """
+    執行分頁列表查詢
+    select 為要查詢的欄位；結果列尾端會多出排序值與主鍵兩欄
+    回傳 {'rows', 'next_cursor', 'total', 'total_is_estimate'}
+    """
+    sort = args.get('sort') or spec.default_sort
+    sort_column, descending = _parse_sort(spec, sort)
+    limit = _parse_limit(args.get('limit'))
+    conditions, params = _build_filters(spec, args)
+
+    total = None
+    total_is_estimate = False
+    cursor_value = args.get('cursor')
+    if not cursor_value:
+        # 只在第一頁計算總數
+        total, total_is_estimate = _estimate_total(cursor, spec, conditions, params)
+
+    page_conditions = list(conditions)
+    page_params = list(params)
+    comparator = '<' if descending else '>'
+    if cursor_value:
+        cursor_sort, last_value, last_pk = decode_cursor(cursor_value)
+        if cursor_sort != sort:
+            raise ValueError('cursor 與排序條件不符')
+        if sort_column == spec.primary_key:
+            page_conditions.append(f"{spec.primary_key} {comparator} %s")
+            page_params.append(last_pk)
+        else:
+            page_conditions.append(f"({sort_column}, {spec.primary_key}) {comparator} (%s, %s)")
+            page_params.extend([last_value, last_pk])
+
+    direction = 'DESC' if descending else 'ASC'
+    order_by = f"{sort_column} {direction}"
+    if sort_column != spec.primary_key:
+        order_by += f", {spec.primary_key} {direction}"
+    where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+
+    cursor.execute(f"""
+        SELECT {select}, {sort_column} AS _sort_value, {spec.primary_key} AS _pk
+        FROM {spec.from_clause}{where}
+        ORDER BY {order_by}
+        LIMIT %s
+    """, page_params + [limit + 1])
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last[-2], last[-1])
+
+    return {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'total': total,
+        'total_is_estimate': total_is_estimate
+    }
@@ -2,7 +2,7 @@
 認證工具函數（JWT 版本）
 """
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
 import jwt
 import os
 from datetime import datetime, timedelta
@@ -32,6 +32,15 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
+def verify_request_token(token):
+    """驗證請求的 token；同一請求中（包括批次請求的各子請求）相同的 token 只解碼一次"""
+    cached = g.get('verified_token')
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    user_id = verify_token(token)
+    g.verified_token = (token, user_id)
+    return user_id
+
 def get_token_from_request():
     """從請求中取得 token"""
     # 從 Authorization header 取得
@@ -59,11 +68,12 @@ def token_required(f):
         if not token:
             return jsonify({'error': '需要提供認證 token'}), 401
         
-        user_id = verify_token(token)
+        user_id = verify_request_token(token)
         if not user_id:
             return jsonify({'error': '無效或過期的 token'}), 401
         
-        # 將 user_id 傳遞給路由函數
+        # 將 user_id 傳遞給路由函數（同時記錄在 g，供請求後的處理使用）
+        g.user_id = user_id
         return f(user_id, *args, **kwargs)
     
     return decorated
@@ -73,7 +83,7 @@ def get_user_id():
     """從請求中取得 user_id（從 JWT token）"""
     token = get_token_from_request()
     if token:
-        return verify_token(token)
+        return verify_request_token(token)
     return None
 
 def user_id_required(f):
@@ -0,0 +1,115 @@
+"""
+分類目錄快取
+分類幾乎不變：每個 process 在記憶體保存一份分類對照表（啟動時載入），商品查詢不再 JOIN category，
+改由對照表補上 category_name。管理員新增 / 修改 / 刪除分類後立即失效並重新載入；
+其他 process（gunicorn 的其他 worker）最多 CATEGORY_REFRESH_INTERVAL 秒後重新載入，
+遇到對照表中沒有的 category_id 時也會立即重新載入。
+版本號由分類內容計算，所有 process 對同一份資料得到相同的版本
+"""
+import hashlib
+import os
+import threading
+import time
+import orjson
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+from utils.compression import precompress
+
+# 對照表的有效秒數（其他 process 修改分類後，最多經過此秒數才會看到）
+CATEGORY_REFRESH_INTERVAL = int(os.getenv('CATEGORY_REFRESH_INTERVAL', '60'))
+
+CATEGORY_QUERY = """
+    SELECT category_id, category_name, created_at
+    FROM category
+    ORDER BY category_id
+"""
+
+class CategorySnapshot:
+    """某一版本的分類資料（建立後不再修改）"""
+
+    def __init__(self, rows):
+        self.rows = [tuple(row) for row in rows]
+        self.names = {row[0]: row[1] for row in self.rows}
+        self.version = hashlib.sha1(
+            repr([(row[0], row[1]) for row in self.rows]).encode('utf-8')
+        ).hexdigest()[:12]
+        # 公開端點的回應內容：序列化並預先壓縮一次
+        self.body = orjson.dumps({
+            'version': self.version,
+            'categories': [{'category_id': row[0], 'category_name': row[1]} for row in self.rows]
+        })
+        self.variants = precompress(self.body)
+        self.loaded_at = time.monotonic()
+
+    def expired(self):
+        return time.monotonic() - self.loaded_at > CATEGORY_REFRESH_INTERVAL
+
+    def covers(self, category_ids):
+        """對照表是否包含所有 category_id"""
+        return all(category_id in self.names for category_id in category_ids)
+
+class CategoryCatalog:
+    """分類目錄（每個 process 一份）"""
+
+    _snapshot = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def load(cls, rows):
+        """以查詢結果建立新版本"""
+        cls._snapshot = CategorySnapshot(rows)
+        return cls._snapshot
+
+    @classmethod
+    def refresh(cls):
+        """從主資料庫重新載入（讀取副本可能尚未同步剛修改的分類）"""
+        with cls._lock:
+            with DatabaseConfig.primary_reads(), DatabaseConfig.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(CATEGORY_QUERY)
+                rows = cursor.fetchall()
+                cursor.close()
+            return cls.load(rows)
+
+    @classmethod
+    def warm(cls):
+        """啟動時載入（失敗時只記錄，第一次使用時再載入）"""
+        try:
+            cls.refresh()
+        except Exception as e:
+            print(f"分類目錄載入失敗: {str(e)}")
+
+    @classmethod
+    def invalidate(cls):
+        """分類已修改：下次使用時重新載入"""
+        snapshot = cls._snapshot
+        if snapshot is not None:
+            snapshot.loaded_at = float('-inf')
+
+    @classmethod
+    def current(cls, category_ids=()):
+        """目前的分類資料；過期或缺少 category_ids 中的分類時重新載入（呼叫時不應持有資料庫連線）"""
+        snapshot = cls._snapshot
+        if snapshot is None or snapshot.expired() or not snapshot.covers(category_ids):
+            try:
+                snapshot = cls.refresh()
+            except Exception:
+                # 重新載入失敗時沿用舊版本
+                if snapshot is None:
+                    raise
+        return snapshot
+
+    @classmethod
+    async def current_async(cls, category_ids=()):
+        """ASGI 版本：以 asyncpg 重新載入"""
+        snapshot = cls._snapshot
+        if snapshot is None or snapshot.expired() or not snapshot.covers(category_ids):
+            from config.async_database import AsyncDatabaseConfig
+            try:
+                snapshot = cls.load(await AsyncDatabaseConfig.fetch(CATEGORY_QUERY))
+            except Exception:
+                if snapshot is None:
+                    raise
+        return snapshot
@@ -0,0 +1,141 @@
+"""
+回應壓縮
+依 Accept-Encoding 協商 br（需安裝 brotli 套件）或 gzip，只壓縮文字類型且大於 COMPRESS_MIN_SIZE 的回應；
+串流（generator）回應逐塊壓縮並即時送出。
+快取的回應可先以 precompress() 以最高壓縮率壓縮一次，之後直接送出對應的壓縮版本（response.precompressed）
+"""
+import gzip
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小於此位元組數的回應不壓縮（壓縮的收益小於成本）
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+# 每次請求即時壓縮的等級（快取的回應使用最高等級預先壓縮）
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+)
+
+def supported_encodings():
+    """伺服器支援的壓縮方式（依偏好排序）"""
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def choose_encoding(accept_encoding):
+    """依 Accept-Encoding（含 q 值）選擇壓縮方式；不接受任何支援的方式時回傳 None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compressible(mimetype):
+    """是否為值得壓縮的內容類型"""
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+def compress(data, encoding, best=False):
+    """壓縮 data；best=True 時使用最高壓縮率（用於只壓縮一次的快取）"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+def precompress(data):
+    """預先壓縮快取的回應內容，回傳 {'identity': 原始內容, 'gzip': ..., 'br': ...}"""
+    variants = {'identity': data}
+    if len(data) >= COMPRESS_MIN_SIZE:
+        for encoding in supported_encodings():
+            variants[encoding] = compress(data, encoding, best=True)
+    return variants
+
+def _stream(chunks, encoding):
+    """逐塊壓縮串流回應，每塊都 flush，讓用戶端即時收到資料"""
+    try:
+        yield from _compress_chunks(chunks, encoding)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def _compress_chunks(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+def should_compress(method, response):
+    """回應是否需要依 Accept-Encoding 處理（Flask 與 Quart 共用）"""
+    return not (method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304)
+                or getattr(response, 'direct_passthrough', False) or 'Content-Encoding' in response.headers
+                or not compressible(response.mimetype))
+
+def apply_precompressed(response, encoding):
+    """快取的回應：直接使用預先壓縮的版本（沒有 precompressed 時回傳 False）"""
+    precompressed = getattr(response, 'precompressed', None)
+    if precompressed is None:
+        return False
+    if encoding in precompressed:
+        response.set_data(precompressed[encoding])
+        response.headers['Content-Encoding'] = encoding
+    return True
+
+def add_vary(response, name='Accept-Encoding'):
+    """將 name 加入單一的 Vary 標頭（已包含時不重複加入）"""
+    vary = response.headers.get('Vary', '')
+    if name.lower() not in (part.strip().lower() for part in vary.split(',')):
+        response.headers['Vary'] = f'{vary}, {name}' if vary else name
+
+def compress_response(response):
+    """after_request：依 Accept-Encoding 壓縮回應"""
+    if not should_compress(request.method, response):
+        return response
+
+    add_vary(response)
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if apply_precompressed(response, encoding) or encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
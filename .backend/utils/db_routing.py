@@ -0,0 +1,73 @@
+"""
+讀取副本路由
+以 @read_only 標記的唯讀端點改從讀取副本（DB_REPLICA_URLS）查詢；
+使用者自己寫入後的 DB_READ_YOUR_WRITES_SECONDS 秒內仍讀主資料庫，確保讀得到剛寫入的資料。
+寫入時間除了記在 process 內，也以短效 cookie 帶回用戶端，之後由其他 worker / 主機處理的請求同樣適用
+"""
+import math
+import os
+import threading
+import time
+from functools import wraps
+from flask import g, request
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+from utils.auth import get_user_id
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
+
+# 會寫入資料的 HTTP 方法
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# 記錄讀主資料庫期限（epoch 秒）的 cookie
+READ_YOUR_WRITES_COOKIE = 'rw_until'
+
+# 每記錄多少次寫入清理一次過期的紀錄
+SWEEP_EVERY = 1000
+
+_last_write = {}  # user_id -> 最後一次寫入的時間
+_lock = threading.Lock()
+_writes = 0
+
+def record_write(response):
+    """after_request：記錄使用者成功的寫入請求，之後短時間內的讀取改走主資料庫"""
+    global _writes
+    user_id = g.get('user_id')
+    if user_id and request.method in WRITE_METHODS and response.status_code < 400:
+        now = time.monotonic()
+        with _lock:
+            _last_write[user_id] = now
+            _writes += 1
+            if _writes % SWEEP_EVERY == 0:
+                for key in [k for k, t in _last_write.items() if now - t > READ_YOUR_WRITES_SECONDS]:
+                    del _last_write[key]
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, f'{time.time() + READ_YOUR_WRITES_SECONDS:.3f}',
+                            max_age=math.ceil(READ_YOUR_WRITES_SECONDS), path='/api',
+                            httponly=True, samesite='Lax')
+    return response
+
+def recently_wrote(user_id):
+    """使用者是否在 read-your-writes 視窗內寫入過"""
+    written_at = _last_write.get(user_id)
+    return written_at is not None and time.monotonic() - written_at <= READ_YOUR_WRITES_SECONDS
+
+def prefers_primary(user_id, cookies):
+    """唯讀請求是否應讀主資料庫：本 process 記錄到寫入，或請求帶有未過期的寫入 cookie"""
+    if user_id and recently_wrote(user_id):
+        return True
+    try:
+        return time.time() <= float(cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+    except ValueError:
+        return False
+
+def read_only(f):
+    """唯讀端點裝飾器：查詢改用讀取副本（需放在 token_required / admin_required 之後）"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if prefers_primary(g.get('user_id') or get_user_id(), request.cookies):
+            return f(*args, **kwargs)
+        with DatabaseConfig.replica_reads():
+            return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,16 @@
+"""
+路由的錯誤回應
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.pool import PoolTimeout
+
+def server_error(error):
+    """
+    路由 except Exception 區塊的回應：一般例外回傳 500；
+    PoolTimeout 重新拋出，由 app 的 errorhandler 統一回傳 503（Flask 與 Quart 皆可使用）
+    """
+    if isinstance(error, PoolTimeout):
+        raise error
+    return {'error': str(error)}, 500
@@ -0,0 +1,25 @@
+"""
+ETag 與條件式 GET
+ETag 由便宜的版本查詢（筆數、最後更新時間）產生，請求的 If-None-Match 相符時直接回傳 304，
+不執行讀取完整內容的查詢。使用弱 ETag：同一內容的壓縮與未壓縮版本共用同一個 ETag。
+Flask 與 Quart 的 request / response 皆為 werkzeug 物件，兩個版本共用
+"""
+import hashlib
+
+def weak_etag(*parts):
+    """由版本資訊產生 ETag 的值（不含 W/ 與引號）"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+def etag_matches(request, etag):
+    """請求的 If-None-Match 是否包含 etag（弱比較）"""
+    return request.if_none_match.contains_weak(etag)
+
+def with_etag(response, etag, private=False):
+    """設定 ETag；Cache-Control: no-cache 讓瀏覽器每次以 If-None-Match 重新驗證"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    return response
+
+def not_modified(response_class, etag, private=False):
+    """304 回應"""
+    return with_etag(response_class('', status=304), etag, private)
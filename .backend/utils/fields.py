@@ -0,0 +1,81 @@
+"""
+稀疏欄位（fields= 參數）
+列表端點以 FieldSet 宣告每個輸出欄位需要的 SQL 欄位與計算方式；請求帶 fields=a,b 時，
+SELECT 只查詢這些輸出欄位需要的 SQL 欄位，回應也只包含這些欄位（依宣告順序）。
+未指定 fields 時查詢並輸出全部欄位，與原本的完整回應相同
+"""
+from functools import lru_cache
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.prepared import execute_prepared
+
+class Field:
+    """
+    輸出欄位
+    columns 為需要的 SQL 欄位（運算式，不加別名）；value(row, context) 由 {SQL 欄位: 值} 計算輸出值，
+    未提供時直接輸出第一個 SQL 欄位的值
+    """
+
+    def __init__(self, name, *columns, value=None):
+        self.name = name
+        self.columns = columns
+        self.value = value or (lambda row, context: row[columns[0]])
+
+class Projection:
+    """選定的輸出欄位與對應的 SQL 投影"""
+
+    def __init__(self, fields, key_column, full=False):
+        self.fields = fields
+        self.full = full
+        self.names = tuple(field.name for field in fields)
+        columns = [key_column]
+        for field in fields:
+            for column in field.columns:
+                if column not in columns:
+                    columns.append(column)
+        self.columns = tuple(columns)
+        self.sql = ', '.join(columns)
+
+    def item(self, row, context=None):
+        """查詢結果的一列轉為 dict（row 尾端多出的欄位，例如分頁用的排序值，會被忽略）"""
+        values = dict(zip(self.columns, row))
+        return {field.name: field.value(values, context) for field in self.fields}
+
+    def column_values(self, rows, column):
+        """查詢結果中某個 SQL 欄位的所有值（未查詢此欄位時為空集合）"""
+        if column not in self.columns:
+            return set()
+        index = self.columns.index(column)
+        return {row[index] for row in rows}
+
+class FieldSet:
+    """列表端點可輸出的欄位；key_column（主鍵）一律查詢"""
+
+    def __init__(self, key_column, *fields):
+        self.key_column = key_column
+        self.fields = {field.name: field for field in fields}
+        self.full = Projection(list(fields), key_column, full=True)
+
+    def select(self, fields_param):
+        """依 fields 參數（以逗號分隔）選擇欄位；未指定時為全部欄位，有無效的欄位名稱時拋出 ValueError"""
+        names = {name.strip() for name in (fields_param or '').split(',') if name.strip()}
+        if not names:
+            return self.full
+        invalid = sorted(names - self.fields.keys())
+        if invalid:
+            raise ValueError(f'無效的欄位 {", ".join(invalid)}，必須是以下之一: {", ".join(self.fields)}')
+        return self._projection(frozenset(names))
+
+    @lru_cache(maxsize=128)
+    def _projection(self, names):
+        return Projection([field for name, field in self.fields.items() if name in names], self.key_column)
+
+def execute_projection(cursor, projection, sql, params=None):
+    """
+    執行依 projection 組合的查詢：完整欄位以預備敘述執行；
+    其他欄位組合的數量不定（由請求決定），改用一般 execute，不佔用連線上的預備敘述名額
+    """
+    if projection.full:
+        return execute_prepared(cursor, sql, params)
+    return cursor.execute(sql, params)
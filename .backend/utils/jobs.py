@@ -0,0 +1,333 @@
+"""
+背景刪除工作（帳號刪除 / 使用者刪除）
+工作記錄在 PostgreSQL 的 background_job 表中，背景執行緒以固定批次大小處理相依資料，
+每批借用一次連線、commit 並更新進度；程序中斷後，逾時未更新的 running 工作會被重新領取並從目前步驟繼續。
+同一使用者同時只會有一個排隊中或執行中的工作（部分唯一索引 idx_background_job_active_target）
+"""
+import os
+import threading
+from psycopg2.extras import Json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+
+# 每批處理的列數
+JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', '500'))
+# 沒有新工作時的輪詢間隔（秒）
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '5'))
+# running 工作超過此秒數未更新視為中斷，可被重新領取
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '300'))
+
+# 進行中交易請求檢查（作為請求者、目標商品擁有者或交換商品擁有者）
+ACTIVE_REQUESTS_QUERY = """
+    SELECT COUNT(*)
+    FROM trade_request tr
+    LEFT JOIN product p_target ON tr.target_product_id = p_target.product_id
+    LEFT JOIN product p_offered ON tr.offered_product_id = p_offered.product_id
+    WHERE (tr.requester_id = %(user_id)s
+           OR p_target.owner_id = %(user_id)s
+           OR p_offered.owner_id = %(user_id)s)
+    AND tr.status IN ('Pending', 'Accepted')
+"""
+
+# 各步驟的批次 SQL：每次最多處理 %(batch)s 列，重複執行直到處理列數小於批次大小
+# 所有步驟皆可重複執行（冪等），因此中斷後可從目前步驟直接續跑
+DELETE_USER_STEPS = [
+    ('messages', """
+        DELETE FROM message WHERE message_id IN (
+            SELECT message_id FROM message
+            WHERE sender_id = %(user_id)s OR receiver_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('reviews', """
+        DELETE FROM review WHERE review_id IN (
+            SELECT review_id FROM review
+            WHERE reviewer_id = %(user_id)s OR reviewee_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('transactions', """
+        DELETE FROM transaction WHERE transaction_id IN (
+            SELECT t.transaction_id
+            FROM transaction t
+            JOIN trade_request tr ON t.request_id = tr.request_id
+            JOIN product p ON t.target_product_id = p.product_id
+            WHERE tr.requester_id = %(user_id)s OR p.owner_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('trade_requests', """
+        DELETE FROM trade_request WHERE request_id IN (
+            SELECT tr.request_id
+            FROM trade_request tr
+            JOIN product p ON tr.target_product_id = p.product_id
+            WHERE tr.requester_id = %(user_id)s OR p.owner_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('trade_wishes', """
+        DELETE FROM trade_wish WHERE wish_id IN (
+            SELECT wish_id FROM trade_wish
+            WHERE user_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('reports', """
+        DELETE FROM report WHERE report_id IN (
+            SELECT report_id FROM report
+            WHERE reporter_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('products', """
+        DELETE FROM product WHERE product_id IN (
+            SELECT product_id FROM product
+            WHERE owner_id = %(user_id)s
+            LIMIT %(batch)s
+        )
+    """),
+    ('user', """
+        DELETE FROM "user" WHERE user_id = %(user_id)s
+    """)
+]
+
+SOFT_DELETE_USER_STEPS = [
+    ('user', """
+        UPDATE "user"
+        SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = %(user_id)s AND deleted_at IS NULL
+    """),
+    ('products', """
+        UPDATE product
+        SET status = 'removed', updated_at = CURRENT_TIMESTAMP
+        WHERE product_id IN (
+            SELECT product_id FROM product
+            WHERE owner_id = %(user_id)s AND status IN ('available', 'reserved')
+            LIMIT %(batch)s
+        )
+    """)
+]
+
+JOB_TYPES = {
+    # 管理員刪除使用者（完全刪除）
+    'delete_user': {
+        'active_requests_error': '無法刪除帳號：該使用者有進行中的交易請求，請先處理完所有交易請求後再刪除',
+        'steps': DELETE_USER_STEPS
+    },
+    # 使用者刪除自己的帳號（軟刪除，保留歷史資料）
+    'soft_delete_user': {
+        'active_requests_error': '無法刪除帳號：您有進行中的交易請求，請先處理完所有交易請求後再刪除',
+        'steps': SOFT_DELETE_USER_STEPS
+    }
+}
+
+class JobRunner:
+    """背景工作執行器（每個 process 一個執行緒）"""
+
+    _worker = None
+    _worker_pid = None
+    _start_lock = threading.Lock()
+    _wakeup = threading.Event()
+
+    @classmethod
+    def validation_error(cls, job_type, target_user_id):
+        """建立工作前的檢查：有進行中的交易請求時回傳錯誤訊息，否則回傳 None"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f'未知的工作類型: {job_type}')
+
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(ACTIVE_REQUESTS_QUERY, {'user_id': target_user_id})
+            active_requests = cursor.fetchone()[0]
+            cursor.close()
+
+        if active_requests > 0:
+            return JOB_TYPES[job_type]['active_requests_error']
+        return None
+
+    @classmethod
+    def enqueue(cls, job_type, target_user_id, requested_by):
+        """
+        建立工作並喚醒背景執行緒，回傳 job_id
+        該使用者已有排隊中或執行中的工作時不重複建立，回傳既有工作的 job_id
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f'未知的工作類型: {job_type}')
+
+        with DatabaseConfig.transaction() as conn:
+            cursor = conn.cursor()
+            job_id = None
+            while job_id is None:
+                cursor.execute("""
+                    INSERT INTO background_job (job_type, target_user_id, requested_by)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (target_user_id) WHERE status IN ('queued', 'running') DO NOTHING
+                    RETURNING job_id
+                """, (job_type, target_user_id, requested_by))
+                row = cursor.fetchone()
+                if row is None:
+                    # 衝突的工作可能在兩個語句之間結束，此時查無結果，重新嘗試插入
+                    cursor.execute("""
+                        SELECT job_id FROM background_job
+                        WHERE target_user_id = %s AND status IN ('queued', 'running')
+                    """, (target_user_id,))
+                    row = cursor.fetchone()
+                if row is not None:
+                    job_id = row[0]
+            cursor.close()
+
+        cls.start()
+        cls._wakeup.set()
+        return job_id
+
+    @classmethod
+    def get_job(cls, job_id):
+        """查詢工作狀態"""
+        with DatabaseConfig.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT job_id, job_type, target_user_id, requested_by, status, step,
+                       progress, result, error, created_at, started_at, updated_at, finished_at
+                FROM background_job
+                WHERE job_id = %s
+            """, (job_id,))
+            job = cursor.fetchone()
+            cursor.close()
+
+        if not job:
+            return None
+
+        return {
+            'job_id': job[0],
+            'job_type': job[1],
+            'target_user_id': job[2],
+            'requested_by': job[3],
+            'status': job[4],
+            'step': job[5],
+            'progress': job[6],
+            'result': job[7],
+            'error': job[8],
+            'created_at': job[9].isoformat() if job[9] else None,
+            'started_at': job[10].isoformat() if job[10] else None,
+            'updated_at': job[11].isoformat() if job[11] else None,
+            'finished_at': job[12].isoformat() if job[12] else None
+        }
+
+    @classmethod
+    def start(cls):
+        """
+        啟動背景執行緒（每個 process 一次，可重複呼叫）
+        於 worker 啟動時呼叫（gunicorn post_worker_init、ASGI before_serving、python app.py）；
+        enqueue 也會呼叫，確保建立工作的 process 一定有執行緒
+        """
+        if cls._worker_pid == os.getpid() and cls._worker and cls._worker.is_alive():
+            return
+        with cls._start_lock:
+            if cls._worker_pid == os.getpid() and cls._worker and cls._worker.is_alive():
+                return
+            cls._worker = threading.Thread(target=cls._run, name='job-runner', daemon=True)
+            cls._worker_pid = os.getpid()
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls):
+        """背景迴圈：領取並處理工作"""
+        while True:
+            try:
+                while cls._process_next():
+                    pass
+            except Exception as e:
+                print(f"背景工作處理失敗: {str(e)}")
+            cls._wakeup.wait(JOB_POLL_INTERVAL)
+            cls._wakeup.clear()
+
+    @classmethod
+    def _process_next(cls):
+        """領取一個工作並執行，沒有工作時回傳 False（連線只在領取與每批處理時借用，不在整個工作期間佔用）"""
+        with DatabaseConfig.transaction() as conn:
+            cursor = conn.cursor()
+            # 領取排隊中或逾時中斷的工作（SKIP LOCKED 避免多個 process 重複領取）
+            cursor.execute("""
+                UPDATE background_job
+                SET status = 'running',
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = (
+                    SELECT job_id FROM background_job
+                    WHERE status = 'queued'
+                       OR (status = 'running' AND updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                    ORDER BY job_id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING job_id, job_type, target_user_id, step, progress
+            """, (JOB_STALE_SECONDS,))
+            job = cursor.fetchone()
+            cursor.close()
+
+        if not job:
+            return False
+
+        job_id, job_type, target_user_id, step, progress = job
+        try:
+            cls._execute(job_id, job_type, target_user_id, step, progress or {})
+        except Exception as e:
+            with DatabaseConfig.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE background_job
+                    SET status = 'failed', error = %s, updated_at = CURRENT_TIMESTAMP,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE job_id = %s
+                """, (str(e), job_id))
+                cursor.close()
+        return True
+
+    @classmethod
+    def _execute(cls, job_id, job_type, target_user_id, step, progress):
+        """依步驟分批執行工作，每批借用一次連線、commit 並更新進度"""
+        job_spec = JOB_TYPES[job_type]
+        steps = job_spec['steps']
+        params = {'user_id': target_user_id, 'batch': JOB_BATCH_SIZE}
+
+        # 尚未開始任何步驟時再驗證一次（建立工作後可能有新的交易請求；續跑時代表驗證已通過）
+        if step is None:
+            error = cls.validation_error(job_type, target_user_id)
+            if error:
+                cls._finish(job_id, 'failed', progress, error=error)
+                return
+            step = steps[0][0]
+
+        step_names = [name for name, _ in steps]
+        for name, query in steps[step_names.index(step):]:
+            while True:
+                with DatabaseConfig.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params)
+                    affected = cursor.rowcount
+                    progress[name] = progress.get(name, 0) + affected
+                    cursor.execute("""
+                        UPDATE background_job
+                        SET step = %s, progress = %s, updated_at = CURRENT_TIMESTAMP
+                        WHERE job_id = %s
+                    """, (name, Json(progress), job_id))
+                    cursor.close()
+                if affected < JOB_BATCH_SIZE:
+                    break
+
+        cls._finish(job_id, 'completed', progress, result=progress)
+
+    @staticmethod
+    def _finish(job_id, status, progress, result=None, error=None):
+        """標記工作結束"""
+        with DatabaseConfig.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE background_job
+                SET status = %s, progress = %s, result = %s, error = %s,
+                    updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+                WHERE job_id = %s
+            """, (status, Json(progress), Json(result) if result is not None else None, error, job_id))
+            cursor.close()
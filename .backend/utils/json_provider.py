@@ -0,0 +1,40 @@
+"""
+JSON 序列化（orjson）
+取代 Flask 預設以標準函式庫 json 實作的 provider：datetime / date 直接輸出 ISO 8601 字串，
+Decimal 與 Flask 預設相同轉為字串；回應不排序鍵、不縮排，中文直接以 UTF-8 輸出
+"""
+import decimal
+import uuid
+import orjson
+from flask.json.provider import JSONProvider
+
+# 非字串的 dict 鍵（例如 int）與標準函式庫相同轉為字串
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(o):
+    """orjson 不支援的型別"""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class OrjsonProvider(JSONProvider):
+    """以 orjson 實作的 JSON provider（Flask 與 Quart 共用）"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=_OPTIONS),
+            mimetype='application/json'
+        )
@@ -0,0 +1,160 @@
+"""
+Prometheus 指標（/metrics）
+記錄各藍圖 / 路由的請求數、延遲分佈、狀態碼、處理中的請求數，以及 PostgreSQL 連線池與 MongoDB 指令延遲。
+多 process 部署（gunicorn 等）時請設定 PROMETHEUS_MULTIPROC_DIR（需在啟動前建立、清空），
+各 worker 將數值寫入該目錄，/metrics 彙總所有 worker
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+# 連線池指標在請求結束時最多每隔幾秒更新一次（/metrics 被抓取時一定更新）
+POOL_METRICS_INTERVAL = 1.0
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP 請求數',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP 請求處理時間（秒）',
+    ['blueprint', 'endpoint', 'method']
+)
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress', '處理中的 HTTP 請求數',
+    ['blueprint'], multiprocess_mode='livesum'
+)
+
+POOL_IN_USE = Gauge('db_pool_connections_in_use', '借出中的 PostgreSQL 連線數', multiprocess_mode='livesum')
+POOL_IDLE = Gauge('db_pool_connections_idle', '閒置的 PostgreSQL 連線數', multiprocess_mode='livesum')
+POOL_WAITING = Gauge('db_pool_waiting', '等待 PostgreSQL 連線的請求數', multiprocess_mode='livesum')
+POOL_MAX = Gauge('db_pool_connections_max', 'PostgreSQL 連線池上限', multiprocess_mode='livesum')
+# 累計值使用 Counter（匯出為 *_total）：由連線池在事件發生時遞增，worker 重啟後 rate() / increase() 仍正確
+POOL_EXHAUSTED = Counter('db_pool_exhausted', '等待連線逾時的次數')
+POOL_WAIT = Counter('db_pool_wait_seconds', '取得連線的等待時間（秒）')
+
+MONGO_LATENCY = Histogram(
+    'mongo_command_duration_seconds', 'MongoDB 指令執行時間（秒）',
+    ['command', 'status']
+)
+
+class _MongoCommandListener(monitoring.CommandListener):
+    """記錄 MongoDB 指令耗時"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(event.command_name, 'ok').observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(event.command_name, 'error').observe(event.duration_micros / 1e6)
+
+# 需在建立 MongoClient 之前註冊（DatabaseConfig 延遲建立 client）
+monitoring.register(_MongoCommandListener())
+
+class _PoolListener:
+    """記錄 PostgreSQL 連線池的等待時間與逾時次數"""
+
+    def waited(self, seconds):
+        POOL_WAIT.inc(seconds)
+
+    def exhausted(self):
+        POOL_EXHAUSTED.inc()
+
+DatabaseConfig.add_pool_listener(_PoolListener())
+
+# 指標子物件快取，避免每次請求都經過 labels() 的鎖
+_children = {}   # (blueprint, endpoint, method) -> (延遲, 處理中)
+_counters = {}   # (blueprint, endpoint, method, status) -> 請求數
+_pool_updated_at = 0.0
+
+def _labels(endpoint_key):
+    children = _children.get(endpoint_key)
+    if children is None:
+        blueprint = endpoint_key[0]
+        children = _children.setdefault(endpoint_key, (
+            LATENCY.labels(*endpoint_key),
+            IN_PROGRESS.labels(blueprint)
+        ))
+    return children
+
+def _counter(key, status):
+    counter_key = (*key, status)
+    counter = _counters.get(counter_key)
+    if counter is None:
+        counter = _counters.setdefault(counter_key, REQUESTS.labels(*key, str(status)))
+    return counter
+
+def endpoint_key(request_):
+    """請求的指標標籤（Flask 或 Quart 的 request）"""
+    # 未匹配任何路由（404 等）的請求歸為同一組，避免標籤數量隨網址無限成長
+    return (request_.blueprint or '', request_.endpoint or 'unmatched', request_.method)
+
+def _update_pool_metrics():
+    """以連線池目前狀態更新指標"""
+    global _pool_updated_at
+    _pool_updated_at = time.monotonic()
+    if DatabaseConfig._postgres_pool is None:
+        return
+    stats = DatabaseConfig.get_pool_stats()
+    POOL_IN_USE.set(stats['in_use'])
+    POOL_IDLE.set(stats['idle'])
+    POOL_WAITING.set(stats['waiting'])
+    POOL_MAX.set(stats['max'])
+
+def request_started(key):
+    """處理中的請求數加一，回傳開始時間"""
+    _labels(key)[1].inc()
+    return time.perf_counter()
+
+def request_finished(key, started_at, status):
+    """記錄延遲與狀態碼"""
+    _labels(key)[0].observe(time.perf_counter() - started_at)
+    _counter(key, status).inc()
+    if time.monotonic() - _pool_updated_at >= POOL_METRICS_INTERVAL:
+        try:
+            _update_pool_metrics()
+        except Exception as e:
+            print(f"更新連線池指標失敗: {str(e)}")
+
+def request_ended(key):
+    """處理中的請求數減一"""
+    _labels(key)[1].dec()
+
+def begin_request():
+    """before_request：記錄開始時間與處理中的請求數"""
+    g.metrics_key = endpoint_key(request)
+    g.metrics_started_at = request_started(g.metrics_key)
+
+def finish_request(response):
+    """after_request：記錄延遲與狀態碼"""
+    key = g.get('metrics_key')
+    if key is not None:
+        request_finished(key, g.metrics_started_at, response.status_code)
+    return response
+
+def end_request(error=None):
+    """teardown_request：處理中的請求數減一（例外時也會執行）"""
+    key = g.pop('metrics_key', None)
+    if key is not None:
+        request_ended(key)
+
+def metrics_view():
+    """GET /metrics：Prometheus 文字格式"""
+    _update_pool_metrics()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
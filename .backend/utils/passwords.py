@@ -0,0 +1,120 @@
+"""
+密碼雜湊工具
+bcrypt 的雜湊與驗證在專用的有限執行緒池中執行（bcrypt 計算時會釋放 GIL），
+呼叫端應先歸還資料庫連線再呼叫，避免 CPU 密集的雜湊佔用連線池
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt cost（調整後，舊密碼會在下次登入時自動重新雜湊）
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# 雜湊執行緒數
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+# 排隊中的雜湊工作上限（超過時直接拒絕）
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', '64'))
+# 等待雜湊結果的逾時（秒）
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+class PasswordHasherBusy(Exception):
+    """雜湊佇列已滿或逾時"""
+    pass
+
+class _HasherStats:
+    """雜湊佇列與耗時統計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = 0          # 等待執行中的工作數
+        self.running = 0         # 執行中的工作數
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0  # 累計排隊時間
+        self.hash_seconds = 0.0  # 累計雜湊時間
+
+_stats = _HasherStats()
+_executor = None
+_executor_pid = None
+_slots = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """取得執行緒池（fork 後在子程序重新建立）"""
+    global _executor, _executor_pid, _slots
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                               thread_name_prefix='password-hash')
+                _slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+                _executor_pid = os.getpid()
+    return _executor, _slots
+
+def _run(func, *args):
+    """在雜湊執行緒池中執行 func，並記錄排隊與執行時間"""
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        with _stats.lock:
+            _stats.rejected += 1
+        raise PasswordHasherBusy('密碼驗證服務忙碌中，請稍後再試')
+
+    submitted_at = time.perf_counter()
+    with _stats.lock:
+        _stats.queued += 1
+
+    def task():
+        started_at = time.perf_counter()
+        with _stats.lock:
+            _stats.queued -= 1
+            _stats.running += 1
+            _stats.wait_seconds += started_at - submitted_at
+        try:
+            return func(*args)
+        finally:
+            with _stats.lock:
+                _stats.running -= 1
+                _stats.completed += 1
+                _stats.hash_seconds += time.perf_counter() - started_at
+            slots.release()
+
+    future = executor.submit(task)
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy('密碼驗證逾時，請稍後再試')
+
+def hash_password(password):
+    """雜湊密碼（使用目前設定的 cost）"""
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+def verify_password(password, hashed):
+    """驗證密碼"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+def needs_rehash(hashed):
+    """檢查雜湊的 cost 是否與目前設定不同（格式：$2b$<cost>$...）"""
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def get_hasher_stats():
+    """取得雜湊佇列統計"""
+    with _stats.lock:
+        return {
+            'workers': PASSWORD_HASH_WORKERS,
+            'queue_limit': PASSWORD_HASH_QUEUE_LIMIT,
+            'rounds': BCRYPT_ROUNDS,
+            'queue_depth': _stats.queued,
+            'running': _stats.running,
+            'completed': _stats.completed,
+            'rejected': _stats.rejected,
+            'wait_seconds_total': round(_stats.wait_seconds, 6),
+            'hash_seconds_total': round(_stats.hash_seconds, 6)
+        }
@@ -0,0 +1,133 @@
+"""
+伺服器端預備敘述（PREPARE / EXECUTE）
+熱門查詢在每條連線第一次執行時 PREPARE，之後以名稱 EXECUTE，省去每次的解析與規劃；
+已預備的名稱記錄在連線池建立的連線物件上（PooledConnection.prepared），連線重建後會自動重新 PREPARE。
+使用 transaction pooling 模式的 PgBouncer 時請設定 DB_PREPARED_STATEMENTS=false
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+import psycopg2.errors
+
+PREPARED_STATEMENTS_ENABLED = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+# 每條連線最多預備的敘述數（動態組合的查詢可能產生多種變體）
+PREPARED_MAX_PER_CONNECTION = int(os.getenv('DB_PREPARED_MAX_PER_CONNECTION', '100'))
+# 每個 process 保留的 SQL 轉換結果數（超過時淘汰最久未使用的）
+PREPARED_CACHE_SIZE = int(os.getenv('DB_PREPARED_CACHE_SIZE', '500'))
+
+# psycopg2 的參數佔位符：%(name)s、%s 與跳脫的 %%
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+
+class PreparedStatement:
+    """將 psycopg2 格式的 SQL 轉為 PREPARE / EXECUTE 敘述"""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.name = 'ps_' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:16]
+        self.param_names = []   # 具名參數（依 $n 順序）
+        self.param_count = 0    # 位置參數個數
+
+        def replace(match):
+            if match.group(0) == '%%':
+                return '%'
+            if match.group(1):
+                if match.group(1) not in self.param_names:
+                    self.param_names.append(match.group(1))
+                return f'${self.param_names.index(match.group(1)) + 1}'
+            self.param_count += 1
+            return f'${self.param_count}'
+
+        body = _PLACEHOLDER.sub(replace, sql)
+        if self.param_names and self.param_count:
+            raise ValueError('不能混用具名與位置參數')
+
+        count = len(self.param_names) or self.param_count
+        self.body = body        # 使用 $n 參數的 SQL（asyncpg 也使用此格式）
+        self.prepare_sql = f'PREPARE {self.name} AS {body}'
+        self.execute_sql = f"EXECUTE {self.name}" + (f" ({', '.join(['%s'] * count)})" if count else '')
+
+    def args(self, params):
+        """依 $n 順序排列 EXECUTE 的參數"""
+        if self.param_names:
+            return [params[name] for name in self.param_names]
+        return list(params or ())
+
+class _PreparedStats:
+    """預備敘述使用統計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prepares = 0   # PREPARE 次數
+        self.executes = 0   # 以名稱 EXECUTE 的次數
+        self.fallbacks = 0  # 改用一般 execute 的次數
+
+_statements = OrderedDict()  # sql -> PreparedStatement（LRU，最多 PREPARED_CACHE_SIZE 個）
+_statements_lock = threading.Lock()
+_stats = _PreparedStats()
+
+def _statement(sql):
+    """取得（或建立）sql 對應的預備敘述"""
+    with _statements_lock:
+        stmt = _statements.get(sql)
+        if stmt is not None:
+            _statements.move_to_end(sql)
+            return stmt
+    stmt = PreparedStatement(sql)
+    with _statements_lock:
+        _statements[sql] = stmt
+        while len(_statements) > PREPARED_CACHE_SIZE:
+            _statements.popitem(last=False)
+    return stmt
+
+def numbered_query(sql, params=None, cache=True):
+    """
+    將 psycopg2 格式的 SQL 與參數轉為 $n 格式（供 asyncpg 使用），回傳 (sql, args)
+    cache=False 用於組合數量不定的查詢（例如 fields= 選擇的欄位），轉換結果不保留
+    """
+    stmt = _statement(sql) if cache else PreparedStatement(sql)
+    return stmt.body, stmt.args(params)
+
+def execute_prepared(cursor, sql, params=None):
+    """
+    以預備敘述執行 sql（參數格式與 cursor.execute 相同）
+    停用、連線不是由連線池建立，或連線上的預備敘述已達上限時，改用一般的 cursor.execute
+    """
+    names = getattr(cursor.connection, 'prepared', None)
+    if not PREPARED_STATEMENTS_ENABLED or names is None:
+        return cursor.execute(sql, params)
+
+    stmt = _statement(sql)
+    if stmt.name not in names:
+        if len(names) >= PREPARED_MAX_PER_CONNECTION:
+            with _stats.lock:
+                _stats.fallbacks += 1
+            return cursor.execute(sql, params)
+        cursor.execute(stmt.prepare_sql)
+        names.add(stmt.name)
+        with _stats.lock:
+            _stats.prepares += 1
+
+    with _stats.lock:
+        _stats.executes += 1
+    if hasattr(cursor, 'traced_sql'):
+        cursor.traced_sql = sql  # SQL 記錄使用原始 SQL，而非 EXECUTE ps_...
+    try:
+        cursor.execute(stmt.execute_sql, stmt.args(params))
+    except psycopg2.errors.InvalidSqlStatementName:
+        # 連線上的預備敘述已不存在（例如被 DEALLOCATE），下次執行時重新 PREPARE
+        names.discard(stmt.name)
+        raise
+
+def get_prepared_stats():
+    """取得預備敘述統計"""
+    with _stats.lock:
+        return {
+            'enabled': PREPARED_STATEMENTS_ENABLED,
+            'max_per_connection': PREPARED_MAX_PER_CONNECTION,
+            'statements': len(_statements),
+            'prepares': _stats.prepares,
+            'executes': _stats.executes,
+            'fallbacks': _stats.fallbacks
+        }
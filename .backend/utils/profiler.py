@@ -0,0 +1,291 @@
+"""
+取樣式請求分析器
+依 PROFILE_SAMPLE_RATE 的比例（或管理員帶 X-Profile 標頭的請求）對請求取樣：
+背景執行緒每 PROFILE_INTERVAL_MS 毫秒以 sys._current_frames() 讀取被分析請求的呼叫堆疊，
+依路由累計成 collapsed stack 格式（可直接交給 flamegraph.pl / speedscope 繪製火焰圖）。
+ASGI 版本的非同步請求以 asyncio task 為單位分析：task 正在事件迴圈上執行時取事件迴圈執行緒的堆疊，
+否則取協程停在 await 的位置。
+多 process 部署（設定 PROMETHEUS_MULTIPROC_DIR）時，各 process 每 PROFILE_FLUSH_SECONDS 秒將樣本寫入
+該目錄下的 profiles/<pid>.json，查詢時彙總所有 process 的樣本。
+未啟用取樣且請求沒有 X-Profile 標頭時，每個請求只多一次設定檢查
+"""
+import asyncio
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.auth import get_user_id
+
+# 取樣比例（0 ~ 1，0 表示只分析帶 X-Profile 標頭的管理員請求）
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+# 取樣間隔（毫秒）
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+# 每個路由最多保留的不同堆疊數，超過的樣本計入 '(other)'
+PROFILE_MAX_STACKS = int(os.getenv('PROFILE_MAX_STACKS', '5000'))
+# 多 process 時寫入共用目錄的間隔（秒）
+PROFILE_FLUSH_SECONDS = float(os.getenv('PROFILE_FLUSH_SECONDS', '5'))
+PROFILE_HEADER = 'X-Profile'
+
+# 各 process 樣本的共用目錄（與 Prometheus 多 process 指標共用目錄；未設定時樣本只保存在本 process）
+_PROFILE_DIR = os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], 'profiles') if os.getenv('PROMETHEUS_MULTIPROC_DIR') else None
+# 清除樣本時更新此檔案的修改時間；較舊的樣本檔案與記憶體中的樣本視為已清除
+_RESET_MARKER = 'reset'
+
+_BACKEND_DIR = str(Path(__file__).parent.parent) + os.sep
+
+class _ProfileData:
+    """各路由累計的堆疊樣本"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}     # key -> (路由, 執行緒 ident, asyncio task 或 None)（正在被分析的請求）
+        self.stacks = {}     # 路由 -> Counter(collapsed stack -> 樣本數)
+        self.requests = Counter()  # 路由 -> 被分析的請求數
+        self.dirty = False         # 上次寫入共用目錄後是否有新樣本
+        self.flushed_at = 0.0
+        self.reset_seen = 0.0      # 已套用的清除時間（_RESET_MARKER 的修改時間）
+
+_data = _ProfileData()
+_sampler = None
+_sampler_pid = None
+_start_lock = threading.Lock()
+_wakeup = threading.Event()
+
+def _frame_name(frame):
+    """堆疊中一層的名稱：函式 (檔案:行號)；專案內的檔案使用相對路徑"""
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = filename[len(_BACKEND_DIR):]
+    else:
+        filename = os.sep.join(filename.split(os.sep)[-2:])
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+def _collapse(frame):
+    """由外到內串接堆疊（collapsed stack 格式）"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def _task_stack(task, frame):
+    """asyncio task 的堆疊；frame 為事件迴圈執行緒目前的堆疊"""
+    coro = task.get_coro()
+    outer = coro.cr_frame
+    if outer is None:
+        return None
+    current = frame
+    while current is not None:
+        if current is outer:
+            return _collapse(frame)
+        current = current.f_back
+    # task 停在 await：沿著 cr_await / gi_yieldfrom 由外到內串接協程
+    names = []
+    while coro is not None:
+        code_frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if code_frame is None:
+            break
+        names.append(_frame_name(code_frame))
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return ';'.join(names)
+
+def _reset_time():
+    """最近一次清除樣本的時間（沒有共用目錄或未曾清除時為 0）"""
+    if _PROFILE_DIR is None:
+        return 0.0
+    try:
+        return os.stat(os.path.join(_PROFILE_DIR, _RESET_MARKER)).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+def _apply_reset():
+    """其他 process 清除過樣本時，清除本 process 的樣本（呼叫端須持有 _data.lock）"""
+    reset_at = _reset_time()
+    if reset_at > _data.reset_seen:
+        _data.stacks.clear()
+        _data.requests.clear()
+        _data.reset_seen = reset_at
+
+def _flush():
+    """將本 process 的樣本寫入共用目錄（先寫暫存檔再改名，讀取時不會讀到寫到一半的檔案）"""
+    with _data.lock:
+        _apply_reset()
+        snapshot = {
+            'requests': dict(_data.requests),
+            'stacks': {route: dict(counter) for route, counter in _data.stacks.items()}
+        }
+        _data.dirty = False
+        _data.flushed_at = time.monotonic()
+    try:
+        os.makedirs(_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(_PROFILE_DIR, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"寫入取樣分析資料失敗: {str(e)}")
+
+def _sample_loop():
+    """背景取樣迴圈；沒有被分析的請求時休眠"""
+    interval = PROFILE_INTERVAL_MS / 1000
+    while True:
+        if _PROFILE_DIR and _data.dirty and (
+                not _data.active or time.monotonic() - _data.flushed_at >= PROFILE_FLUSH_SECONDS):
+            _flush()
+        if not _data.active:
+            _wakeup.wait()
+            _wakeup.clear()
+            continue
+        frames = sys._current_frames()
+        with _data.lock:
+            for route, ident, task in list(_data.active.values()):
+                frame = frames.get(ident)
+                if task is not None:
+                    stack = _task_stack(task, frame)
+                elif frame is not None:
+                    stack = _collapse(frame)
+                else:
+                    stack = None
+                if not stack:
+                    continue
+                counter = _data.stacks.setdefault(route, Counter())
+                if stack not in counter and len(counter) >= PROFILE_MAX_STACKS:
+                    stack = '(other)'
+                counter[stack] += 1
+                _data.dirty = True
+        del frames
+        time.sleep(interval)
+
+def _ensure_sampler():
+    """啟動取樣執行緒（每個 process 一次）"""
+    global _sampler, _sampler_pid
+    if _sampler_pid == os.getpid() and _sampler and _sampler.is_alive():
+        return
+    with _start_lock:
+        if _sampler_pid == os.getpid() and _sampler and _sampler.is_alive():
+            return
+        _sampler = threading.Thread(target=_sample_loop, name='request-profiler', daemon=True)
+        _sampler_pid = os.getpid()
+        _sampler.start()
+
+def _requested_by_admin():
+    """請求帶有 X-Profile 標頭且為管理員"""
+    if not request.headers.get(PROFILE_HEADER):
+        return False
+    user_id = get_user_id()
+    if not user_id:
+        return False
+    from api.routes.admin import is_admin
+    return is_admin(user_id)
+
+def sampled():
+    """依 PROFILE_SAMPLE_RATE 決定是否取樣"""
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def start(key, route, task=None):
+    """開始分析一個請求（key 於 stop() 時使用；task 為非同步請求所在的 asyncio task）"""
+    _ensure_sampler()
+    with _data.lock:
+        _apply_reset()
+        _data.active[key] = (route, threading.get_ident(), task)
+        _data.requests[route] += 1
+        _data.dirty = True
+    _wakeup.set()
+
+def stop(key):
+    """停止分析"""
+    with _data.lock:
+        _data.active.pop(key, None)
+
+def begin_request():
+    """before_request：決定是否分析本次請求"""
+    if not sampled() and not _requested_by_admin():
+        return
+    start(threading.get_ident(), request.endpoint or 'unmatched')
+    g.profiled = True
+
+def end_request(error=None):
+    """teardown_request：停止分析本次請求"""
+    if g.pop('profiled', False):
+        stop(threading.get_ident())
+
+def begin_task(route):
+    """分析目前的 asyncio task（ASGI 版本的 before_request 使用），回傳 stop() 使用的 key"""
+    task = asyncio.current_task()
+    key = ('task', id(task))
+    start(key, route, task)
+    return key
+
+def _collect():
+    """彙總本 process（記憶體）與其他 process（共用目錄，清除之後寫入的檔案）的樣本，回傳 (stacks, requests)"""
+    with _data.lock:
+        _apply_reset()
+        stacks = {route: Counter(counter) for route, counter in _data.stacks.items()}
+        requests = Counter(_data.requests)
+    if _PROFILE_DIR is None:
+        return stacks, requests
+
+    own = os.path.join(_PROFILE_DIR, f'{os.getpid()}.json')
+    reset_at = _reset_time()
+    for path in glob.glob(os.path.join(_PROFILE_DIR, '*.json')):
+        if path == own:
+            continue
+        try:
+            if os.stat(path).st_mtime < reset_at:
+                continue
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            # 檔案在讀取期間被清除或不完整，略過
+            continue
+        requests.update(snapshot['requests'])
+        for route, counter in snapshot['stacks'].items():
+            stacks.setdefault(route, Counter()).update(counter)
+    return stacks, requests
+
+def get_profiles():
+    """各路由的取樣摘要（多 process 時為所有 process 的合計）"""
+    stacks, requests = _collect()
+    return [
+        {
+            'route': route,
+            'requests': requests[route],
+            'samples': sum(counter.values()),
+            'stacks': len(counter)
+        }
+        for route, counter in sorted(stacks.items())
+    ]
+
+def get_collapsed_stacks(route):
+    """路由的 collapsed stack 文字（每行「堆疊 樣本數」）；沒有資料時回傳 None"""
+    counter = _collect()[0].get(route)
+    if counter is None:
+        return None
+    return '\n'.join(f'{stack} {count}' for stack, count in counter.most_common()) + '\n'
+
+def reset_profiles():
+    """清除累計的樣本（多 process 時其他 process 在下次取樣或寫入時清除各自的樣本）"""
+    with _data.lock:
+        _data.stacks.clear()
+        _data.requests.clear()
+        if _PROFILE_DIR is None:
+            return
+        os.makedirs(_PROFILE_DIR, exist_ok=True)
+        marker = os.path.join(_PROFILE_DIR, _RESET_MARKER)
+        with open(marker, 'w', encoding='utf-8'):
+            pass
+        os.utime(marker)
+        _data.reset_seen = _reset_time()
+    for path in glob.glob(os.path.join(_PROFILE_DIR, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
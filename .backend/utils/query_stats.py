@@ -0,0 +1,53 @@
+"""
+每個請求的 SQL 統計
+請求開始時建立 QueryLog，回應加上 Server-Timing 標頭（資料庫時間、查詢數、總處理時間）；
+資料庫時間超過 DB_SLOW_QUERY_MS 或偵測到 N+1（相同 SQL 執行超過 DB_N_PLUS_ONE_THRESHOLD 次）時
+輸出一行 JSON 請求摘要（含最慢的 SQL）
+"""
+import time
+from flask import g, request
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.instrumentation import (
+    SLOW_QUERY_MS, begin_query_log, end_query_log, log_event
+)
+
+def begin_request():
+    """before_request：開始記錄本次請求的 SQL"""
+    g.request_started_at = time.perf_counter()
+    g.query_log, g.query_log_token = begin_query_log(f'{request.method} {request.path}')
+
+def finish_request(response):
+    """after_request：加上 Server-Timing 標頭，必要時輸出請求摘要"""
+    log = g.get('query_log')
+    if log is not None:
+        add_server_timing(response, log, g.request_started_at)
+    return response
+
+def add_server_timing(response, log, started_at):
+    """加上 Server-Timing 標頭，必要時輸出請求摘要（Flask 與 Quart 的回應皆可）"""
+    total_ms = (time.perf_counter() - started_at) * 1000
+    db_ms = log.seconds * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_ms:.1f};desc="{log.count} queries, {log.rows} rows", app;dur={total_ms:.1f}'
+    )
+
+    repeated = log.repeated()
+    if repeated or db_ms >= SLOW_QUERY_MS:
+        log_event('request_queries',
+                  request=log.label,
+                  status=response.status_code,
+                  queries=log.count,
+                  rows=log.rows,
+                  db_ms=round(db_ms, 2),
+                  total_ms=round(total_ms, 2),
+                  slowest=log.slowest(),
+                  n_plus_one=repeated)
+
+def end_request(error=None):
+    """teardown_request：停止記錄（同一執行緒的下一個請求不會沿用）"""
+    token = g.pop('query_log_token', None)
+    if token is not None:
+        end_query_log(token)
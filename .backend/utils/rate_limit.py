@@ -0,0 +1,142 @@
+"""
+滑動視窗限流工具
+用於登入等敏感端點：在查詢資料庫與 bcrypt 驗證之前先拒絕過量的嘗試
+預設使用程序內（記憶體）實作；LOGIN_RATE_LIMIT_BACKEND=mongo 時改用 MongoDB TTL collection，
+讓多個 process / 主機共用計數
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+
+LOGIN_RATE_LIMIT_BACKEND = os.getenv('LOGIN_RATE_LIMIT_BACKEND', 'memory')  # 'memory' 或 'mongo'
+LOGIN_WINDOW_SECONDS = int(os.getenv('LOGIN_WINDOW_SECONDS', '900'))
+LOGIN_MAX_ATTEMPTS_PER_EMAIL = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_EMAIL', '10'))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_IP', '50'))
+
+class SlidingWindowLimiter:
+    """程序內滑動視窗限流器"""
+
+    # 每處理多少次請求清理一次過期的 key
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key, limit, window):
+        """
+        記錄一次嘗試；超過上限時不記錄並回傳需等待的秒數，否則回傳 0
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now, window)
+
+            hits = self._hits.setdefault(key, deque())
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return max(1, math.ceil(hits[0] + window - now)) if hits else window
+            hits.append(now)
+            return 0
+
+    def reset(self, key):
+        """清除 key 的紀錄（例如登入成功後）"""
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def forget(self, key):
+        """移除 key 最近一次的紀錄（該次嘗試不計入上限）"""
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits:
+                hits.pop()
+
+    def _sweep(self, now, window):
+        """移除視窗內已無紀錄的 key，避免記憶體持續成長"""
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - window]:
+            del self._hits[key]
+
+class MongoSlidingWindowLimiter:
+    """以 MongoDB TTL collection 實作的共用滑動視窗限流器"""
+
+    COLLECTION = 'login_attempts'
+
+    def hit(self, key, limit, window):
+        """記錄一次嘗試；超過上限時回傳需等待的秒數，否則回傳 0"""
+        collection = DatabaseConfig.get_mongo_db()[self.COLLECTION]
+        now = datetime.utcnow()
+        window_start = now - timedelta(seconds=window)
+
+        recent = list(collection.find(
+            {'key': key, 'attempted_at': {'$gt': window_start}},
+            {'attempted_at': 1}
+        ).sort('attempted_at', 1).limit(limit))
+        if len(recent) >= limit:
+            if not recent:
+                return window
+            oldest = recent[0]['attempted_at']
+            return max(1, math.ceil((oldest + timedelta(seconds=window) - now).total_seconds()))
+
+        collection.insert_one({
+            'key': key,
+            'attempted_at': now,
+            'expires_at': now + timedelta(seconds=window)  # TTL 索引到期後自動刪除
+        })
+        return 0
+
+    def reset(self, key):
+        """清除 key 的紀錄"""
+        DatabaseConfig.get_mongo_db()[self.COLLECTION].delete_many({'key': key})
+
+    def forget(self, key):
+        """移除 key 最近一次的紀錄"""
+        DatabaseConfig.get_mongo_db()[self.COLLECTION].find_one_and_delete(
+            {'key': key}, sort=[('attempted_at', -1)]
+        )
+
+_memory_limiter = SlidingWindowLimiter()
+_limiter = MongoSlidingWindowLimiter() if LOGIN_RATE_LIMIT_BACKEND == 'mongo' else _memory_limiter
+
+def _hit(key, limit, window):
+    """記錄嘗試；共用後端失敗時退回程序內限流"""
+    try:
+        return _limiter.hit(key, limit, window)
+    except Exception as e:
+        print(f"限流後端錯誤，改用程序內限流: {str(e)}")
+        return _memory_limiter.hit(key, limit, window)
+
+def check_login_attempt(email, ip):
+    """
+    檢查並記錄一次登入嘗試（依 IP 與 email）
+    回傳需等待的秒數；0 表示允許
+    """
+    retry_after = _hit(f'login:ip:{ip}', LOGIN_MAX_ATTEMPTS_PER_IP, LOGIN_WINDOW_SECONDS)
+    if retry_after:
+        return retry_after
+    return _hit(f'login:email:{email.strip().lower()}', LOGIN_MAX_ATTEMPTS_PER_EMAIL, LOGIN_WINDOW_SECONDS)
+
+def reset_login_attempts(email, ip):
+    """
+    登入成功後清除該 email 的嘗試紀錄，並移除本次計入 IP 的一次嘗試（IP 上限只計算失敗的登入）
+    IP 的紀錄不整個清除，避免以一組有效帳號在猜測之間重設 IP 的計數
+    """
+    email_key = f'login:email:{email.strip().lower()}'
+    ip_key = f'login:ip:{ip}'
+    try:
+        _limiter.reset(email_key)
+        _limiter.forget(ip_key)
+    except Exception as e:
+        print(f"清除限流紀錄失敗: {str(e)}")
+    _memory_limiter.reset(email_key)
+    if _limiter is not _memory_limiter:
+        _memory_limiter.forget(ip_key)
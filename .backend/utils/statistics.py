@@ -0,0 +1,116 @@
+"""
+平台統計快照
+以單一 multi-CTE 查詢計算統計資料，由背景執行緒定期刷新，API 直接回傳快照
+"""
+import os
+import threading
+import time
+from datetime import datetime
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from config.database import DatabaseConfig
+
+# 背景刷新間隔（秒）
+STATS_REFRESH_INTERVAL = int(os.getenv('STATS_REFRESH_INTERVAL', '60'))
+
+STATISTICS_QUERY = """
+    WITH user_stats AS (
+        SELECT COUNT(*) AS total_users
+        FROM "user"
+        WHERE status = 'active'
+    ),
+    product_stats AS (
+        SELECT COUNT(*) FILTER (WHERE status = 'available') AS total_products,
+               COUNT(*) FILTER (WHERE post_date >= CURRENT_DATE - INTERVAL '7 days') AS products_last_week
+        FROM product
+    ),
+    transaction_stats AS (
+        SELECT COUNT(*) AS total_transactions,
+               COUNT(*) FILTER (WHERE complete_date >= CURRENT_DATE - INTERVAL '7 days') AS transactions_last_week
+        FROM transaction
+    ),
+    report_stats AS (
+        SELECT COUNT(*) AS pending_reports
+        FROM report
+        WHERE status = 'Pending'
+    ),
+    category_stats AS (
+        SELECT COALESCE(
+                   json_agg(json_build_object('category_name', s.category_name, 'count', s.count)
+                            ORDER BY s.count DESC),
+                   '[]'::json
+               ) AS category_statistics
+        FROM (
+            SELECT c.category_name, COUNT(p.product_id) AS count
+            FROM category c
+            LEFT JOIN product p ON c.category_id = p.category_id AND p.status = 'available'
+            GROUP BY c.category_id, c.category_name
+        ) s
+    )
+    SELECT u.total_users, p.total_products, t.total_transactions, r.pending_reports,
+           c.category_statistics, p.products_last_week, t.transactions_last_week
+    FROM user_stats u, product_stats p, transaction_stats t, report_stats r, category_stats c
+"""
+
+class StatisticsSnapshot:
+    """統計快照（背景定期刷新）"""
+
+    _snapshot = None
+    _refresh_lock = threading.Lock()
+    _worker = None
+    _worker_pid = None
+
+    @classmethod
+    def compute(cls):
+        """執行統計查詢並更新快照"""
+        with cls._refresh_lock:
+            with DatabaseConfig.replica_reads(), DatabaseConfig.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(STATISTICS_QUERY)
+                row = cursor.fetchone()
+                cursor.close()
+
+            cls._snapshot = {
+                'total_users': row[0],
+                'total_products': row[1],
+                'total_transactions': row[2],
+                'pending_reports': row[3],
+                'category_statistics': row[4],
+                'products_last_week': row[5],
+                'transactions_last_week': row[6],
+                'generated_at': datetime.utcnow().isoformat() + 'Z'
+            }
+            return cls._snapshot
+
+    @classmethod
+    def get(cls, fresh=False):
+        """取得統計快照（fresh=True 時強制重新計算）"""
+        cls.start()
+        snapshot = cls._snapshot
+        if fresh or snapshot is None:
+            snapshot = cls.compute()
+        return snapshot
+
+    @classmethod
+    def start(cls):
+        """啟動背景刷新執行緒（每個 process 一次）"""
+        if cls._worker_pid == os.getpid() and cls._worker and cls._worker.is_alive():
+            return
+        with cls._refresh_lock:
+            if cls._worker_pid == os.getpid() and cls._worker and cls._worker.is_alive():
+                return
+            cls._worker = threading.Thread(target=cls._run, name='statistics-refresher', daemon=True)
+            cls._worker_pid = os.getpid()
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls):
+        """背景刷新迴圈"""
+        while True:
+            time.sleep(STATS_REFRESH_INTERVAL)
+            try:
+                cls.compute()
+            except Exception as e:
+                # 刷新失敗時保留舊快照，下次再試
+                print(f"統計快照刷新失敗: {str(e)}")
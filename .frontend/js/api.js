@@ -4,7 +4,8 @@
  */
 
 // API 基礎配置
-const API_BASE_URL = 'http://localhost:5000/api';
+// 由前端伺服器（server.py）提供頁面時經同源的 /api 代理呼叫後端，不需 CORS 預檢；直接開啟檔案時呼叫後端
+const API_BASE_URL = window.location.protocol === 'file:' ? 'http://localhost:5000/api' : '/api';
 
 /**
  * 取得儲存的 JWT token
@@ -135,6 +136,37 @@ async function apiCall(endpoint, method = 'GET', data = null, requiresAuth = fal
     }
 }
 
+/**
+ * 批次請求：多個 GET 請求合併為一次往返（頁面載入時使用）
+ * @param {Array<string|object>} requests - 端點（例如：'/products/7'）或 {path, if_none_match}
+ * @returns {Promise<Array>} 依序為各請求的 {path, status, headers, body}
+ */
+async function apiBatch(requests) {
+    const items = requests.map(item => {
+        const request = typeof item === 'string' ? { path: item } : { ...item };
+        request.path = `/api${request.path}`;
+        return request;
+    });
+    // 已登入時帶上 token，需要認證的子請求共用同一次驗證
+    const token = getToken();
+    const result = await apiCall('/batch', 'POST', { requests: items }, Boolean(token));
+    return result.responses;
+}
+
+/**
+ * 取出批次子請求的回應內容；狀態碼不是 2xx 時拋出錯誤（與 apiCall 相同，訊息為 body.error）
+ * @param {object} response - apiBatch 回傳的其中一項
+ * @returns {*} body
+ */
+function batchBody(response) {
+    if (response.status >= 200 && response.status < 300) {
+        return response.body;
+    }
+    const error = new Error((response.body && response.body.error) || `請求失敗 (${response.status})`);
+    error.status = response.status;
+    throw error;
+}
+
 // ========== 認證相關 API ==========
 
 /**
@@ -241,6 +273,16 @@ async function getProduct(productId) {
     return await apiCall(`/products/${productId}`, 'GET');
 }
 
+/**
+ * 取得分類列表（公開、可快取）
+ * @param {string} [version] - 已知的分類版本；與伺服器目前版本相同時瀏覽器可長期快取
+ * @returns {Promise<object>} {version, categories: [{category_id, category_name}]}
+ */
+async function getCategories(version) {
+    const endpoint = version ? `/categories?v=${encodeURIComponent(version)}` : '/categories';
+    return await apiCall(endpoint, 'GET');
+}
+
 /**
  * 建立新商品
  * @param {object} productData
@@ -278,6 +320,31 @@ async function deleteAccount(password) {
     return await apiCall('/auth/delete-account', 'DELETE', { password }, true);
 }
 
+/**
+ * 查詢帳號刪除工作進度
+ * @param {number} jobId
+ * @returns {Promise<object>} {job_id, status: 'queued'|'running'|'completed'|'failed', step, progress, error}
+ */
+async function getAccountDeletionJob(jobId) {
+    return await apiCall(`/auth/jobs/${jobId}`, 'GET', null, true);
+}
+
+/**
+ * 輪詢背景工作直到完成或失敗
+ * @param {function} fetchJob - 取得工作狀態的函數
+ * @param {number} intervalMs - 輪詢間隔
+ * @returns {Promise<object>} 最終的工作狀態
+ */
+async function waitForJob(fetchJob, intervalMs = 1000) {
+    while (true) {
+        const job = await fetchJob();
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // ========== 交易請求相關 API ==========
 
 /**
@@ -436,13 +503,26 @@ function getAdminRole() {
 }
 
 /**
- * 取得所有使用者（管理員用）
- * @param {string} status - 可選：'active' 或 'suspended'
- * @returns {Promise<Array>}
+ * 組合管理員列表查詢字串（忽略空值）
+ * @param {object} params - {q, status, date_from, date_to, sort, limit, cursor}
+ * @returns {string}
+ */
+function buildAdminListQuery(params = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== null && value !== undefined && value !== '') query.append(key, value);
+    });
+    const queryString = query.toString();
+    return queryString ? `?${queryString}` : '';
+}
+
+/**
+ * 取得使用者列表（管理員用，分頁）
+ * @param {object} params - {q, status: 'active'|'suspended', date_from, date_to, sort, limit, cursor}
+ * @returns {Promise<object>} {items, next_cursor, total, total_is_estimate}
  */
-async function getAdminUsers(status = null) {
-    const params = status ? `?status=${status}` : '';
-    return await apiCall(`/admin/users${params}`, 'GET', null, true);
+async function getAdminUsers(params = {}) {
+    return await apiCall(`/admin/users${buildAdminListQuery(params)}`, 'GET', null, true);
 }
 
 /**
@@ -473,13 +553,12 @@ async function activateUser(userId) {
 }
 
 /**
- * 取得所有商品（管理員用）
- * @param {string} status - 可選：商品狀態
- * @returns {Promise<Array>}
+ * 取得商品列表（管理員用，分頁）
+ * @param {object} params - {q, status, date_from, date_to, sort, limit, cursor}
+ * @returns {Promise<object>} {items, next_cursor, total, total_is_estimate}
  */
-async function getAdminProducts(status = null) {
-    const params = status ? `?status=${status}` : '';
-    return await apiCall(`/admin/products${params}`, 'GET', null, true);
+async function getAdminProducts(params = {}) {
+    return await apiCall(`/admin/products${buildAdminListQuery(params)}`, 'GET', null, true);
 }
 
 /**
@@ -519,13 +598,12 @@ async function deleteCategory(categoryId) {
 }
 
 /**
- * 取得所有交易紀錄（管理員用）
- * @param {string} status - 可選：'Paid', 'Unpaid', 'NA'
- * @returns {Promise<Array>}
+ * 取得交易紀錄列表（管理員用，分頁）
+ * @param {object} params - {q, status: 'Paid'|'Unpaid'|'NA', date_from, date_to, sort, limit, cursor}
+ * @returns {Promise<object>} {items, next_cursor, total, total_is_estimate}
  */
-async function getAdminTransactions(status = null) {
-    const params = status ? `?status=${status}` : '';
-    return await apiCall(`/admin/transactions${params}`, 'GET', null, true);
+async function getAdminTransactions(params = {}) {
+    return await apiCall(`/admin/transactions${buildAdminListQuery(params)}`, 'GET', null, true);
 }
 
 /**
@@ -537,12 +615,12 @@ async function getAdminStatistics() {
 }
 
 /**
- * 取得待處理檢舉（管理員用）
- * @param {string} status - 可選：'Pending', 'Under_Review', 'Resolved', 'Rejected'
- * @returns {Promise<Array>}
+ * 取得檢舉列表（管理員用，分頁）
+ * @param {object} params - {q, status: 'Pending'|'Under_Review'|'Resolved'|'Rejected'|'all', date_from, date_to, sort, limit, cursor}
+ * @returns {Promise<object>} {items, next_cursor, total, total_is_estimate}
  */
-async function getAdminReports(status = 'Pending') {
-    return await apiCall(`/admin/reports?status=${status}`, 'GET', null, true);
+async function getAdminReports(params = { status: 'Pending' }) {
+    return await apiCall(`/admin/reports${buildAdminListQuery(params)}`, 'GET', null, true);
 }
 
 /**
@@ -555,6 +633,36 @@ async function resolveReport(reportId, status) {
     return await apiCall(`/admin/reports/${reportId}/resolve`, 'POST', { status }, true);
 }
 
+/**
+ * 批次停權 / 恢復使用者（單一事務）
+ * @param {number[]} userIds
+ * @param {string} action - 'suspend' 或 'activate'
+ * @returns {Promise<object>} {results: [{user_id, outcome}], updated_count, not_found_count}
+ */
+async function bulkUpdateUserStatus(userIds, action) {
+    return await apiCall(`/admin/users/bulk/${action}`, 'POST', { user_ids: userIds }, true);
+}
+
+/**
+ * 批次更新商品狀態（單一事務）
+ * @param {number[]} productIds
+ * @param {string} status
+ * @returns {Promise<object>} {results: [{product_id, outcome}], updated_count, not_found_count}
+ */
+async function bulkUpdateProductStatus(productIds, status) {
+    return await apiCall('/admin/products/bulk/status', 'PUT', { product_ids: productIds, status }, true);
+}
+
+/**
+ * 批次處理檢舉（單一事務）
+ * @param {number[]} reportIds
+ * @param {string} status - 'Resolved' 或 'Rejected'
+ * @returns {Promise<object>} {results: [{report_id, outcome}], updated_count, not_found_count}
+ */
+async function bulkResolveReports(reportIds, status) {
+    return await apiCall('/admin/reports/bulk/resolve', 'POST', { report_ids: reportIds, status }, true);
+}
+
 // 匯出所有函數
 window.api = {
     // 認證
@@ -562,6 +670,8 @@ window.api = {
     loginUser,
     logoutUser,
     deleteAccount,
+    getAccountDeletionJob,
+    waitForJob,
     getCurrentUserInfo,
     getUserId,
     setUserId,
@@ -573,6 +683,7 @@ window.api = {
     // 商品
     getProducts,
     getProduct,
+    getCategories,
     createProduct,
     updateProduct,
     deleteProduct,
@@ -618,7 +729,12 @@ window.api = {
     getAdminStatistics,
     getAdminReports,
     resolveReport,
+    bulkUpdateUserStatus,
+    bulkUpdateProductStatus,
+    bulkResolveReports,
     
     // 通用
-    apiCall
+    apiCall,
+    apiBatch,
+    batchBody
 };
@@ -1236,7 +1236,8 @@ function handleSendMessage(event) {
 // Update action buttons state based on pending transactions
 function updateActionButtonsState() {
   const itemId = getCurrentItemId();
-  const hasPending = itemId ? hasPendingTransaction(itemId) : false;
+  const hasPending = Boolean(currentItem && currentItem.pendingRequestId) ||
+    (itemId ? hasPendingTransaction(itemId) : false);
 
   const actionGroup = document.getElementById('actionButtonsGroup');
   const cancelBtn = document.getElementById('cancelTxBtn');
@@ -1257,7 +1258,7 @@ function updateActionButtonsState() {
   }
 }
 
-function handleCancelTransaction() {
+async function handleCancelTransaction() {
   const itemId = getCurrentItemId();
   if (!itemId) return;
 
@@ -1282,6 +1283,17 @@ function handleCancelTransaction() {
     cancelRequest(pendingRequest.id, currentUser.id);
   }
 
+  // 伺服器上的交易請求
+  if (currentItem && currentItem.pendingRequestId) {
+    try {
+      await api.cancelTradeRequest(currentItem.pendingRequestId);
+      currentItem.pendingRequestId = null;
+    } catch (e) {
+      alert('取消交易請求失敗：' + e.message);
+      return;
+    }
+  }
+
   clearPendingTransaction(itemId);
   alert('已取消交易請求。');
   updateActionButtonsState();
@@ -1430,11 +1442,20 @@ async function renderItemPage() {
   }
 
   let item = null;
+  let sentRequests = null;
   
-  // 優先嘗試從 API 獲取商品
-  if (typeof api !== 'undefined' && api.getProduct) {
+  // 優先嘗試從 API 獲取商品：商品詳情與（已登入時）我送出的交易請求以一次批次請求取得
+  if (typeof api !== 'undefined' && api.apiBatch) {
     try {
-      const productData = await api.getProduct(id);
+      const requests = [`/products/${encodeURIComponent(id)}`];
+      if (api.getToken()) {
+        requests.push('/trade-requests?type=sent&fields=request_id,target_product_id,status');
+      }
+      const [productResponse, requestsResponse] = await api.apiBatch(requests);
+      if (requestsResponse && requestsResponse.status === 200) {
+        sentRequests = requestsResponse.body;
+      }
+      const productData = api.batchBody(productResponse);
       // 轉換 API 格式到前端格式
       
       // 構建賣家統計文字
@@ -1522,6 +1543,12 @@ async function renderItemPage() {
 
   currentItem = item;
   
+  // 伺服器上我對此商品尚待回覆的交易請求（取消時一併取消）
+  if (sentRequests) {
+    const pending = sentRequests.find(r => String(r.target_product_id) === String(item.id) && r.status === 'Pending');
+    currentItem.pendingRequestId = pending ? pending.request_id : null;
+  }
+  
   // Guard: ensure currentItem is set before proceeding
   if (!currentItem) {
     renderItemNotFound('Failed to load item');
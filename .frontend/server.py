@@ -1,24 +1,556 @@
 #!/usr/bin/env python3
 """
-自訂 HTTP 伺服器，禁用快取以解決 304 問題
+自訂 HTTP 伺服器
+JS / CSS / 圖片等資源以內容雜湊產生指紋化檔名（例如 js/api.3f2a1b9c0d.js），HTML 中的引用在送出時改寫為指紋化路徑；
+指紋化資源可永久快取（內容改變時檔名也會改變），HTML 與其他檔案則每次以 ETag 重新驗證。
+/api/* 反向代理到後端（API_UPSTREAM），瀏覽器的 API 呼叫與頁面同源，不需 CORS 預檢請求
 """
+import gzip
+import hashlib
+import http.client
 import http.server
+import json
+import io
+import os
+import posixpath
+import re
 import socketserver
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 
-class NoCacheHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    """自訂請求處理器，禁用快取"""
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 壓縮設定：只壓縮文字類型且大於 COMPRESS_MIN_SIZE 位元組的檔案
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.js', '.css', '.json', '.svg', '.txt', '.map'}
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+# 壓縮結果快取的項目數上限（依 (路徑, 壓縮方式) 快取，檔案修改時間或大小改變即重新壓縮）
+COMPRESS_CACHE_ENTRIES = int(os.getenv('COMPRESS_CACHE_ENTRIES', '256'))
+
+# 指紋化的資源類型；指紋化資源永久快取，其餘檔案每次重新驗證
+FINGERPRINT_EXTENSIONS = {'.js', '.css', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp', '.woff', '.woff2'}
+HTML_EXTENSIONS = {'.html', '.htm'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 連線處理：固定大小的執行緒池；HTTP/1.1 持久連線閒置超過 FRONTEND_KEEPALIVE_TIMEOUT 秒即關閉，釋出執行緒
+FRONTEND_WORKERS = int(os.getenv('FRONTEND_WORKERS', '32'))
+FRONTEND_KEEPALIVE_TIMEOUT = float(os.getenv('FRONTEND_KEEPALIVE_TIMEOUT', '5'))
+
+# /api 反向代理：後端位址、保留的閒置連線數上限與逾時秒數
+API_UPSTREAM = os.getenv('API_UPSTREAM', 'http://localhost:5000')
+API_UPSTREAM_POOL = int(os.getenv('API_UPSTREAM_POOL', '16'))
+API_UPSTREAM_TIMEOUT = float(os.getenv('API_UPSTREAM_TIMEOUT', '60'))
+# 請求本文不超過此位元組數時先讀入記憶體（連線失效時可重送）；較大或 chunked 的本文以新連線逐塊轉送
+API_UPSTREAM_BUFFER_BODY = int(os.getenv('API_UPSTREAM_BUFFER_BODY', '65536'))
+API_BODY_CHUNK_SIZE = 65536
+API_PREFIX = '/api'
+
+# 逐跳（hop-by-hop）標頭，不轉送
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+FRONTEND_DIR = Path(__file__).resolve().parent
+
+class CompressedFileCache:
+    """靜態檔案壓縮結果的 LRU 快取（每個檔案只以最高壓縮率壓縮一次）"""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, path, encoding, version, load):
+        """取得壓縮結果；version（ETag）改變時以 load() 讀取原始內容重新壓縮"""
+        key = (path, encoding)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                return entry[1]
+        
+        raw = load()
+        if encoding == 'br':
+            data = brotli.compress(raw, quality=11)
+        else:
+            data = gzip.compress(raw, compresslevel=9, mtime=0)
+        
+        with self.lock:
+            self.entries[key] = (version, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return data
+
+compressed_cache = CompressedFileCache(COMPRESS_CACHE_ENTRIES)
+
+def choose_encoding(accept_encoding):
+    """依 Accept-Encoding（含 q 值）選擇壓縮方式（br 優先）；不接受任何壓縮時回傳 None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    
+    best, best_q = None, 0.0
+    for encoding in (('br', 'gzip') if brotli else ('gzip',)):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 是否包含 etag（弱比較）"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in tags)
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def parse_range(header, size):
+    """解析單一範圍的 Range 標頭，回傳 (起點, 長度)；格式不支援（例如多個範圍）時回傳 None，範圍無法滿足時拋出 ValueError"""
+    match = _RANGE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N：最後 N 個位元組
+        length = min(int(end), size)
+        if length == 0:
+            raise ValueError(header)
+        return size - length, length
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end - start + 1
+
+class AssetManifest:
+    """資源檔的指紋對照表：js/api.js <-> js/api.<內容雜湊>.js（檔案修改後重新計算）"""
+    
+    # HTML 中的 src / href 引用（略過含 : 的網址，例如 http: / data:，以及樣板字串）
+    REFERENCE = re.compile(r"""((?:src|href)\s*=\s*["'])([^"'?#:$]+)(?:\?[^"'#]*)?(["'])""")
+    
+    def __init__(self, root):
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.files = {}          # 相對路徑 -> ((mtime_ns, size), 指紋化路徑)
+        self.originals = {}      # 指紋化路徑 -> 相對路徑
+        self.version = 0         # 對照表改變時遞增（HTML 需重新改寫）
+        self.checked_at = None
+    
+    def refresh(self):
+        """重新掃描資源檔（最多每秒一次；只重新計算修改過的檔案）"""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < 1:
+            return
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < 1:
+                return
+            files = {}
+            for path in self.root.rglob('*'):
+                if path.suffix.lower() not in FINGERPRINT_EXTENSIONS or not path.is_file():
+                    continue
+                rel = path.relative_to(self.root).as_posix()
+                stat = path.stat()
+                version = (stat.st_mtime_ns, stat.st_size)
+                entry = self.files.get(rel)
+                if entry is None or entry[0] != version:
+                    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:10]
+                    stem, ext = posixpath.splitext(rel)
+                    entry = (version, f'{stem}.{digest}{ext}')
+                files[rel] = entry
+            if files != self.files:
+                self.files = files
+                self.originals = {fingerprinted: rel for rel, (_, fingerprinted) in files.items()}
+                self.version += 1
+            self.checked_at = now
+    
+    def original(self, fingerprinted):
+        """指紋化路徑對應的原始檔案（不是指紋化路徑時回傳 None）"""
+        return self.originals.get(fingerprinted)
+    
+    def rewrite(self, html, page_dir):
+        """將 HTML 中的資源引用改寫為指紋化路徑（去掉原本的 ?v= 版本參數）"""
+        files = self.files
+        
+        def replace(match):
+            rel = posixpath.normpath(posixpath.join(page_dir, match.group(2)))
+            entry = files.get(rel)
+            if entry is None:
+                return match.group(0)
+            return match.group(1) + posixpath.relpath(entry[1], page_dir or '.') + match.group(3)
+        
+        return self.REFERENCE.sub(replace, html)
+
+class RenderedPageCache:
+    """改寫後的 HTML 與其 ETag（檔案或資源對照表改變時重新產生）"""
+    
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.entries = {}
+        self.lock = threading.Lock()
+    
+    def get(self, path, rel_dir, stat):
+        version = (stat.st_mtime_ns, stat.st_size, self.manifest.version)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == version:
+            return entry[1], entry[2]
+        
+        with open(path, 'rb') as f:
+            html = f.read().decode('utf-8')
+        body = self.manifest.rewrite(html, rel_dir).encode('utf-8')
+        etag = f'W/"{hashlib.sha1(body).hexdigest()[:16]}"'
+        with self.lock:
+            self.entries[path] = (version, body, etag)
+        return body, etag
+
+class UpstreamPool:
+    """後端的持久連線池（閒置連線 LIFO 重複使用）"""
+    
+    def __init__(self, url, max_idle, timeout):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.netloc = parts.netloc
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+    
+    def acquire(self, reuse=True):
+        """借用連線，回傳 (連線, 是否為重複使用的連線)；reuse=False 時一定建立新連線"""
+        with self.lock:
+            if reuse and self.idle:
+                return self.idle.pop(), True
+        return self.connection_class(self.host, self.port, timeout=self.timeout), False
+    
+    def release(self, conn):
+        """歸還可重複使用的連線（回應已讀完）"""
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+upstream = UpstreamPool(API_UPSTREAM, API_UPSTREAM_POOL, API_UPSTREAM_TIMEOUT)
+
+class PooledHTTPServer(socketserver.TCPServer):
+    """以固定大小的執行緒池處理連線（取代每個連線建立一個執行緒）"""
+    
+    allow_reuse_address = True
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, workers=FRONTEND_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frontend')
+    
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+    
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+manifest = AssetManifest(FRONTEND_DIR)
+pages = RenderedPageCache(manifest)
+
+class StaticHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """自訂請求處理器：指紋化資源永久快取、HTML 與其他檔案以 ETag 重新驗證、文字檔案壓縮"""
+    
+    # 持久連線（同一個連線依序處理多個請求），所有回應都需帶 Content-Length
+    protocol_version = 'HTTP/1.1'
+    timeout = FRONTEND_KEEPALIVE_TIMEOUT
+    
+    def __init__(self, *args, **kwargs):
+        self._send_range = None
+        super().__init__(*args, directory=str(FRONTEND_DIR), **kwargs)
     
     def end_headers(self):
-        # 禁用所有快取
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        if getattr(self, '_proxied', False):
+            # 代理的回應：保留後端的 Cache-Control 與 CORS 標頭
+            self._proxied = False
+            return super().end_headers()
+        self.send_header('Cache-Control', getattr(self, '_cache_control', None) or REVALIDATE_CACHE_CONTROL)
+        self._cache_control = None
         # 允許 CORS（如果需要）
         self.send_header('Access-Control-Allow-Origin', '*')
+        # 可壓縮的檔案：快取需依 Accept-Encoding 區分
+        if getattr(self, '_vary_accept_encoding', False):
+            self.send_header('Vary', 'Accept-Encoding')
+            self._vary_accept_encoding = False
         super().end_headers()
     
+    def is_api_request(self):
+        path = urllib.parse.urlsplit(self.path).path
+        return path == API_PREFIX or path.startswith(API_PREFIX + '/')
+    
+    def do_GET(self):
+        if self.is_api_request():
+            return self.proxy()
+        super().do_GET()
+    
+    def do_HEAD(self):
+        if self.is_api_request():
+            return self.proxy()
+        super().do_HEAD()
+    
+    def do_POST(self):
+        if self.is_api_request():
+            return self.proxy()
+        self.send_error(405)
+    
+    do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_POST
+    
+    def proxy(self):
+        """轉送 /api 請求到後端，請求本文與回應皆以串流方式逐塊轉送"""
+        headers = {
+            name: value for name, value in self.headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != 'host'
+        }
+        forwarded_for = self.headers.get('X-Forwarded-For')
+        client_ip = self.client_address[0]
+        headers['X-Forwarded-For'] = f'{forwarded_for}, {client_ip}' if forwarded_for else client_ip
+        # 與 X-Forwarded-For 相同，附加本伺服器收到請求的協定（後端依 TRUSTED_PROXY_COUNT 取用）
+        forwarded_proto = self.headers.get('X-Forwarded-Proto')
+        scheme = 'https' if isinstance(self.connection, ssl.SSLSocket) else 'http'
+        headers['X-Forwarded-Proto'] = f'{forwarded_proto}, {scheme}' if forwarded_proto else scheme
+        if self.headers.get('Host'):
+            headers['X-Forwarded-Host'] = self.headers['Host']
+        headers['Host'] = upstream.netloc
+        
+        # 小的本文先讀入；chunked 或較大的本文逐塊轉送（http.client 對沒有 Content-Length 的本文以 chunked 送出）
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            headers.pop('Content-Length', None)
+            body, streamed = self._read_chunked(), True
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            streamed = length > API_UPSTREAM_BUFFER_BODY
+            body = self._read_body(length) if streamed else (self.rfile.read(length) if length else None)
+        
+        # 重複使用的閒置連線可能已被後端關閉，此時改用新連線重送一次；
+        # 逐塊轉送的本文讀過就無法重送，一開始就使用新連線
+        while True:
+            conn, reused = upstream.acquire(reuse=not streamed)
+            try:
+                conn.request(self.command, self.path, body=body, headers=headers)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused:
+                    continue
+                return self._bad_gateway(e)
+            except OSError as e:
+                conn.close()
+                return self._bad_gateway(e)
+        
+        try:
+            self._relay(response)
+        except BaseException:
+            conn.close()
+            raise
+        response.close()
+        if response.will_close:
+            conn.close()
+        else:
+            upstream.release(conn)
+    
+    def _read_body(self, length):
+        """逐塊讀取 Content-Length 長度的請求本文"""
+        while length > 0:
+            data = self.rfile.read(min(length, API_BODY_CHUNK_SIZE))
+            if not data:
+                raise ConnectionError('請求本文不完整')
+            length -= len(data)
+            yield data
+    
+    def _read_chunked(self):
+        """解碼 chunked 編碼的請求本文，逐塊產生內容（忽略 chunk extension 與 trailer）"""
+        while True:
+            size = int(self.rfile.readline(65537).split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                while self.rfile.readline(65537) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield from self._read_body(size)
+            self.rfile.readline(65537)
+    
+    def _relay(self, response):
+        """轉送後端回應：有 Content-Length 時原樣轉送，否則以 chunked 編碼逐塊轉送（串流回應即時送出）"""
+        self._proxied = True
+        self.send_response(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() not in ('date', 'server'):
+                self.send_header(name, value)
+        
+        has_body = self.command != 'HEAD' and response.status not in (204, 304) and response.status >= 200
+        chunked = has_body and response.getheader('Content-Length') is None
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        if not has_body:
+            response.read()
+            return
+        while True:
+            data = response.read1(65536)
+            if not data:
+                break
+            if chunked:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            else:
+                self.wfile.write(data)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+    
+    def _bad_gateway(self, error):
+        """後端無法連線：回傳 JSON 錯誤（與後端的錯誤格式一致）"""
+        self.log_error(f"無法連接到後端 {API_UPSTREAM}: {error}")
+        # 請求本文可能尚未讀完，不再於此連線處理後續請求
+        self.close_connection = True
+        body = json.dumps({'error': '無法連接到後端服務'}, ensure_ascii=False).encode('utf-8')
+        self.send_response(502)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_head(self):
+        """送出靜態檔案的標頭，回傳內容的檔案物件（304 或錯誤時回傳 None）"""
+        self._send_range = None
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        manifest.refresh()
+        original = manifest.original(url_path.lstrip('/'))
+        if original is not None:
+            # 指紋化路徑：內容與檔名綁定，可永久快取
+            path = self.translate_path('/' + original)
+            immutable = True
+        else:
+            path = self.translate_path(self.path)
+            immutable = False
+            if os.path.isdir(path):
+                if not url_path.endswith('/'):
+                    return super().send_head()  # 重新導向到結尾有 / 的網址
+                path = os.path.join(path, 'index.html')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return super().send_head()
+        if not os.path.isfile(path):
+            return super().send_head()
+        
+        ext = os.path.splitext(path)[1].lower()
+        if ext in HTML_EXTENSIONS:
+            rel_dir = posixpath.dirname(Path(path).relative_to(FRONTEND_DIR).as_posix())
+            body, etag = pages.get(path, rel_dir, stat)
+            size = len(body)
+        else:
+            body = None
+            etag = f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            size = stat.st_size
+        
+        compressible = ext in COMPRESSIBLE_EXTENSIONS and size >= COMPRESS_MIN_SIZE
+        self._vary_accept_encoding = compressible
+        self._cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return None
+        
+        def load():
+            if body is not None:
+                return body
+            with open(path, 'rb') as f:
+                return f.read()
+        
+        encoding = choose_encoding(self.headers.get('Accept-Encoding')) if compressible else None
+        try:
+            if encoding:
+                data = compressed_cache.get(path, encoding, etag, load)
+                content, size = io.BytesIO(data), len(data)
+            elif body is not None:
+                content = io.BytesIO(body)
+            else:
+                content = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        
+        # Range 請求：只支援原樣傳送的檔案（壓縮或改寫過的內容一律回傳完整內容）
+        byte_range = None
+        range_header = self.headers.get('Range')
+        if range_header and not encoding and body is None:
+            if_range = self.headers.get('If-Range')
+            if not if_range or if_range.strip() == etag:
+                try:
+                    byte_range = parse_range(range_header, size)
+                except ValueError:
+                    content.close()
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return None
+        
+        if byte_range:
+            start, length = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{start + length - 1}/{size}')
+            self._send_range = byte_range
+        else:
+            length = size
+            self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        elif body is None:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return content
+    
+    def copyfile(self, source, outputfile):
+        """檔案以 socket.sendfile 由核心直接傳送（不經 Python 讀寫複製；不支援的平台自動改用一般傳送）"""
+        byte_range, self._send_range = self._send_range, None
+        if isinstance(source, io.BytesIO):
+            return super().copyfile(source, outputfile)
+        offset, count = byte_range or (0, None)
+        self.connection.sendfile(source, offset, count)
+    
     def log_message(self, format, *args):
         # 簡化日誌輸出，只顯示重要請求
         message = format % args
@@ -34,10 +566,11 @@ class NoCacheHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError) as e:
             # 客戶端中斷連接是正常的（例如用戶停止載入、切換頁面等）
             # 靜默處理，不顯示錯誤
-            pass
+            self.close_connection = True
         except Exception as e:
             # 其他錯誤才記錄
             self.log_error(f"處理請求時發生錯誤: {e}")
+            self.close_connection = True
     
     def finish(self):
         """完成請求處理，捕獲連接中斷錯誤"""
@@ -51,25 +584,20 @@ if __name__ == '__main__':
     PORT = 8000
     
     # 確保在正確的目錄
-    frontend_dir = Path(__file__).parent
-    import os
-    os.chdir(frontend_dir)
-    
-    Handler = NoCacheHTTPRequestHandler
+    os.chdir(FRONTEND_DIR)
     
-    # 使用 ThreadingMixIn 提高性能（處理並發請求）
-    class ThreadedHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-        daemon_threads = True
-        allow_reuse_address = True
+    Handler = StaticHTTPRequestHandler
     
-    with ThreadedHTTPServer(("", PORT), Handler) as httpd:
+    with PooledHTTPServer(("", PORT), Handler) as httpd:
         print(f"========================================")
         print(f"  前端服務已啟動")
         print(f"========================================")
         print(f"")
         print(f"  網址: http://localhost:{PORT}")
-        print(f"  狀態: 已禁用快取（避免 304 問題）")
-        print(f"  模式: 多線程（提升性能）")
+        print(f"  快取: 指紋化資源永久快取，HTML 以 ETag 重新驗證")
+        print(f"  模式: HTTP/1.1 持久連線，{FRONTEND_WORKERS} 個工作執行緒")
+        print(f"  壓縮: {'brotli / gzip' if brotli else 'gzip'}")
+        print(f"  API:  {API_PREFIX}/* 代理到 {API_UPSTREAM}")
         print(f"")
         print(f"  按 Ctrl+C 停止服務")
         print(f"========================================")